@@ -10,7 +10,7 @@ from alembic import context
 # Import your models and config
 from app.config import settings
 from app.database import Base
-from app.models import User, QueueEntry, Session
+from app.models import User, QueueEntry, Session, WorkerLease
 
 # Alembic Config object
 config = context.config
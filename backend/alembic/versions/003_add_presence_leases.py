@@ -0,0 +1,41 @@
+"""add worker leases and presence epochs
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'worker_leases',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('hostname', sa.String(255), nullable=False),
+        sa.Column('pid', sa.Integer(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), server_default=sa.func.now()),
+        sa.Column('heartbeat_at', sa.DateTime(), server_default=sa.func.now()),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_worker_leases_expires_at', 'worker_leases', ['expires_at'])
+    
+    op.add_column('users', sa.Column('presence_epoch', sa.Integer(), nullable=True))
+    op.create_index('ix_users_presence_epoch', 'users', ['presence_epoch'])
+    
+    # Nobody holds a lease yet, so any online flag is stale
+    op.execute("UPDATE users SET is_online = false WHERE is_online")
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_presence_epoch')
+    op.drop_column('users', 'presence_epoch')
+    op.drop_index('ix_worker_leases_expires_at')
+    op.drop_table('worker_leases')
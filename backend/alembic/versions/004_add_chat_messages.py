@@ -0,0 +1,33 @@
+"""add chat messages
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'chat_messages',
+        sa.Column('id', sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column('session_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('sessions.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('sender_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('sent_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index('ix_chat_messages_session_id_id', 'chat_messages', ['session_id', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_chat_messages_session_id_id')
+    op.drop_table('chat_messages')
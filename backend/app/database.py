@@ -1,15 +1,169 @@
+import time
+import uuid
+from typing import Dict, Optional
+from fastapi import Request
+from starlette.requests import HTTPConnection
+from sqlalchemy import exc, event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import declarative_base
+from sqlalchemy.orm import declarative_base, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool, StaticPool
+from sqlalchemy.util.queue import AsyncAdaptedQueue
 from app.config import settings
+from app.utils.metrics import registry
+from app.utils.query_tracking import record_query
 
-# Create async engine
-engine = create_async_engine(
-    settings.database_url,
-    echo=settings.debug,
-    future=True,
+DB_POOL_CONNECTIONS = registry.gauge(
+    "db_pool_connections", "Connection pool usage", ["engine", "state"]
+)
+DB_POOL_WAIT_SECONDS = registry.counter(
+    "db_pool_wait_seconds_total", "Total time checkouts spent waiting for a free pooled connection", ["engine"]
 )
+DB_POOL_TIMEOUTS = registry.counter(
+    "db_pool_timeouts_total", "Pool checkouts that timed out", ["engine"]
+)
+
+
+class PoolStats:
+    """Counters for time spent waiting on a pooled connection."""
+    
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+    
+    def observe(self, waited: float):
+        self.wait_seconds_total += waited
+        if waited > self.wait_seconds_max:
+            self.wait_seconds_max = waited
+
+
+class _TimedQueue(AsyncAdaptedQueue):
+    """Pool queue that records how long a blocking get() waited."""
+    
+    stats: Optional[PoolStats] = None
+    
+    def get(self, block=True, timeout=None):
+        start = time.perf_counter()
+        try:
+            return super().get(block, timeout)
+        finally:
+            if block and self.stats is not None:
+                self.stats.observe(time.perf_counter() - start)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long checkouts waited for a free connection.
+    
+    Only the wait on the pool's queue is timed; opening a new connection
+    (overflow, or after recycle) is not waiting on the pool.
+    """
+    
+    _queue_class = _TimedQueue
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+        self._pool.stats = self.stats
+    
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = pool._pool.stats = self.stats
+        return pool
+    
+    def connect(self):
+        self.stats.checkouts += 1
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.stats.timeouts += 1
+            raise
+
 
-# Create async session factory
+def _sqlite_engine_options(url: str) -> dict:
+    """Engine options for SQLite (tests, benchmarks, local runs)."""
+    options = {
+        "echo": settings.db_echo,
+        "future": True,
+        "connect_args": {"check_same_thread": False},
+    }
+    if ":memory:" in url or "mode=memory" in url:
+        # One shared connection, otherwise every checkout sees an empty database
+        options["poolclass"] = StaticPool
+    else:
+        # Opening a SQLite file is cheap, and NullPool keeps connections from
+        # being tied to one event loop (pytest runs a loop per test)
+        options["poolclass"] = NullPool
+    return options
+
+
+def _engine_options(url: str) -> dict:
+    """Build create_async_engine keyword arguments from settings."""
+    if url.startswith("sqlite"):
+        return _sqlite_engine_options(url)
+    
+    options = {
+        "echo": settings.db_echo,
+        "future": True,
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout_seconds,
+        "pool_recycle": settings.db_pool_recycle_seconds,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+    }
+    
+    if settings.db_pgbouncer:
+        # pgbouncer in transaction mode hands each transaction to a different
+        # server connection, so asyncpg's per-connection prepared statement
+        # cache breaks. Disable it and give every statement a unique name.
+        options["connect_args"] = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        }
+    
+    return options
+
+
+# Create async engine
+engine = create_async_engine(settings.database_url, **_engine_options(settings.database_url))
+
+# Read replica engine (falls back to the primary when not configured)
+if settings.database_replica_url:
+    replica_engine = create_async_engine(
+        settings.database_replica_url, **_engine_options(settings.database_replica_url)
+    )
+else:
+    replica_engine = engine
+
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine.sync_engine, "connect")
+    def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+        # SQLite ignores ON DELETE CASCADE unless foreign keys are switched on
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+def _instrument_engine(target_engine):
+    """Time every statement and attribute it to the current operation."""
+    
+    @event.listens_for(target_engine.sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_start = time.perf_counter()
+    
+    @event.listens_for(target_engine.sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        record_query(statement, parameters, executemany, time.perf_counter() - context._query_start)
+
+
+_instrument_engine(engine)
+if replica_engine is not engine:
+    _instrument_engine(replica_engine)
+
+# Create async session factories
 AsyncSessionLocal = async_sessionmaker(
     engine,
     class_=AsyncSession,
@@ -18,16 +172,128 @@ AsyncSessionLocal = async_sessionmaker(
     autoflush=False,
 )
 
+ReplicaSessionLocal = async_sessionmaker(
+    replica_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autocommit=False,
+    autoflush=False,
+)
+
 # Base class for models
 Base = declarative_base()
 
 
-async def get_db() -> AsyncSession:
+# {authorization header: monotonic deadline} for clients that recently wrote
+_recent_writers: Dict[str, float] = {}
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_session_wrote(session, flush_context):
+    session.info["has_writes"] = True
+
+
+def _client_key(connection: HTTPConnection):
+    """The client's access token: a bearer header over HTTP, ?token= on WebSockets."""
+    authorization = connection.headers.get("authorization")
+    if authorization:
+        return authorization.split(" ", 1)[-1]
+    return connection.query_params.get("token")
+
+
+def mark_read_your_writes(connection: HTTPConnection):
+    """Pin this client's reads to the primary for the read-after-write window.
+    
+    Called for HTTP requests that wrote through get_db, and by the WebSocket
+    handlers after their own writes.
+    """
+    key = _client_key(connection)
+    if not key:
+        return
+    
+    now = time.monotonic()
+    _recent_writers[key] = now + settings.replica_read_after_write_seconds
+    
+    # Drop expired entries so the map stays proportional to active writers
+    if len(_recent_writers) > 1024:
+        for stale_key in [k for k, until in _recent_writers.items() if until <= now]:
+            del _recent_writers[stale_key]
+
+
+def _use_replica(request: Request) -> bool:
+    """Decide whether a read-only request can be served by the replica."""
+    if replica_engine is engine:
+        return False
+    
+    if request.headers.get("x-read-primary"):
+        return False
+    
+    path = request.url.path
+    if not any(path.startswith(prefix) for prefix in settings.replica_read_prefixes_list):
+        return False
+    
+    key = _client_key(request)
+    until = _recent_writers.get(key) if key else None
+    if until is not None:
+        if until > time.monotonic():
+            return False
+        del _recent_writers[key]
+    
+    return True
+
+
+def pool_status(target_engine=None) -> dict:
+    """Snapshot of the connection pool for health checks and metrics."""
+    pool = (target_engine or engine).sync_engine.pool
+    if not isinstance(pool, QueuePool):
+        # SQLite's static/null pools have no size or overflow to report
+        return {"pool": type(pool).__name__}
+    
+    status = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": settings.db_max_overflow,
+    }
+    stats = getattr(pool, "stats", None)
+    if stats:
+        status.update({
+            "checkouts": stats.checkouts,
+            "timeouts": stats.timeouts,
+            "wait_seconds_total": round(stats.wait_seconds_total, 6),
+            "wait_seconds_max": round(stats.wait_seconds_max, 6),
+        })
+    return status
+
+
+def _collect_pool_metrics():
+    engines = {"primary": engine}
+    if replica_engine is not engine:
+        engines["replica"] = replica_engine
+    
+    for name, target_engine in engines.items():
+        status = pool_status(target_engine)
+        if "size" not in status:
+            continue
+        for state in ("size", "checked_out", "checked_in", "overflow"):
+            DB_POOL_CONNECTIONS.labels(name, state).set(status[state])
+        if "wait_seconds_total" in status:
+            DB_POOL_WAIT_SECONDS.labels(name).value = status["wait_seconds_total"]
+            DB_POOL_TIMEOUTS.labels(name).value = status["timeouts"]
+
+
+registry.add_collector(_collect_pool_metrics)
+
+
+async def get_db(request: Request) -> AsyncSession:
     """Dependency to get database session."""
     async with AsyncSessionLocal() as session:
         try:
             yield session
             await session.commit()
+            if session.info.get("has_writes"):
+                mark_read_your_writes(request)
         except Exception:
             await session.rollback()
             raise
@@ -35,6 +301,20 @@ async def get_db() -> AsyncSession:
             await session.close()
 
 
+async def get_read_db(request: Request) -> AsyncSession:
+    """Dependency to get a session for read-only handlers.
+    
+    Uses the replica unless the route is not replica-routed, the client sent
+    X-Read-Primary, or the client wrote (over HTTP or its WebSocket) moments ago.
+    """
+    session_factory = ReplicaSessionLocal if _use_replica(request) else AsyncSessionLocal
+    async with session_factory() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
 async def init_db():
     """Initialize database tables."""
     async with engine.begin() as conn:
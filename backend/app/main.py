@@ -1,42 +1,71 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import logging
 
 from app.config import settings
-from app.database import init_db
-from app.routers import auth, users, queue, partners
+from app.database import init_db, pool_status, engine, replica_engine
+from app.routers import auth, users, queue, partners, sessions, metrics, admin
 from app.services.websocket import router as ws_router
 from app.services.matchmaking import matchmaking_service
+from app.services.match_events import create_external_channel
+from app.services.load_shedding import loop_lag_monitor
+from app.services.presence import disconnect_buffer, presence_lease
+from app.services.chat_log import chat_log
+from app.services.warmup import startup_warmup
+from app.services.shutdown import begin_drain, install_sigterm_drain
+from app.utils.logging_setup import setup_logging, shutdown_logging
+from app.utils.query_tracking import track_queries
+from app.utils.security import get_admin_user
 
-# Configure logging - always DEBUG for development
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-)
+# Configure logging from settings (LOG_LEVEL, LOG_LEVELS, LOG_JSON)
+setup_logging()
 logger = logging.getLogger(__name__)
 
-# Make sure all loggers are at DEBUG level
-logging.getLogger("app.services.websocket").setLevel(logging.DEBUG)
-logging.getLogger("app.services.matchmaking").setLevel(logging.DEBUG)
-
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan events."""
     # Startup
     logger.info("Starting up IELTS Speaking Partner API...")
-    await init_db()
+    # Fail before starting anything if external matchmaking can't reach the matchmaker
+    match_events = create_external_channel() if settings.matchmaking_mode == "external" else None
+    if settings.db_create_all:
+        await init_db()
+    await loop_lag_monitor.start()
+    await presence_lease.start(lambda: list(matchmaking_service.connected_clients))
+    await disconnect_buffer.start()
+    await chat_log.start()
+    startup_warmup.start()
     
-    # Start the matchmaking background task
-    await matchmaking_service.start()
-    logger.info("Matchmaking service started")
+    if match_events is not None:
+        # Rounds run in `python -m app.matchmaker`; this node delivers its matches
+        match_events.subscribe(matchmaking_service.handle_event)
+        await match_events.start()
+        matchmaking_service.events = match_events
+        logger.info("Matchmaking runs externally, listening for match events")
+    else:
+        # Start the matchmaking background task, resuming a drained worker's state
+        matchmaking_service.restore_state(settings.matchmaking_state_file)
+        await matchmaking_service.start()
+        logger.info("Matchmaking service started")
+    if settings.shutdown_drain_on_sigterm:
+        install_sigterm_drain()
     
     yield
     
-    # Shutdown
+    # Shutdown (already drained if we got SIGTERM)
     logger.info("Shutting down...")
-    await matchmaking_service.stop()
+    await begin_drain()
+    if match_events is not None:
+        await match_events.stop()
+    await chat_log.stop()
+    await disconnect_buffer.stop()
+    await presence_lease.stop()
+    await startup_warmup.stop()
+    await loop_lag_monitor.stop()
+    shutdown_logging()
 
 
 app = FastAPI(
@@ -55,12 +84,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Include routers
-app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
-app.include_router(users.router, prefix="/users", tags=["Users"])
-app.include_router(queue.router, prefix="/queue", tags=["Queue"])
-app.include_router(partners.router, tags=["Partners"])
+# Include routers (statements run by HTTP handlers are attributed per route)
+query_tracking = [Depends(track_queries)]
+app.include_router(auth.router, prefix="/auth", tags=["Authentication"], dependencies=query_tracking)
+app.include_router(users.router, prefix="/users", tags=["Users"], dependencies=query_tracking)
+app.include_router(queue.router, prefix="/queue", tags=["Queue"], dependencies=query_tracking)
+app.include_router(partners.router, tags=["Partners"], dependencies=query_tracking)
+app.include_router(sessions.router, prefix="/sessions", tags=["Sessions"], dependencies=query_tracking)
 app.include_router(ws_router, tags=["WebSocket"])
+app.include_router(metrics.router, tags=["Monitoring"])
+app.include_router(admin.router, prefix="/admin", tags=["Admin"])
 
 
 @app.get("/")
@@ -75,5 +108,16 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Health check for deployment."""
+    """Health check for deployment (503 until startup warmup finishes)."""
+    if startup_warmup.in_progress:
+        return JSONResponse(status_code=503, content={"status": "starting"})
     return {"status": "healthy"}
+
+
+@app.get("/health/pool", dependencies=[Depends(get_admin_user)])
+async def pool_health():
+    """Database connection pool usage for scraping."""
+    status = pool_status()
+    if replica_engine is not engine:
+        status["replica"] = pool_status(replica_engine)
+    return status
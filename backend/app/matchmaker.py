@@ -0,0 +1,152 @@
+"""Standalone matchmaker process.
+
+With MATCHMAKING_MODE=external the API nodes stop running rounds and this
+process does it instead, so matching scales and deploys separately from
+the WebSocket workers:
+
+    cd backend
+    MATCHMAKING_MODE=external python -m app.matchmaker
+
+Run exactly one. It reads the queue from the database, creates sessions
+and publishes each match on the match event channel; the API node holding
+a participant's socket sends `matched` and reports back. A match not
+reported delivered to both participants within MATCH_DELIVERY_DEADLINE_SECONDS
+is cancelled and whoever did receive it is requeued.
+"""
+import asyncio
+import logging
+import signal
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.session import QueueEntry, QueueMode
+from app.models.user import User
+from app.services.match_events import MatchEventChannel, create_external_channel
+from app.services.matchmaking import MATCH_DELIVERY_FAILURES, MatchmakingService, Room
+from app.services.presence import online_now
+from app.utils.logging_setup import setup_logging, shutdown_logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PendingMatch:
+    """A published match waiting for both participants to receive it."""
+    room: Room
+    delivered: Set[str] = field(default_factory=set)
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+class MatchmakerService(MatchmakingService):
+    """Runs rounds against the database and hands matches to the API nodes."""
+    
+    def __init__(self, channel: MatchEventChannel, session_factory=None):
+        super().__init__(session_factory)
+        self.channel = channel
+        self.pending: Dict[str, PendingMatch] = {}
+        channel.subscribe(self.handle_event)
+    
+    async def _fetch_queue(self, db: AsyncSession, mode: QueueMode, limit: Optional[int] = None) -> List[QueueEntry]:
+        """Active queue entries of users some live API node holds a socket for."""
+        result = await db.execute(
+            select(QueueEntry)
+            .join(User, User.id == QueueEntry.user_id)
+            .where(
+                QueueEntry.mode == mode,
+                QueueEntry.is_active == True,
+                online_now(),
+            )
+            .order_by(QueueEntry.joined_at)
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+    
+    async def _notify_match(self, user1_id, user2_id, user1, user2, room_id, session_id):
+        """Publish a committed match; the API nodes deliver it."""
+        room = self.active_rooms[room_id]
+        # Nothing runs in this process's rooms, so don't keep them
+        self.close_room(room_id)
+        pending = PendingMatch(room=room)
+        pending.timer = asyncio.get_running_loop().call_later(
+            settings.match_delivery_deadline_seconds, self._spawn, self._check_delivered, session_id
+        )
+        self.pending[session_id] = pending
+        await self.channel.publish({"type": "match", "room": asdict(room)})
+    
+    async def handle_event(self, event: dict):
+        """Track deliveries and queue joins reported by the API nodes."""
+        if event.get("type") == "queue_join":
+            self.scheduler.note_join()
+        elif event.get("type") == "delivered":
+            pending = self.pending.get(event["session_id"])
+            if pending is None:
+                return
+            pending.delivered.add(event["user_id"])
+            if {pending.room.initiator_id, pending.room.responder_id} <= pending.delivered:
+                pending.timer.cancel()
+                del self.pending[event["session_id"]]
+    
+    async def _check_delivered(self, session_id: str):
+        """Cancel a match not delivered to both participants in time."""
+        pending = self.pending.pop(session_id, None)
+        if pending is None:
+            return
+        room = pending.room
+        requeued = [user_id for user_id in (room.initiator_id, room.responder_id) if user_id in pending.delivered]
+        MATCH_DELIVERY_FAILURES.inc()
+        logger.info("Cancelling session %s: delivered only to %s", session_id, requeued)
+        await self._cancel_session(session_id, requeued)
+        await self.channel.publish({
+            "type": "match_cancelled",
+            "room_id": room.room_id,
+            "session_id": session_id,
+            "requeued": requeued,
+        })
+    
+    async def shutdown(self):
+        """Let the in-flight round finish, then stop."""
+        self._running = False
+        try:
+            await asyncio.wait_for(self._round_lock.acquire(), settings.shutdown_drain_timeout_seconds)
+            self._round_lock.release()
+        except asyncio.TimeoutError:
+            logger.warning("Matchmaking round still running after shutdown timeout, cancelling it")
+        await self.stop()
+        for pending in self.pending.values():
+            pending.timer.cancel()
+
+
+async def run():
+    try:
+        channel = create_external_channel()
+    except RuntimeError as e:
+        raise SystemExit(str(e))
+    service = MatchmakerService(channel)
+    await channel.start()
+    await service.start()
+    
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+    
+    logger.info("Stopping matchmaker...")
+    await service.shutdown()
+    await channel.stop()
+
+
+def main():
+    setup_logging()
+    try:
+        asyncio.run(run())
+    finally:
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    main()
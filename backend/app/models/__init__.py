@@ -1,5 +1,7 @@
 from app.models.user import User
 from app.models.session import QueueEntry, Session
 from app.models.partnership import PartnerRequest, Partnership, PartnerRequestStatus
+from app.models.presence import WorkerLease
+from app.models.chat import ChatMessage
 
-__all__ = ["User", "QueueEntry", "Session", "PartnerRequest", "Partnership", "PartnerRequestStatus"]
+__all__ = ["User", "QueueEntry", "Session", "PartnerRequest", "Partnership", "PartnerRequestStatus", "WorkerLease", "ChatMessage"]
@@ -0,0 +1,27 @@
+from datetime import datetime
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Index, Integer, Text
+
+from app.database import Base
+from app.models.types import GUID
+
+
+class ChatMessage(Base):
+    """One text chat message sent during a session (append-only).
+    
+    Ids increase in insert order, so transcripts page by id.
+    """
+    __tablename__ = "chat_messages"
+    
+    # BIGSERIAL on PostgreSQL; SQLite only autoincrements INTEGER keys
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    session_id = Column(GUID(), ForeignKey("sessions.id", ondelete="CASCADE"), nullable=False)
+    sender_id = Column(GUID(), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    body = Column(Text, nullable=False)
+    sent_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_chat_messages_session_id_id", "session_id", "id"),
+    )
+    
+    def __repr__(self):
+        return f"<ChatMessage {self.id} in {self.session_id}>"
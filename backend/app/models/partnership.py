@@ -1,11 +1,11 @@
 import uuid
 from datetime import datetime
 from sqlalchemy import Column, String, DateTime, ForeignKey, Enum as SQLEnum
-from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import enum
 
 from app.database import Base
+from app.models.types import GUID
 
 
 class PartnerRequestStatus(str, enum.Enum):
@@ -18,9 +18,9 @@ class PartnerRequest(Base):
     """Partner request (like PUBG friend request)"""
     __tablename__ = "partner_requests"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    from_user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    to_user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    id = Column(GUID(), primary_key=True, default=uuid.uuid4)
+    from_user_id = Column(GUID(), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    to_user_id = Column(GUID(), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     status = Column(SQLEnum(PartnerRequestStatus), default=PartnerRequestStatus.PENDING)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -34,9 +34,9 @@ class Partnership(Base):
     """Accepted partnerships (friends/partners)"""
     __tablename__ = "partnerships"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user1_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    user2_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    id = Column(GUID(), primary_key=True, default=uuid.uuid4)
+    user1_id = Column(GUID(), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    user2_id = Column(GUID(), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
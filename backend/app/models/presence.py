@@ -0,0 +1,23 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime
+
+from app.database import Base
+
+
+class WorkerLease(Base):
+    """A running worker's claim on a presence epoch.
+    
+    Users connected to a worker carry its epoch in users.presence_epoch. A
+    lease that stops being renewed marks its users as stale.
+    """
+    __tablename__ = "worker_leases"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    hostname = Column(String(255), nullable=False)
+    pid = Column(Integer, nullable=False)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    heartbeat_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f"<WorkerLease {self.id} {self.hostname}:{self.pid}>"
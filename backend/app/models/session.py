@@ -1,11 +1,11 @@
 import uuid
 from datetime import datetime
 from sqlalchemy import Column, String, Float, Boolean, DateTime, ForeignKey, Enum
-from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import enum
 
 from app.database import Base
+from app.models.types import GUID
 
 
 class QueueMode(str, enum.Enum):
@@ -22,8 +22,8 @@ class SessionStatus(str, enum.Enum):
 class QueueEntry(Base):
     __tablename__ = "queue_entries"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    id = Column(GUID(), primary_key=True, default=uuid.uuid4)
+    user_id = Column(GUID(), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     
     mode = Column(Enum(QueueMode), nullable=False)
     level_filter = Column(Float, nullable=True)  # Only used for level_filter mode
@@ -41,10 +41,10 @@ class QueueEntry(Base):
 class Session(Base):
     __tablename__ = "sessions"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     
-    user1_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    user2_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    user1_id = Column(GUID(), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    user2_id = Column(GUID(), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     
     mode = Column(Enum(QueueMode), nullable=False)
     room_id = Column(String(100), nullable=False, unique=True)
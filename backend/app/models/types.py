@@ -0,0 +1,31 @@
+import uuid
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.types import CHAR, TypeDecorator
+
+
+class GUID(TypeDecorator):
+    """Dialect-agnostic UUID column.
+    
+    Uses the native UUID type on PostgreSQL and CHAR(36) elsewhere (SQLite in
+    tests and benchmarks). Accepts uuid.UUID values or their string form, and
+    always returns uuid.UUID.
+    """
+    impl = CHAR(36)
+    cache_ok = True
+    
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(postgresql.UUID(as_uuid=True))
+        return dialect.type_descriptor(CHAR(36))
+    
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return value
+        if not isinstance(value, uuid.UUID):
+            value = uuid.UUID(str(value))
+        return value if dialect.name == "postgresql" else str(value)
+    
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, uuid.UUID):
+            return value
+        return uuid.UUID(str(value))
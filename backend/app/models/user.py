@@ -1,16 +1,16 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Float, Boolean, DateTime
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Float, Boolean, DateTime, Integer
 from sqlalchemy.orm import relationship
 
 from app.database import Base
+from app.models.types import GUID
 
 
 class User(Base):
     __tablename__ = "users"
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(GUID(), primary_key=True, default=uuid.uuid4)
     email = Column(String(255), unique=True, nullable=False, index=True)
     password_hash = Column(String(255), nullable=False)
     username = Column(String(100), nullable=False)
@@ -22,6 +22,8 @@ class User(Base):
     # Online status
     is_online = Column(Boolean, default=False)
     last_seen = Column(DateTime, default=datetime.utcnow)
+    # Lease (worker_leases.id) of the worker holding the user's socket
+    presence_epoch = Column(Integer, nullable=True, index=True)
     
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+
+from app.config import settings
+from app.services.scheduler import supervisor
+from app.utils.security import get_admin_user
+
+router = APIRouter(dependencies=[Depends(get_admin_user)])
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(10.0, gt=0),
+    interval_ms: float = Query(10.0, ge=1.0, le=1000.0),
+    include_tasks: bool = True,
+):
+    """Sample the event loop for N seconds and return collapsed stacks.
+    
+    The output feeds straight into flamegraph.pl or speedscope.
+    """
+    # Imported lazily so the profiler costs nothing until it is used
+    from app.services.profiler import profiler, ProfilerBusy
+    
+    if seconds > settings.profiler_max_seconds:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"seconds must be at most {settings.profiler_max_seconds}"
+        )
+    
+    try:
+        stacks = await profiler.profile(seconds, interval_ms / 1000, include_tasks)
+    except ProfilerBusy:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A profile is already running"
+        )
+    
+    return PlainTextResponse(stacks)
+
+
+@router.get("/jobs")
+async def jobs():
+    """State of this worker's background jobs."""
+    return supervisor.snapshot()
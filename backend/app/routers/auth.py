@@ -13,6 +13,7 @@ from app.utils.security import (
     create_access_token,
     get_current_user,
 )
+from app.utils.query_tracking import query_budget
 from app.config import settings
 
 router = APIRouter()
@@ -58,6 +59,7 @@ async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
 
 
 @router.post("/login", response_model=Token)
+@query_budget(1)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: AsyncSession = Depends(get_db)
@@ -88,6 +90,7 @@ async def login(
 
 
 @router.get("/me", response_model=UserResponse)
+@query_budget(1)
 async def get_current_user_profile(current_user: User = Depends(get_current_user)):
     """Get current authenticated user's profile."""
     return UserResponse.model_validate(current_user)
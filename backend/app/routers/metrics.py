@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.utils.metrics import registry
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of process metrics."""
+    return PlainTextResponse(
+        registry.expose(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
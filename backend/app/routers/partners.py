@@ -4,7 +4,7 @@ from sqlalchemy import select, or_, and_
 from uuid import UUID
 from typing import List
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models import User, PartnerRequest, Partnership, PartnerRequestStatus
 from app.schemas.partnership import (
     PartnerRequestCreate,
@@ -12,26 +12,30 @@ from app.schemas.partnership import (
     PartnerResponse,
     UserSearchResult
 )
-from app.utils.security import get_current_user
+from app.services.presence import online_now, presence_of
+from app.services.profile_cache import profile_cache
+from app.utils.security import get_current_user, get_current_user_read
+from app.utils.query_tracking import query_budget
 
 router = APIRouter(prefix="/partners", tags=["partners"])
 
 
 @router.get("/search", response_model=List[UserSearchResult])
+@query_budget(4)
 async def search_users(
     q: str = Query(..., min_length=2, description="Search by username"),
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_read)
 ):
     """Search users by username"""
     # Search users (not self)
     result = await db.execute(
-        select(User)
+        select(User, online_now().label("online"))
         .where(User.username.ilike(f"%{q}%"))
         .where(User.id != current_user.id)
         .limit(20)
     )
-    users = result.scalars().all()
+    users = result.all()
     
     # Get existing partnerships
     partnerships_result = await db.execute(
@@ -65,11 +69,11 @@ async def search_users(
             id=user.id,
             username=user.username,
             current_level=user.current_level,
-            is_online=user.is_online,
+            is_online=bool(online),
             is_partner=user.id in partner_ids,
             has_pending_request=user.id in pending_to_ids
         )
-        for user in users
+        for user, online in users
     ]
 
 
@@ -143,9 +147,10 @@ async def send_partner_request(
 
 
 @router.get("/requests/incoming", response_model=List[PartnerRequestResponse])
+@query_budget(3)
 async def get_incoming_requests(
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_read)
 ):
     """Get incoming partner requests"""
     result = await db.execute(
@@ -157,10 +162,13 @@ async def get_incoming_requests(
         .order_by(PartnerRequest.created_at.desc())
     )
     requests = result.scalars().all()
+    senders = await profile_cache.get_many(db, [req.from_user_id for req in requests])
     
     response = []
     for req in requests:
-        from_user = await db.get(User, req.from_user_id)
+        from_user = senders.get(str(req.from_user_id))
+        if from_user is None:
+            continue
         response.append(PartnerRequestResponse(
             id=req.id,
             from_user_id=req.from_user_id,
@@ -231,9 +239,10 @@ async def reject_request(
 
 
 @router.get("/", response_model=List[PartnerResponse])
+@query_budget(4)
 async def get_partners(
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_read)
 ):
     """Get my partners list"""
     result = await db.execute(
@@ -246,19 +255,24 @@ async def get_partners(
         .order_by(Partnership.created_at.desc())
     )
     partnerships = result.scalars().all()
+    partner_ids = [p.user2_id if p.user1_id == current_user.id else p.user1_id for p in partnerships]
+    partners = await profile_cache.get_many(db, partner_ids)
+    presence = await presence_of(db, partners)
     
     response = []
-    for p in partnerships:
-        partner_id = p.user2_id if p.user1_id == current_user.id else p.user1_id
-        partner = await db.get(User, partner_id)
+    for p, partner_id in zip(partnerships, partner_ids):
+        partner = partners.get(str(partner_id))
+        if partner is None or str(partner_id) not in presence:
+            continue
+        is_online, last_seen = presence[str(partner_id)]
         response.append(PartnerResponse(
             id=p.id,
             user_id=partner.id,
             username=partner.username,
             current_level=partner.current_level,
             target_score=partner.target_score,
-            is_online=partner.is_online,
-            last_seen=partner.last_seen,
+            is_online=is_online,
+            last_seen=last_seen,
             partnership_date=p.created_at
         ))
     
@@ -3,16 +3,19 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models.user import User
 from app.models.session import QueueEntry, QueueMode
 from app.schemas.queue import QueueJoinRequest, QueueStatusResponse
-from app.utils.security import get_current_user
+from app.utils.security import get_current_user, get_current_user_read
+from app.utils.query_tracking import query_budget
+from app.services.load_shedding import admit_queue_join
+from app.services.matchmaking import matchmaking_service
 
 router = APIRouter()
 
 
-@router.post("/roulette", response_model=QueueStatusResponse)
+@router.post("/roulette", response_model=QueueStatusResponse, dependencies=[Depends(admit_queue_join)])
 async def join_roulette_queue(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -43,6 +46,7 @@ async def join_roulette_queue(
     db.add(queue_entry)
     await db.commit()
     await db.refresh(queue_entry)
+    matchmaking_service.note_queue_join()
     
     # Get position in queue
     position_result = await db.execute(
@@ -63,7 +67,7 @@ async def join_roulette_queue(
     )
 
 
-@router.post("/level-filter", response_model=QueueStatusResponse)
+@router.post("/level-filter", response_model=QueueStatusResponse, dependencies=[Depends(admit_queue_join)])
 async def join_level_filter_queue(
     request: QueueJoinRequest,
     db: AsyncSession = Depends(get_db),
@@ -99,6 +103,7 @@ async def join_level_filter_queue(
     db.add(queue_entry)
     await db.commit()
     await db.refresh(queue_entry)
+    matchmaking_service.note_queue_join()
     
     # Get count of users at similar level
     similar_count_result = await db.execute(
@@ -147,9 +152,10 @@ async def leave_queue(
 
 
 @router.get("/status", response_model=QueueStatusResponse)
+@query_budget(3)
 async def get_queue_status(
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_read)
 ):
     """Get current queue status."""
     result = await db.execute(
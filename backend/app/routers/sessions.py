@@ -0,0 +1,60 @@
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+
+from app.database import get_read_db
+from app.models.chat import ChatMessage
+from app.models.session import Session
+from app.models.user import User
+from app.schemas.chat import ChatMessageResponse, ChatTranscriptResponse
+from app.utils.security import get_current_user_read
+from app.utils.query_tracking import query_budget
+
+router = APIRouter()
+
+
+@router.get("/{session_id}/messages", response_model=ChatTranscriptResponse)
+@query_budget(3)
+async def get_transcript(
+    session_id: UUID,
+    after_id: int = Query(0, ge=0, description="Return messages after this id"),
+    limit: int = Query(100, ge=1, le=500),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_read)
+):
+    """Get a session's chat transcript. Only its participants may read it.
+    
+    Messages are written in batches, so the last second or so may not be
+    visible yet.
+    """
+    session = await db.get(Session, session_id)
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session not found"
+        )
+    if current_user.id not in (session.user1_id, session.user2_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You were not part of this session"
+        )
+    
+    # One extra row tells whether there is a next page
+    result = await db.execute(
+        select(ChatMessage)
+        .where(ChatMessage.session_id == session_id, ChatMessage.id > after_id)
+        .order_by(ChatMessage.id)
+        .limit(limit + 1)
+    )
+    rows = result.scalars().all()
+    page = rows[:limit]
+    
+    return ChatTranscriptResponse(
+        session_id=session_id,
+        messages=[
+            ChatMessageResponse(id=row.id, sender_id=row.sender_id, message=row.body, sent_at=row.sent_at)
+            for row in page
+        ],
+        next_after_id=page[-1].id if len(rows) > limit else None,
+    )
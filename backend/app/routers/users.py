@@ -1,55 +1,65 @@
+from dataclasses import asdict
 from typing import List
 from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models.user import User
 from app.schemas.user import UserResponse, UserUpdate
-from app.utils.security import get_current_user
+from app.services.presence import online_now, presence_of
+from app.services.profile_cache import profile_cache
+from app.utils.security import get_current_user, get_current_user_read
+from app.utils.query_tracking import query_budget
 
 router = APIRouter()
 
 
 @router.get("", response_model=List[UserResponse])
+@query_budget(2)
 async def get_users(
     online_only: bool = False,
     skip: int = 0,
     limit: int = 50,
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_read)
 ):
     """Get list of users. Optionally filter by online status."""
-    query = select(User)
+    query = select(User, online_now().label("online"))
     
     if online_only:
-        query = query.where(User.is_online == True)
+        query = query.where(online_now())
     
     query = query.offset(skip).limit(limit)
     result = await db.execute(query)
-    users = result.scalars().all()
     
-    return [UserResponse.model_validate(user) for user in users]
+    return [
+        UserResponse.model_validate(user).model_copy(update={"is_online": bool(online)})
+        for user, online in result.all()
+    ]
 
 
 @router.get("/{user_id}", response_model=UserResponse)
+@query_budget(3)
 async def get_user(
     user_id: UUID,
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_read)
 ):
     """Get a specific user by ID."""
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
+    user = await profile_cache.get_one(db, user_id)
+    # Presence is not cached; a user deleted in between is not found either
+    presence = await presence_of(db, [user_id]) if user else {}
     
-    if not user:
+    if not presence:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    return UserResponse.model_validate(user)
+    is_online, last_seen = presence[str(user_id)]
+    return UserResponse(**asdict(user), is_online=is_online, last_seen=last_seen)
 
 
 @router.patch("/{user_id}", response_model=UserResponse)
@@ -74,20 +84,21 @@ async def update_user(
     
     await db.commit()
     await db.refresh(current_user)
+    profile_cache.invalidate(user_id)
     
     return UserResponse.model_validate(current_user)
 
 
 @router.get("/online/count")
 async def get_online_count(
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_read)
 ):
     """Get count of online users."""
     from sqlalchemy import func
     
     result = await db.execute(
-        select(func.count(User.id)).where(User.is_online == True)
+        select(func.count(User.id)).where(online_now())
     )
     count = result.scalar()
     
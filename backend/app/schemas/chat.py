@@ -0,0 +1,20 @@
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel
+from uuid import UUID
+
+
+class ChatMessageResponse(BaseModel):
+    """One message of a session transcript."""
+    id: int
+    sender_id: UUID
+    message: str
+    sent_at: datetime
+
+
+class ChatTranscriptResponse(BaseModel):
+    """A page of a session transcript, oldest first."""
+    session_id: UUID
+    messages: List[ChatMessageResponse]
+    # Pass as after_id to get the next page; None on the last page
+    next_after_id: Optional[int] = None
@@ -0,0 +1,146 @@
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Deque, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.chat import ChatMessage
+from app.services.scheduler import Job, supervisor
+from app.utils.metrics import registry
+from app.utils.query_tracking import query_scope
+
+logger = logging.getLogger(__name__)
+
+CHAT_MESSAGES = registry.counter(
+    "chat_log_messages_total", "Chat messages by outcome (stored, dropped, rejected)", ["outcome"]
+)
+CHAT_FLUSH_ROWS = registry.histogram(
+    "chat_log_flush_rows", "Chat messages written per flush",
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 2500),
+)
+
+
+class ChatLogWriter:
+    """Buffers chat messages and writes them in bulk.
+    
+    handle_chat only appends to an in-memory buffer; a supervised job
+    inserts it every CHAT_LOG_FLUSH_INTERVAL_SECONDS, or sooner once
+    CHAT_LOG_FLUSH_BATCH messages are waiting, as one multi-row INSERT.
+    The buffer is bounded: past CHAT_LOG_MAX_BUFFERED the oldest messages
+    are dropped (and counted) rather than growing while the database is
+    down. Whatever is left is written on shutdown.
+    
+    A batch the database refuses (a row for a deleted session, say) is
+    retried row by row and only the offending rows are dropped, so one bad
+    message cannot block every later flush. Other errors (connection loss)
+    put the whole batch back for the next attempt.
+    """
+    
+    def __init__(self, session_factory=None):
+        self.session_factory = session_factory or AsyncSessionLocal
+        self.buffer: Deque[dict] = deque()
+        self._wakeup = asyncio.Event()
+        self._job: Optional[Job] = None
+    
+    def append(self, session_id: str, sender_id: str, body: str, sent_at: Optional[datetime] = None):
+        """Queue a message for the next flush."""
+        if len(self.buffer) >= settings.chat_log_max_buffered:
+            self.buffer.popleft()
+            CHAT_MESSAGES.labels("dropped").inc()
+        self.buffer.append({
+            "session_id": session_id,
+            "sender_id": sender_id,
+            "body": body[:settings.chat_message_max_length],
+            "sent_at": sent_at or datetime.utcnow(),
+        })
+        if len(self.buffer) >= settings.chat_log_flush_batch:
+            self._wakeup.set()
+    
+    async def start(self):
+        """Start the flusher job."""
+        if self._job is None:
+            self._job = supervisor.register(
+                "chat_log_flush", self.flush, wake=self._wait, interval=settings.chat_log_flush_interval_seconds
+            )
+            await self._job.start()
+    
+    async def stop(self):
+        """Stop the flusher job and write everything still buffered."""
+        if self._job:
+            await self._job.stop()
+            self._job = None
+        try:
+            while self.buffer:
+                await self.flush()
+        except Exception as e:
+            logger.error("Could not write %d chat messages on shutdown: %s", len(self.buffer), e)
+    
+    async def _wait(self):
+        """Until the flush interval passes or a full batch is buffered."""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), settings.chat_log_flush_interval_seconds)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+    
+    async def flush(self):
+        """Insert up to one batch of buffered messages."""
+        if not self.buffer:
+            return
+        batch: List[dict] = [self.buffer.popleft() for _ in range(min(len(self.buffer), settings.chat_log_flush_batch))]
+        try:
+            with query_scope("chat_log:flush"):
+                async with self.session_factory() as db:
+                    try:
+                        await db.execute(insert(ChatMessage), batch)
+                        await db.commit()
+                        stored = len(batch)
+                    except (IntegrityError, DataError):
+                        await db.rollback()
+                        stored = await self._insert_one_by_one(db, batch)
+        except Exception:
+            self._requeue(batch)
+            raise
+        CHAT_MESSAGES.labels("stored").inc(stored)
+        CHAT_FLUSH_ROWS.observe(stored)
+        if self.buffer:
+            self._wakeup.set()
+    
+    async def _insert_one_by_one(self, db, batch: List[dict]) -> int:
+        """Insert rows separately, dropping the ones the database rejects.
+        
+        Rows are removed from `batch` as they are dealt with, so after any
+        other error it holds just the rows still to be written.
+        """
+        stored = 0
+        try:
+            while batch:
+                try:
+                    await db.execute(insert(ChatMessage), batch[:1])
+                    await db.commit()
+                    stored += 1
+                except (IntegrityError, DataError) as e:
+                    await db.rollback()
+                    CHAT_MESSAGES.labels("rejected").inc()
+                    logger.warning("Dropping chat message for session %s: %s", batch[0]["session_id"], e.orig)
+                del batch[0]
+        except Exception:
+            CHAT_MESSAGES.labels("stored").inc(stored)
+            raise
+        return stored
+    
+    def _requeue(self, batch: List[dict]):
+        """Back to the front, in order, as far as the bound allows."""
+        room = settings.chat_log_max_buffered - len(self.buffer)
+        kept = batch[-room:] if room > 0 else []
+        self.buffer.extendleft(reversed(kept))
+        CHAT_MESSAGES.labels("dropped").inc(len(batch) - len(kept))
+
+
+# Global writer instance
+chat_log = ChatLogWriter()
@@ -0,0 +1,80 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+
+from app.config import settings
+from app.utils.metrics import registry
+
+INVITES = registry.counter(
+    "partner_invites_total", "Partner invites by outcome", ["outcome"]
+)
+
+
+@dataclass
+class Invite:
+    """A partner invite waiting for the invitee's answer."""
+    inviter_id: str
+    invitee_id: str
+    # {"username": ..., "level": ...} of the inviter when the invite was sent
+    inviter: dict
+    expires_at: float
+
+
+class InviteRegistry:
+    """Pending partner invites, keyed by (inviter, invitee).
+    
+    An invite expires after a TTL. Inviting the same user again while an
+    invite is pending does not notify them twice, and only an answer to a
+    pending invite creates a session, using the inviter snapshot stored with
+    the invite. Bounded: past `max_invites` the oldest invite is dropped.
+    """
+    
+    def __init__(
+        self,
+        ttl_seconds: Optional[float] = None,
+        max_invites: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl_seconds = settings.invite_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self.max_invites = max_invites or settings.invite_max_pending
+        self.clock = clock
+        # Oldest first; with a single TTL that is also soonest to expire
+        self._invites: "OrderedDict[Tuple[str, str], Invite]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        self._expire()
+        return len(self._invites)
+    
+    def _expire(self):
+        now = self.clock()
+        while self._invites:
+            key, invite = next(iter(self._invites.items()))
+            if invite.expires_at > now:
+                break
+            del self._invites[key]
+            INVITES.labels("expired").inc()
+    
+    def create(self, inviter_id: str, invitee_id: str, inviter: dict) -> Optional[Invite]:
+        """Record a new invite, or return None if the same one is still pending."""
+        self._expire()
+        key = (inviter_id, invitee_id)
+        if key in self._invites:
+            INVITES.labels("duplicate").inc()
+            return None
+        if len(self._invites) >= self.max_invites:
+            self._invites.popitem(last=False)
+            INVITES.labels("dropped").inc()
+        invite = Invite(inviter_id, invitee_id, inviter, self.clock() + self.ttl_seconds)
+        self._invites[key] = invite
+        INVITES.labels("sent").inc()
+        return invite
+    
+    def pop(self, inviter_id: str, invitee_id: str) -> Optional[Invite]:
+        """Remove and return the pending invite, if there is one."""
+        self._expire()
+        return self._invites.pop((inviter_id, invitee_id), None)
+
+
+# Global registry instance
+invite_registry = InviteRegistry()
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import math
+from typing import Optional
+from fastapi import HTTPException, status
+
+from app.config import settings
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_SECONDS = registry.histogram(
+    "event_loop_lag_seconds", "Delay between scheduled and actual loop wakeups",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+LOOP_LAG_CURRENT = registry.gauge(
+    "event_loop_lag_smoothed_seconds", "Smoothed event loop lag used for admission control"
+)
+ADMISSION_REJECTIONS = registry.counter(
+    "admission_rejections_total", "Requests shed by admission control", ["kind", "reason"]
+)
+
+
+class LoopLagMonitor:
+    """Samples how late the event loop wakes up from a fixed sleep."""
+
+    # Weight of the newest sample in the moving average
+    SMOOTHING = 0.3
+
+    def __init__(self):
+        self.lag_seconds = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start the sampler task."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the sampler task."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        interval = settings.loop_lag_sample_interval_seconds
+        while True:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            self.record(max(0.0, loop.time() - expected))
+
+    def record(self, lag: float):
+        """Fold one lag sample into the smoothed value."""
+        LOOP_LAG_SECONDS.observe(lag)
+        self.lag_seconds += self.SMOOTHING * (lag - self.lag_seconds)
+        LOOP_LAG_CURRENT.set(self.lag_seconds)
+
+
+class AdmissionController:
+    """Decides whether new work may start, based on loop lag and load.
+
+    Only new WebSocket connections and new queue joins are checked; messages
+    on existing connections are never shed, so calls in progress keep working.
+    """
+
+    def __init__(self, monitor: LoopLagMonitor):
+        self.monitor = monitor
+        self.draining = False
+    
+    def start_draining(self):
+        """Reject all new work from now on (graceful shutdown)."""
+        self.draining = True
+
+    def _overloaded_by_lag(self) -> bool:
+        limit_ms = settings.admission_max_loop_lag_ms
+        return limit_ms > 0 and self.monitor.lag_seconds * 1000 > limit_ms
+
+    def _retry_after(self) -> int:
+        """Retry hint in seconds, longer while the loop is further behind."""
+        base = settings.admission_retry_after_seconds
+        limit_ms = settings.admission_max_loop_lag_ms
+        if limit_ms <= 0:
+            return base
+        factor = max(1.0, self.monitor.lag_seconds * 1000 / limit_ms)
+        return int(math.ceil(base * factor))
+
+    def check_connection(self, connected: int, resuming: bool = False) -> Optional[int]:
+        """Return a retry-after hint if a new WebSocket must be rejected.
+
+        A participant reconnecting to a call in progress (`resuming`) is only
+        turned away while draining: shedding exists to protect calls, not to
+        tear them down.
+        """
+        if self.draining:
+            ADMISSION_REJECTIONS.labels("websocket", "draining").inc()
+            return settings.admission_retry_after_seconds
+        if resuming:
+            return None
+        max_connections = settings.admission_max_connections
+        if max_connections > 0 and connected >= max_connections:
+            ADMISSION_REJECTIONS.labels("websocket", "connections").inc()
+            return settings.admission_retry_after_seconds
+        if self._overloaded_by_lag():
+            ADMISSION_REJECTIONS.labels("websocket", "loop_lag").inc()
+            return self._retry_after()
+        return None
+
+    def check_queue_join(self) -> Optional[int]:
+        """Return a retry-after hint if a new queue join must be rejected."""
+        if self.draining:
+            ADMISSION_REJECTIONS.labels("queue_join", "draining").inc()
+            return settings.admission_retry_after_seconds
+        if self._overloaded_by_lag():
+            ADMISSION_REJECTIONS.labels("queue_join", "loop_lag").inc()
+            return self._retry_after()
+        return None
+
+
+async def admit_queue_join():
+    """Dependency that sheds HTTP queue joins while the server is overloaded."""
+    retry_after = admission_controller.check_queue_join()
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+# Global instances
+loop_lag_monitor = LoopLagMonitor()
+admission_controller = AdmissionController(loop_lag_monitor)
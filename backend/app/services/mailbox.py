@@ -0,0 +1,85 @@
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, List, Optional, Tuple
+
+from app.config import settings
+from app.utils.metrics import registry
+
+MAILBOX_MESSAGES = registry.counter(
+    "mailbox_messages_total", "Control events held for disconnected users by outcome", ["outcome"]
+)
+
+# Control events worth keeping for a user whose socket is briefly gone
+MAILBOX_MESSAGE_TYPES = {"matched", "session_ended", "partner_invite"}
+
+
+class Mailbox:
+    """Undelivered control events for users who are briefly disconnected.
+    
+    Bounded per user (the oldest message is dropped) and in the number of
+    users (the least recently written mailbox is dropped). Messages expire
+    after a TTL so a user who comes back much later is not sent stale
+    matches or invites.
+    """
+    
+    def __init__(
+        self,
+        max_messages: Optional[int] = None,
+        max_users: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_messages = max_messages or settings.mailbox_max_messages
+        self.max_users = max_users or settings.mailbox_max_users
+        self.ttl_seconds = settings.mailbox_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self.clock = clock
+        # {user_id: deque of (expires_at, message)}, least recently written first
+        self._boxes: "OrderedDict[str, Deque[Tuple[float, dict]]]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return sum(len(box) for box in self._boxes.values())
+    
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._boxes
+    
+    def put(self, user_id: str, message: dict):
+        """Keep a message for the user's next connection."""
+        box = self._boxes.get(user_id)
+        if box is None:
+            if len(self._boxes) >= self.max_users:
+                _, evicted = self._boxes.popitem(last=False)
+                MAILBOX_MESSAGES.labels("dropped").inc(len(evicted))
+            box = self._boxes[user_id] = deque()
+        else:
+            self._boxes.move_to_end(user_id)
+        
+        if len(box) >= self.max_messages:
+            box.popleft()
+            MAILBOX_MESSAGES.labels("dropped").inc()
+        box.append((self.clock() + self.ttl_seconds, message))
+        MAILBOX_MESSAGES.labels("stored").inc()
+    
+    def take(self, user_id: str) -> List[dict]:
+        """Remove and return the user's unexpired messages, oldest first."""
+        box = self._boxes.pop(user_id, None)
+        if not box:
+            return []
+        now = self.clock()
+        messages = [message for expires_at, message in box if expires_at > now]
+        MAILBOX_MESSAGES.labels("delivered").inc(len(messages))
+        MAILBOX_MESSAGES.labels("expired").inc(len(box) - len(messages))
+        return messages
+    
+    def discard(self, user_id: str, predicate: Callable[[dict], bool]) -> int:
+        """Drop the user's unexpired messages matching `predicate`; returns how many."""
+        box = self._boxes.get(user_id)
+        if not box:
+            return 0
+        now = self.clock()
+        live = [(expires_at, message) for expires_at, message in box if expires_at > now]
+        kept = deque(item for item in live if not predicate(item[1]))
+        if kept:
+            self._boxes[user_id] = kept
+        else:
+            del self._boxes[user_id]
+        return len(live) - len(kept)
@@ -0,0 +1,168 @@
+"""Match events between the standalone matchmaker and the API nodes.
+
+With MATCHMAKING_MODE=external, rounds run in `python -m app.matchmaker`
+and the two sides talk over a Postgres NOTIFY channel:
+
+- match (matcher -> nodes): a room was created; nodes with a participant
+  connected open it and send `matched`
+- delivered (nodes -> matcher): a participant received their match
+- match_cancelled (matcher -> nodes): the match was not delivered in time;
+  the listed users were requeued
+- queue_join (nodes -> matcher): someone joined a queue, so the matcher's
+  round scheduler does not have to wait for its idle probe
+
+NOTIFY is fire-and-forget. A lost `match` or `delivered` event ends in
+the matcher cancelling the match and requeueing whoever did receive it.
+"""
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+MATCH_EVENTS = registry.counter(
+    "match_events_total", "Match events published and received by type", ["direction", "type"]
+)
+
+Handler = Callable[[dict], Awaitable[None]]
+
+
+class MatchEventChannel:
+    """In-process fan-out with the same interface as the NOTIFY channel.
+    
+    Used when the database is not Postgres (tests, local SQLite runs), where
+    the matcher and the API have to share a process.
+    """
+    
+    def __init__(self):
+        self._handlers: List[Handler] = []
+        self._tasks: set = set()
+    
+    def subscribe(self, handler: Handler):
+        self._handlers.append(handler)
+    
+    async def start(self):
+        pass
+    
+    async def stop(self):
+        pass
+    
+    async def publish(self, event: dict):
+        MATCH_EVENTS.labels("published", event.get("type", "unknown")).inc()
+        # Round-trip through JSON like a NOTIFY payload would
+        self._dispatch(json.dumps(event))
+    
+    def _dispatch(self, payload: str):
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning("Ignoring malformed match event: %s", payload[:200])
+            return
+        MATCH_EVENTS.labels("received", event.get("type", "unknown")).inc()
+        for handler in self._handlers:
+            task = asyncio.create_task(self._handle(handler, event))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _handle(self, handler: Handler, event: dict):
+        try:
+            await handler(event)
+        except Exception as e:
+            logger.error("Error handling %s event: %s", event.get("type"), e)
+
+
+class PostgresMatchEventChannel(MatchEventChannel):
+    """LISTEN/NOTIFY on MATCHMAKING_CHANNEL.
+    
+    Listens on a dedicated asyncpg connection and reconnects with backoff.
+    LISTEN needs a session-level connection, so behind pgbouncer in
+    transaction mode set MATCHMAKING_EVENTS_DATABASE_URL to connect to
+    Postgres directly.
+    """
+    
+    RECONNECT_MAX_SECONDS = 30.0
+    
+    def __init__(self, dsn: str, channel: str):
+        super().__init__()
+        self.dsn = dsn
+        self.channel = channel
+        self._task: Optional[asyncio.Task] = None
+        self._connection = None
+    
+    async def start(self):
+        self._task = asyncio.create_task(self._listen())
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._connection is not None and not self._connection.is_closed():
+            await self._connection.close()
+    
+    async def _listen(self):
+        import asyncpg
+        
+        delay = 1.0
+        while True:
+            try:
+                self._connection = await asyncpg.connect(self.dsn)
+                closed = asyncio.Event()
+                self._connection.add_termination_listener(lambda connection: closed.set())
+                await self._connection.add_listener(self.channel, self._on_notify)
+                logger.info("Listening for match events on %s", self.channel)
+                delay = 1.0
+                await closed.wait()
+                logger.warning("Match event listener connection closed")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Match event listener failed: %s", e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.RECONNECT_MAX_SECONDS)
+    
+    def _on_notify(self, connection, pid, channel, payload):
+        self._dispatch(payload)
+    
+    async def publish(self, event: dict):
+        from app.database import engine
+        
+        MATCH_EVENTS.labels("published", event.get("type", "unknown")).inc()
+        async with engine.connect() as connection:
+            await connection.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": self.channel, "payload": json.dumps(event)},
+            )
+            await connection.commit()
+
+
+def create_channel() -> MatchEventChannel:
+    """NOTIFY channel on Postgres, in-process fan-out otherwise."""
+    url = settings.matchmaking_events_database_url or settings.database_url
+    if not url.startswith("postgresql"):
+        return MatchEventChannel()
+    # asyncpg wants a plain libpq URL
+    return PostgresMatchEventChannel(url.replace("postgresql+asyncpg://", "postgresql://", 1), settings.matchmaking_channel)
+
+
+def create_external_channel() -> PostgresMatchEventChannel:
+    """The cross-process channel MATCHMAKING_MODE=external needs.
+    
+    The in-process channel would silently never see the matchmaker's events,
+    so any other database is a configuration error.
+    """
+    channel = create_channel()
+    if not isinstance(channel, PostgresMatchEventChannel):
+        raise RuntimeError(
+            "MATCHMAKING_MODE=external needs PostgreSQL for match events; set "
+            "MATCHMAKING_EVENTS_DATABASE_URL to a postgresql:// URL or use MATCHMAKING_MODE=embedded"
+        )
+    return channel
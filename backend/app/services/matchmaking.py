@@ -1,8 +1,17 @@
 import asyncio
+import bisect
+import heapq
+import importlib.util
+import json
+import os
+import random
+import time
 import uuid
 import logging
-from datetime import datetime
-from typing import Dict, List, Optional, Tuple
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Set, Tuple
 from sqlalchemy import select, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -10,21 +19,382 @@ from app.database import AsyncSessionLocal
 from app.models.session import QueueEntry, Session, QueueMode, SessionStatus
 from app.models.user import User
 from app.config import settings
+from app.services.mailbox import MAILBOX_MESSAGE_TYPES, Mailbox
+from app.services.match_events import MatchEventChannel
+from app.services.presence import disconnect_buffer
+from app.services.profile_cache import UserProfile, profile_cache
+from app.services.recent_pairs import RecentPairs
+from app.services.scheduler import Job, supervisor
+from app.utils.metrics import registry
+from app.utils.query_tracking import query_scope
 
 logger = logging.getLogger(__name__)
 
+QUEUE_DEPTH = registry.gauge(
+    "matchmaking_queue_depth", "Active queue entries per mode and level band", ["mode", "level_band"]
+)
+ROUND_SECONDS = registry.histogram(
+    "matchmaking_round_duration_seconds", "Duration of one matchmaking round"
+)
+PAIRS_PER_ROUND = registry.histogram(
+    "matchmaking_pairs_per_round", "Pairs created per round", ["mode"],
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+TIME_TO_MATCH_SECONDS = registry.histogram(
+    "matchmaking_time_to_match_seconds", "Time between joining the queue and being matched",
+    ["mode", "level_band"],
+    buckets=(1, 5, 10, 20, 30, 60, 120, 300, 600, 1800),
+)
+CONNECTED_CLIENTS = registry.gauge(
+    "ws_connected_clients", "WebSocket clients connected to this worker"
+)
+SESSION_RESUMES = registry.counter(
+    "session_resumes_total", "Dropped call participants by outcome", ["outcome"]
+)
+MATCH_DELIVERY_FAILURES = registry.counter(
+    "match_delivery_failures_total", "Matches cancelled because a user never received them"
+)
+ROUND_INTERVAL_SECONDS = registry.gauge(
+    "matchmaking_round_interval_seconds", "Delay the scheduler chose before the next round"
+)
+ROUND_BATCH_SIZE = registry.gauge(
+    "matchmaking_round_batch_size", "Queue entries loaded per mode in a round"
+)
+WS_SEND_SECONDS = registry.histogram(
+    "ws_send_duration_seconds", "Time to send a message to a WebSocket client", ["type"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0),
+)
+
+
+def level_band(level: Optional[float]) -> str:
+    """Bucket an IELTS level into a whole-band label (6.5 -> "6")."""
+    return str(int(level if level is not None else 6.0))
+
+
+# Pairing strategies take the active entries of one mode (oldest first) and
+# the round time, and return the pairs to match. Roulette strategies also get
+# the service's RecentPairs. They never touch the DB, so benchmarks can swap
+# them and drive them with synthetic queues.
+
+def pair_roulette_fifo(
+    entries: List[QueueEntry], now: datetime, recent_pairs: Optional[RecentPairs] = None
+) -> List[Tuple[QueueEntry, QueueEntry]]:
+    """Pair roulette users in join order."""
+    return [(entries[i], entries[i + 1]) for i in range(0, len(entries) - 1, 2)]
+
+
+def pair_roulette_random(
+    entries: List[QueueEntry], now: datetime, recent_pairs: Optional[RecentPairs] = None
+) -> List[Tuple[QueueEntry, QueueEntry]]:
+    """Pair the longest waiter with a random partner from the next few waiters.
+    
+    Candidates are the first `roulette_fairness_window` unmatched users after
+    them in join order who were not matched with them recently, so nobody is
+    passed over for long. A user who has waited past
+    `roulette_repeat_after_seconds` takes a recent partner rather than none.
+    """
+    window = max(1, settings.roulette_fairness_window)
+    repeat_after = timedelta(seconds=settings.roulette_repeat_after_seconds)
+    pairs = []
+    matched = [False] * len(entries)
+    
+    for i, entry in enumerate(entries):
+        if matched[i]:
+            continue
+        
+        candidates = []
+        fallback = None
+        for j in range(i + 1, len(entries)):
+            if matched[j]:
+                continue
+            if recent_pairs is not None and recent_pairs.seen(entry.user_id, entries[j].user_id):
+                if fallback is None:
+                    fallback = j
+                continue
+            candidates.append(j)
+            if len(candidates) == window:
+                break
+        
+        if candidates:
+            j = random.choice(candidates)
+        elif fallback is not None and entry.joined_at and now - entry.joined_at >= repeat_after:
+            j = fallback
+        else:
+            continue
+        matched[i] = matched[j] = True
+        pairs.append((entry, entries[j]))
+    
+    return pairs
+
+
+def pair_level_filter_greedy(entries: List[QueueEntry], now: datetime) -> List[Tuple[QueueEntry, QueueEntry]]:
+    """Pair each user with the first compatible (within 0.5) waiting user."""
+    pairs = []
+    matched_ids = set()
+    
+    for entry in entries:
+        if entry.id in matched_ids:
+            continue
+        
+        # Find a compatible partner
+        for other_entry in entries:
+            if other_entry.id == entry.id or other_entry.id in matched_ids:
+                continue
+            
+            # Check if levels are compatible (within 0.5 of each other)
+            if abs((entry.level_filter or 6.0) - (other_entry.level_filter or 6.0)) <= 0.5:
+                pairs.append((entry, other_entry))
+                matched_ids.add(entry.id)
+                matched_ids.add(other_entry.id)
+                break
+    
+    return pairs
+
+
+@lru_cache(maxsize=8)
+def parse_tolerance_schedule(schedule: str) -> Tuple[Tuple[float, float], ...]:
+    """Parse "0:0.5,60:1.0" into ((0, 0.5), (60, 1.0)), sorted by wait."""
+    steps = []
+    for item in schedule.split(","):
+        if item.strip():
+            wait, tolerance = item.split(":")
+            steps.append((float(wait), float(tolerance)))
+    return tuple(sorted(steps)) or ((0.0, 0.5),)
+
+
+def level_tolerance(waited_seconds: float, schedule: Tuple[Tuple[float, float], ...]) -> float:
+    """Level gap a user accepts after waiting `waited_seconds`."""
+    tolerance = schedule[0][1]
+    for wait, step_tolerance in schedule:
+        if waited_seconds < wait:
+            break
+        tolerance = step_tolerance
+    return tolerance
+
+
+def pair_level_filter_aging(entries: List[QueueEntry], now: datetime) -> List[Tuple[QueueEntry, QueueEntry]]:
+    """Pair longest waiters first, with a level tolerance that widens as they wait.
+    
+    The longest waiter comes off a heap keyed on join time and takes the
+    closest-level unmatched user within its tolerance (from
+    LEVEL_TOLERANCE_SCHEDULE), so users at the edges of the level range are
+    eventually matched instead of waiting forever.
+    """
+    schedule = parse_tolerance_schedule(settings.level_tolerance_schedule)
+    levels = [entry.level_filter or 6.0 for entry in entries]
+    # Unmatched users ordered by level, for range lookups
+    by_level = sorted((level, i) for i, level in enumerate(levels))
+    heap = [(entry.joined_at or now, i) for i, entry in enumerate(entries)]
+    heapq.heapify(heap)
+    matched = [False] * len(entries)
+    pairs = []
+    
+    while heap:
+        joined_at, i = heapq.heappop(heap)
+        if matched[i]:
+            continue
+        tolerance = level_tolerance((now - joined_at).total_seconds(), schedule)
+        level = levels[i]
+        
+        # The closest unmatched level is one of our two neighbours in
+        # by_level; on equal gaps the earlier entry wins
+        position = bisect.bisect_left(by_level, (level, i))
+        neighbours = [
+            (abs(by_level[p][0] - level), by_level[p][1], p)
+            for p in (position - 1, position + 1)
+            if 0 <= p < len(by_level)
+        ]
+        if not neighbours:
+            continue
+        gap, j, partner_position = min(neighbours)
+        if gap > tolerance:
+            continue
+        
+        matched[i] = matched[j] = True
+        # Delete the higher position first so the other stays valid
+        for p in sorted((position, partner_position), reverse=True):
+            del by_level[p]
+        pairs.append((entries[i], entries[j]))
+    
+    return pairs
+
+
+def pair_level_filter_optimal(
+    entries: List[QueueEntry], now: datetime, profiles: Optional[Dict] = None
+) -> List[Tuple[QueueEntry, QueueEntry]]:
+    """Greedy pairing plus augmenting paths; see app.services.optimal_pairing."""
+    from app.services.optimal_pairing import optimal_level_pairs
+    return optimal_level_pairs(entries, now, profiles)
+
+
+# Strategies with this flag also get {user_id: (current_level, target_score)}
+pair_level_filter_optimal.needs_profiles = True
+
+
+ROULETTE_MATCHERS = {
+    "fifo": pair_roulette_fifo,
+    "random": pair_roulette_random,
+}
+
+LEVEL_FILTER_MATCHERS = {
+    "greedy": pair_level_filter_greedy,
+    "aging": pair_level_filter_aging,
+}
+
+# numpy is optional; without it the "optimal" strategy is unavailable
+if importlib.util.find_spec("numpy") is not None:
+    LEVEL_FILTER_MATCHERS["optimal"] = pair_level_filter_optimal
+
+
+# Messages kept for a participant who dropped mid-call and replayed on resume
+RESUMABLE_MESSAGE_TYPES = {"offer", "answer", "ice_candidate", "chat"}
+
+
+@dataclass
+class Room:
+    """A call in progress between two users."""
+    room_id: str
+    session_id: str
+    initiator_id: str
+    responder_id: str
+    # {user_id: {"username": ..., "level": ...}} captured at match time
+    profiles: Dict[str, dict] = field(default_factory=dict)
+    
+    def partner_of(self, user_id: str) -> str:
+        return self.responder_id if user_id == self.initiator_id else self.initiator_id
+
+
+@dataclass
+class HeldParticipant:
+    """A call participant whose socket dropped, within the resume window."""
+    room_id: str
+    buffered: List[dict] = field(default_factory=list)
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+class RoundScheduler:
+    """Picks when the next round runs and how many entries it loads.
+    
+    Depth is the number of users left waiting after the last round plus
+    joins seen since. While it is zero, no round touches the database
+    except an occasional probe for joins made through another process.
+    Otherwise the delay is the time to collect
+    MATCHMAKING_TARGET_ARRIVALS_PER_ROUND at the smoothed arrival rate. It
+    is never shorter than twice the last round's duration, and it stays
+    within the min/max interval. The batch size shrinks when a round runs
+    over MATCHMAKING_ROUND_BUDGET_SECONDS and grows back when rounds are
+    quick.
+    """
+    
+    # Weight of the latest arrival-rate sample
+    RATE_SMOOTHING = 0.3
+    
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        # Unknown until the first round, which therefore always runs
+        self.depth = 1
+        self.arrival_rate = 0.0
+        self.batch_size = settings.matchmaking_batch_max
+        self.last_round_seconds = 0.0
+        self._joins = 0
+        self._last_round_at = clock() - settings.roulette_interval_seconds
+        self._wakeup = asyncio.Event()
+    
+    def note_join(self, count: int = 1):
+        """A user joined a queue; may bring the next round forward."""
+        self.depth += count
+        self._joins += count
+        self._wakeup.set()
+    
+    def next_delay(self) -> Optional[float]:
+        """Seconds from the last round to the next one (None: wait for a join)."""
+        if self.depth <= 0:
+            return settings.matchmaking_idle_probe_seconds or None
+        # Joins since the last round count at once, so a burst into a quiet
+        # queue does not wait for the smoothed rate to catch up
+        elapsed = max(self.clock() - self._last_round_at, settings.matchmaking_min_interval_seconds)
+        rate = max(self.arrival_rate, self._joins / elapsed)
+        delay = settings.roulette_interval_seconds
+        if rate > 0:
+            delay = settings.matchmaking_target_arrivals_per_round / rate
+        delay = max(delay, 2 * self.last_round_seconds)
+        return min(max(delay, settings.matchmaking_min_interval_seconds), settings.roulette_interval_seconds)
+    
+    async def wait(self):
+        """Sleep until the next round is due, re-planning whenever someone joins."""
+        while True:
+            delay = self.next_delay()
+            ROUND_INTERVAL_SECONDS.set(delay or 0)
+            remaining = None if delay is None else self._last_round_at + delay - self.clock()
+            if remaining is not None and remaining <= 0:
+                return
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), remaining)
+            except asyncio.TimeoutError:
+                return
+    
+    def round_finished(self, waiting: int, seconds: float):
+        """Record a round that left `waiting` users queued and took `seconds`."""
+        self._sample_arrivals()
+        self.depth = waiting + self._joins
+        self.last_round_seconds = seconds
+        
+        budget = settings.matchmaking_round_budget_seconds
+        if seconds > budget:
+            self.batch_size //= 2
+        elif seconds < budget / 2:
+            self.batch_size = self.batch_size * 3 // 2
+        self.batch_size = min(max(self.batch_size, settings.matchmaking_batch_min), settings.matchmaking_batch_max)
+        ROUND_BATCH_SIZE.set(self.batch_size)
+    
+    def _sample_arrivals(self):
+        now = self.clock()
+        elapsed = now - self._last_round_at
+        if elapsed > 0:
+            sample = self._joins / elapsed
+            self.arrival_rate += self.RATE_SMOOTHING * (sample - self.arrival_rate)
+        self._joins = 0
+        self._last_round_at = now
+
 
 class MatchmakingService:
     """Service for managing matchmaking between users."""
     
-    def __init__(self):
+    def __init__(self, session_factory=None, roulette_matcher=None, level_filter_matcher=None):
+        # Injectable so benchmarks can run against a fake session layer
+        self.session_factory = session_factory or AsyncSessionLocal
+        self.roulette_matcher = roulette_matcher or ROULETTE_MATCHERS[settings.roulette_matcher]
+        self.level_filter_matcher = level_filter_matcher or LEVEL_FILTER_MATCHERS[settings.level_filter_matcher]
         self._running = False
-        self._task: Optional[asyncio.Task] = None
+        self._job: Optional[Job] = None
         # In-memory storage for connected WebSocket clients
         # {user_id: websocket_connection}
         self.connected_clients: Dict[str, any] = {}
-        # {room_id: [user_id1, user_id2]}
-        self.active_rooms: Dict[str, List[str]] = {}
+        # {room_id: Room} and {user_id: room_id} for calls in progress
+        self.active_rooms: Dict[str, Room] = {}
+        self.user_rooms: Dict[str, str] = {}
+        # Participants who dropped mid-call and may still resume: {user_id: HeldParticipant}
+        self.held_participants: Dict[str, HeldParticipant] = {}
+        self._background_tasks: set = set()
+        # Control events for users whose socket is briefly gone
+        self.mailbox = Mailbox()
+        # {session_id: user_ids who received `matched`} for matches awaiting their deadline
+        self.match_deliveries: Dict[str, Set[str]] = {}
+        # Pairs matched lately, so roulette does not keep re-pairing them
+        self.recent_pairs = RecentPairs()
+        # Level bands published to the queue depth gauge
+        self._level_bands_seen: set = set()
+        # Queued users handed over by a previous process: {user_id: deadline}.
+        # They keep their place but are not paired until they reconnect.
+        self.awaiting_reconnect: Dict[str, datetime] = {}
+        # Held for the duration of a round so draining can wait for it
+        self._round_lock = asyncio.Lock()
+        # (room, user1, user2) created by the round in progress
+        self._round_matches: List[Tuple[Room, UserProfile, UserProfile]] = []
+        self.scheduler = RoundScheduler()
+        # Set on API nodes when a standalone matchmaker runs the rounds
+        self.events: Optional[MatchEventChannel] = None
     
     async def start(self):
         """Start the matchmaking background task."""
@@ -32,95 +402,264 @@ class MatchmakingService:
             return
         
         self._running = True
-        self._task = asyncio.create_task(self._matchmaking_loop())
+        self._job = supervisor.register(
+            "matchmaking", self._round,
+            wake=self.scheduler.wait, timeout=settings.matchmaking_round_timeout_seconds,
+        )
+        await self._job.start()
         logger.info("Matchmaking service started")
     
     async def stop(self):
         """Stop the matchmaking background task."""
         self._running = False
-        if self._task:
-            self._task.cancel()
-            try:
-                await self._task
-            except asyncio.CancelledError:
-                pass
+        if self._job:
+            await self._job.stop()
+            self._job = None
         logger.info("Matchmaking service stopped")
     
-    async def _matchmaking_loop(self):
-        """Background loop that runs matchmaking every N seconds."""
-        while self._running:
+    async def _round(self):
+        """One supervised round, run whenever the scheduler says one is due."""
+        if not self._running:
+            return
+        async with self._round_lock:
             try:
                 await self._run_matchmaking()
+            except (Exception, asyncio.CancelledError):
+                # The supervisor backs off, then the schedule resumes as if someone were waiting
+                self.scheduler.round_finished(waiting=1, seconds=0.0)
+                raise
+    
+    async def drain(self, state_file: str = ""):
+        """Finish the in-flight round, hand off state and ask clients to reconnect."""
+        self._running = False
+        try:
+            await asyncio.wait_for(self._round_lock.acquire(), settings.shutdown_drain_timeout_seconds)
+            self._round_lock.release()
+        except asyncio.TimeoutError:
+            logger.warning("Matchmaking round still running after drain timeout, cancelling it")
+        await self.stop()
+        
+        if state_file:
+            try:
+                await self.save_state(state_file)
             except Exception as e:
-                logger.error(f"Error in matchmaking loop: {e}")
-            
-            await asyncio.sleep(settings.roulette_interval_seconds)
+                logger.error("Could not save matchmaking state to %s: %s", state_file, e)
+        
+        await self._send_reconnect_hints()
+    
+    async def _send_reconnect_hints(self):
+        """Tell every client to reconnect after a jittered delay, then close."""
+        low = settings.shutdown_reconnect_min_seconds
+        high = max(low, settings.shutdown_reconnect_max_seconds)
+        
+        async def hint(user_id: str, websocket):
+            # Spread reconnects out so the next process is not hit all at once
+            await self.send_to_client(user_id, {
+                "type": "reconnect",
+                "data": {"retry_after": round(random.uniform(low, high), 2)}
+            })
+            try:
+                await websocket.close(code=1012, reason="Server restarting")
+            except Exception:
+                pass
+        
+        clients = list(self.connected_clients.items())
+        await asyncio.gather(*(hint(user_id, websocket) for user_id, websocket in clients))
+        logger.info("Sent reconnect hints to %d clients", len(clients))
+    
+    async def save_state(self, path: str):
+        """Write active rooms and queued users for the next process to pick up."""
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(QueueEntry.user_id).where(QueueEntry.is_active == True)
+            )
+            queued_user_ids = [str(user_id) for user_id in result.scalars().all()]
+        
+        state = {
+            "saved_at": self._now().isoformat(),
+            "active_rooms": {room_id: asdict(room) for room_id, room in self.active_rooms.items()},
+            "queued_user_ids": queued_user_ids,
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+        logger.info("Saved matchmaking state: %d rooms, %d queued users", len(self.active_rooms), len(queued_user_ids))
+    
+    def restore_state(self, path: str):
+        """Load state saved by a draining process, if there is a fresh one."""
+        if not path or not os.path.exists(path):
+            return
+        try:
+            with open(path) as f:
+                state = json.load(f)
+            os.remove(path)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable matchmaking state %s: %s", path, e)
+            return
+        
+        deadline = datetime.fromisoformat(state["saved_at"]) + timedelta(
+            seconds=settings.matchmaking_reconnect_grace_seconds
+        )
+        if deadline <= self._now():
+            logger.info("Ignoring stale matchmaking state from %s", state["saved_at"])
+            return
+        
+        # Both sides of each call get the rest of the window to resume
+        resume_seconds = min(
+            settings.session_resume_grace_seconds,
+            (deadline - self._now()).total_seconds(),
+        )
+        for room_data in state.get("active_rooms", {}).values():
+            room = Room(**room_data)
+            self.open_room(room)
+            if resume_seconds > 0:
+                for user_id in (room.initiator_id, room.responder_id):
+                    self._hold(user_id, room, resume_seconds)
+        for user_id in state.get("queued_user_ids", []):
+            self.awaiting_reconnect[user_id] = deadline
+        self.scheduler.note_join(len(state.get("queued_user_ids", [])))
+        logger.info(
+            "Restored matchmaking state: %d rooms, %d queued users awaiting reconnect",
+            len(self.active_rooms), len(self.awaiting_reconnect)
+        )
     
     async def _run_matchmaking(self):
         """Run one round of matchmaking for all modes."""
-        async with AsyncSessionLocal() as db:
-            # Run roulette matchmaking
-            await self._match_roulette(db)
-            
-            # Run level-filter matchmaking
-            await self._match_level_filter(db)
-            
-            await db.commit()
+        start = time.perf_counter()
+        self._round_matches = []
+        with query_scope("matchmaking"):
+            async with self.session_factory() as db:
+                # Run roulette matchmaking
+                waiting = await self._match_roulette(db)
+                
+                # Run level-filter matchmaking
+                waiting += await self._match_level_filter(db)
+                
+                await db.commit()
+        # Only matches that are committed are announced, and once committed
+        # they are announced in full even if the round timeout fires meanwhile
+        announce = asyncio.ensure_future(self._announce_matches(self._round_matches))
+        try:
+            await asyncio.shield(announce)
+        except asyncio.CancelledError:
+            await announce
+            raise
+        elapsed = time.perf_counter() - start
+        ROUND_SECONDS.observe(elapsed)
+        self.scheduler.round_finished(waiting, elapsed)
     
-    async def _match_roulette(self, db: AsyncSession):
-        """Match users in roulette mode (random pairing)."""
-        # Get all active roulette queue entries
+    async def _fetch_queue(self, db: AsyncSession, mode: QueueMode, limit: Optional[int] = None) -> List[QueueEntry]:
+        """Load up to `limit` active queue entries for a mode, oldest first."""
         result = await db.execute(
             select(QueueEntry)
             .where(
-                QueueEntry.mode == QueueMode.ROULETTE,
+                QueueEntry.mode == mode,
                 QueueEntry.is_active == True
             )
             .order_by(QueueEntry.joined_at)
+            .limit(limit)
         )
-        queue_entries = list(result.scalars().all())
+        return list(result.scalars().all())
+    
+    async def _fetch_batch(self, db: AsyncSession, mode: QueueMode) -> Tuple[List[QueueEntry], int]:
+        """Queue entries for this round, and how many users to count as waiting before pairing.
+        
+        A full batch means more are queued behind it, so they count too.
+        """
+        limit = self.scheduler.batch_size
+        entries = await self._fetch_queue(db, mode, limit)
+        return entries, len(entries) * 2 if len(entries) >= limit else len(entries)
+    
+    async def _fetch_profiles(self, db: AsyncSession, user_ids: list) -> Dict:
+        """current_level and target_score per queued user, for strategies that use them."""
+        profiles = await self._fetch_users(db, user_ids)
+        return {profile.id: (profile.current_level, profile.target_score) for profile in profiles.values()}
+    
+    async def _fetch_users(self, db: AsyncSession, user_ids: list) -> Dict[str, UserProfile]:
+        """Profiles of matched users for the notification payloads, by str(user_id)."""
+        return await profile_cache.get_many(db, user_ids)
+    
+    def _now(self) -> datetime:
+        """Current time for a round (overridden by simulations)."""
+        return datetime.utcnow()
+    
+    async def _match_roulette(self, db: AsyncSession):
+        """Match users in roulette mode. Returns how many are left waiting."""
+        # Get the oldest active roulette queue entries
+        fetched, waiting = await self._fetch_batch(db, QueueMode.ROULETTE)
+        queue_entries = self._available_entries(fetched)
         
-        logger.info(f"Roulette queue has {len(queue_entries)} users")
+        logger.debug("Roulette queue has %d users", len(queue_entries))
+        QUEUE_DEPTH.labels(QueueMode.ROULETTE.value, "all").set(len(queue_entries))
         
         # Pair users
-        while len(queue_entries) >= 2:
-            entry1 = queue_entries.pop(0)
-            entry2 = queue_entries.pop(0)
-            
+        pairs = self.roulette_matcher(queue_entries, self._now(), self.recent_pairs)
+        # One query for every matched user's profile
+        await self._fetch_users(db, [entry.user_id for pair in pairs for entry in pair])
+        for entry1, entry2 in pairs:
             await self._create_match(db, entry1, entry2)
+        
+        PAIRS_PER_ROUND.labels(QueueMode.ROULETTE.value).observe(len(pairs))
+        return waiting - 2 * len(pairs)
     
     async def _match_level_filter(self, db: AsyncSession):
-        """Match users in level-filter mode (by IELTS level)."""
-        # Get all active level-filter queue entries
-        result = await db.execute(
-            select(QueueEntry)
-            .where(
-                QueueEntry.mode == QueueMode.LEVEL_FILTER,
-                QueueEntry.is_active == True
-            )
-            .order_by(QueueEntry.joined_at)
-        )
-        queue_entries = list(result.scalars().all())
+        """Match users in level-filter mode (by IELTS level). Returns how many are left waiting."""
+        # Get the oldest active level-filter queue entries
+        fetched, waiting = await self._fetch_batch(db, QueueMode.LEVEL_FILTER)
+        queue_entries = self._available_entries(fetched)
         
-        logger.info(f"Level-filter queue has {len(queue_entries)} users")
+        logger.debug("Level-filter queue has %d users", len(queue_entries))
+        self._record_level_depth(queue_entries)
         
-        matched_ids = set()
+        if getattr(self.level_filter_matcher, "needs_profiles", False):
+            profiles = await self._fetch_profiles(db, [entry.user_id for entry in queue_entries])
+            pairs = self.level_filter_matcher(queue_entries, self._now(), profiles)
+        else:
+            pairs = self.level_filter_matcher(queue_entries, self._now())
+        await self._fetch_users(db, [entry.user_id for pair in pairs for entry in pair])
+        for entry1, entry2 in pairs:
+            await self._create_match(db, entry1, entry2)
         
+        PAIRS_PER_ROUND.labels(QueueMode.LEVEL_FILTER.value).observe(len(pairs))
+        return waiting - 2 * len(pairs)
+    
+    def _available_entries(self, queue_entries: List[QueueEntry]) -> List[QueueEntry]:
+        """Leave out users who just disconnected or have not reconnected after a handoff."""
+        if not self.awaiting_reconnect and not disconnect_buffer.pending:
+            return queue_entries
+        
+        now = self._now()
+        ready = []
         for entry in queue_entries:
-            if entry.id in matched_ids:
+            user_id = str(entry.user_id)
+            if disconnect_buffer.is_pending(user_id):
                 continue
-            
-            # Find a compatible partner
-            for other_entry in queue_entries:
-                if other_entry.id == entry.id or other_entry.id in matched_ids:
-                    continue
-                
-                # Check if levels are compatible (within 0.5 of each other)
-                if abs((entry.level_filter or 6.0) - (other_entry.level_filter or 6.0)) <= 0.5:
-                    await self._create_match(db, entry, other_entry)
-                    matched_ids.add(entry.id)
-                    matched_ids.add(other_entry.id)
-                    break
+            deadline = self.awaiting_reconnect.get(user_id)
+            if deadline is None:
+                ready.append(entry)
+            elif user_id in self.connected_clients:
+                del self.awaiting_reconnect[user_id]
+                ready.append(entry)
+            elif now >= deadline:
+                # Never came back: give up their place
+                del self.awaiting_reconnect[user_id]
+                entry.is_active = False
+        return ready
+    
+    def _record_level_depth(self, queue_entries: List[QueueEntry]):
+        """Publish level-filter queue depth per level band."""
+        depth: Dict[str, int] = {}
+        for entry in queue_entries:
+            band = level_band(entry.level_filter)
+            depth[band] = depth.get(band, 0) + 1
+        
+        # Reset bands that emptied since the last round
+        for band in self._level_bands_seen - depth.keys():
+            QUEUE_DEPTH.labels(QueueMode.LEVEL_FILTER.value, band).set(0)
+        for band, count in depth.items():
+            QUEUE_DEPTH.labels(QueueMode.LEVEL_FILTER.value, band).set(count)
+        self._level_bands_seen.update(depth)
     
     async def _create_match(
         self, 
@@ -146,96 +685,394 @@ class MatchmakingService:
         entry1.is_active = False
         entry2.is_active = False
         
+        now = self._now()
+        for entry in (entry1, entry2):
+            if entry.joined_at:
+                band = level_band(entry.level_filter) if entry.mode == QueueMode.LEVEL_FILTER else "all"
+                TIME_TO_MATCH_SECONDS.labels(entry.mode.value, band).observe(
+                    (now - entry.joined_at).total_seconds()
+                )
+        
         await db.flush()
         
-        # Get user info for notifications
-        user1_result = await db.execute(select(User).where(User.id == entry1.user_id))
-        user2_result = await db.execute(select(User).where(User.id == entry2.user_id))
-        user1 = user1_result.scalar_one()
-        user2 = user2_result.scalar_one()
-        
-        logger.info(f"Matched {user1.username} with {user2.username} in room {room_id}")
-        
-        # Store active room
-        self.active_rooms[room_id] = [str(entry1.user_id), str(entry2.user_id)]
-        
-        # Notify users via WebSocket
-        await self._notify_match(
-            str(entry1.user_id),
-            str(entry2.user_id),
-            user1,
-            user2,
-            room_id,
-            str(session.id)
-        )
+        # Get user info for notifications (loaded for the whole round already)
+        profiles = await self._fetch_users(db, [entry1.user_id, entry2.user_id])
+        user1, user2 = profiles[str(entry1.user_id)], profiles[str(entry2.user_id)]
+        
+        logger.info("Matched %s with %s in room %s", user1.username, user2.username, room_id)
+        
+        # Opened and announced once the round commits
+        self._round_matches.append((Room(
+            room_id=room_id,
+            session_id=str(session.id),
+            initiator_id=str(entry1.user_id),
+            responder_id=str(entry2.user_id),
+            profiles={str(user1.id): user1.payload(), str(user2.id): user2.payload()},
+        ), user1, user2))
+    
+    async def _announce_matches(self, matches: List[Tuple[Room, UserProfile, UserProfile]]):
+        """Open the rooms of a committed round and notify the participants."""
+        for room, user1, user2 in matches:
+            self.recent_pairs.add(room.initiator_id, room.responder_id)
+            self.open_room(room)
+            await self._notify_match(
+                room.initiator_id,
+                room.responder_id,
+                user1,
+                user2,
+                room.room_id,
+                room.session_id
+            )
     
     async def _notify_match(
         self,
         user1_id: str,
         user2_id: str,
-        user1: User,
-        user2: User,
+        user1: UserProfile,
+        user2: UserProfile,
         room_id: str,
         session_id: str
     ):
         """Notify matched users via WebSocket."""
-        # Notify user 1 about user 2
-        if user1_id in self.connected_clients:
-            try:
-                await self.connected_clients[user1_id].send_json({
-                    "type": "matched",
-                    "data": {
-                        "partner_id": str(user2.id),
-                        "partner_username": user2.username,
-                        "partner_level": user2.current_level,
-                        "room_id": room_id,
-                        "session_id": session_id,
-                        "is_initiator": True  # User 1 initiates WebRTC offer
-                    }
-                })
-            except Exception as e:
-                logger.error(f"Error notifying user {user1_id}: {e}")
+        await self._send_match(self.active_rooms[room_id], [user1_id, user2_id])
+    
+    async def _send_match(self, room: Room, user_ids: List[str]):
+        """Send `matched` to the given participants of a new room."""
+        undelivered = []
+        for user_id in user_ids:
+            partner_id = room.partner_of(user_id)
+            partner = room.profiles.get(partner_id, {})
+            sent = await self.send_to_client(user_id, {
+                "type": "matched",
+                "data": {
+                    "partner_id": partner_id,
+                    "partner_username": partner.get("username"),
+                    "partner_level": partner.get("level"),
+                    "room_id": room.room_id,
+                    "session_id": room.session_id,
+                    # The initiator sends the WebRTC offer
+                    "is_initiator": user_id == room.initiator_id
+                }
+            })
+            if sent:
+                await self._ack_match(room.session_id, user_id)
+            else:
+                undelivered.append(user_id)
         
-        # Notify user 2 about user 1
-        if user2_id in self.connected_clients:
-            try:
-                await self.connected_clients[user2_id].send_json({
-                    "type": "matched",
-                    "data": {
-                        "partner_id": str(user1.id),
-                        "partner_username": user1.username,
-                        "partner_level": user1.current_level,
-                        "room_id": room_id,
-                        "session_id": session_id,
-                        "is_initiator": False  # User 2 waits for offer
-                    }
-                })
-            except Exception as e:
-                logger.error(f"Error notifying user {user2_id}: {e}")
+        # The standalone matchmaker keeps the deadline when there is one
+        if self.events is not None:
+            return
+        # Whoever was offline gets the match from their mailbox on reconnect,
+        # unless the deadline passes first
+        room_id, session_id = room.room_id, room.session_id
+        if undelivered:
+            self.match_deliveries[session_id] = set(user_ids) - set(undelivered)
+            asyncio.get_running_loop().call_later(
+                settings.match_delivery_deadline_seconds,
+                self._spawn, self._check_match_delivery, room_id, session_id, undelivered,
+            )
+    
+    async def _check_match_delivery(self, room_id: str, session_id: str, user_ids: List[str]):
+        """Cancel a match not delivered to everyone in time and requeue whoever got it."""
+        def is_match(message: dict) -> bool:
+            return message.get("type") == "matched" and message["data"]["session_id"] == session_id
+        
+        delivered = self.match_deliveries.pop(session_id, set())
+        # Withdraw the stale match so it is never delivered; it may already
+        # have been evicted from the mailbox, which is not a delivery
+        for user_id in user_ids:
+            self.mailbox.discard(user_id, is_match)
+        unreachable = [user_id for user_id in user_ids if user_id not in delivered]
+        room = self.active_rooms.get(room_id)
+        if not unreachable or room is None:
+            return
+        
+        MATCH_DELIVERY_FAILURES.inc()
+        reachable = [
+            user_id for user_id in (room.initiator_id, room.responder_id) if user_id not in unreachable
+        ]
+        logger.info("Cancelling session %s: match not delivered to %s", session_id, unreachable)
+        await self._cancel_session(session_id, reachable)
+        
+        self.close_room(room_id)
+        for user_id in reachable:
+            await self._send_match_cancelled(user_id, session_id)
+    
+    async def _cancel_session(self, session_id: str, requeue_user_ids: List[str]):
+        """Mark an undelivered match cancelled and put the given users back in the queue."""
+        try:
+            with query_scope("matchmaking:cancel"):
+                async with self.session_factory() as db:
+                    result = await db.execute(select(Session).where(Session.id == session_id))
+                    session = result.scalar_one_or_none()
+                    if session and session.status == SessionStatus.ACTIVE:
+                        session.status = SessionStatus.CANCELLED
+                        session.ended_at = datetime.utcnow()
+                    for user_id in requeue_user_ids:
+                        await self._requeue(db, user_id)
+                    await db.commit()
+        except Exception as e:
+            logger.error("Could not cancel undelivered session %s: %s", session_id, e)
+    
+    async def _send_match_cancelled(self, user_id: str, session_id: str):
+        await self.send_to_client(user_id, {
+            "type": "match_cancelled",
+            "data": {"session_id": session_id, "reason": "partner_unreachable", "requeued": True}
+        })
+    
+    async def _requeue(self, db: AsyncSession, user_id: str):
+        """Reactivate the user's last queue entry, keeping its original place and filters."""
+        result = await db.execute(
+            select(QueueEntry)
+            .where(QueueEntry.user_id == user_id)
+            .order_by(QueueEntry.joined_at.desc())
+            .limit(1)
+        )
+        entry = result.scalar_one_or_none()
+        if entry is not None:
+            entry.is_active = True
+            self.scheduler.note_join()
+    
+    def open_room(self, room: Room):
+        """Track a call so a dropped participant can resume it."""
+        self.active_rooms[room.room_id] = room
+        self.user_rooms[room.initiator_id] = room.room_id
+        self.user_rooms[room.responder_id] = room.room_id
+    
+    def close_room(self, room_id: str):
+        """Forget a finished call and anyone held for it."""
+        room = self.active_rooms.pop(room_id, None)
+        if room is None:
+            return
+        for user_id in (room.initiator_id, room.responder_id):
+            if self.user_rooms.get(user_id) == room_id:
+                del self.user_rooms[user_id]
+            held = self.held_participants.get(user_id)
+            if held and held.room_id == room_id:
+                if held.timer:
+                    held.timer.cancel()
+                del self.held_participants[user_id]
+    
+    def close_session_room(self, user_id: str, session_id: str):
+        """Close the room of a session a participant ended."""
+        room = self.active_rooms.get(self.user_rooms.get(user_id, ""))
+        if room and room.session_id == str(session_id):
+            self.close_room(room.room_id)
+    
+    def _hold(self, user_id: str, room: Room, seconds: float):
+        """Keep a dropped participant's place in the room for `seconds`."""
+        held = self.held_participants.get(user_id)
+        if held and held.timer:
+            held.timer.cancel()
+        held = HeldParticipant(room_id=room.room_id, buffered=held.buffered if held else [])
+        held.timer = asyncio.get_running_loop().call_later(
+            max(seconds, 0), self._spawn, self._expire_hold, user_id, room.room_id
+        )
+        self.held_participants[user_id] = held
+    
+    def _spawn(self, coro_fn, *args):
+        """Run a coroutine function in the background, keeping a reference until it finishes."""
+        task = asyncio.create_task(coro_fn(*args))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+    
+    async def hold_room(self, user_id: str):
+        """Start the resume window for a participant whose socket dropped."""
+        grace = settings.session_resume_grace_seconds
+        room = self.active_rooms.get(self.user_rooms.get(user_id, ""))
+        if room is None or grace <= 0:
+            return
+        
+        self._hold(user_id, room, grace)
+        logger.debug("Holding room %s for %s for %.0fs", room.room_id, user_id, grace)
+        await self.send_to_client(room.partner_of(user_id), {
+            "type": "partner_disconnected",
+            "data": {"session_id": room.session_id, "grace_seconds": grace}
+        })
+    
+    async def resume_session(self, user_id: str) -> bool:
+        """Put a reconnecting participant back into their call. Returns True if resumed.
+        
+        Also covers a new socket that replaced one not yet known to be dead.
+        """
+        held = self.held_participants.pop(user_id, None)
+        if held and held.timer:
+            held.timer.cancel()
+        room = self.active_rooms.get(self.user_rooms.get(user_id, ""))
+        if room is None:
+            return False
+        
+        partner_id = room.partner_of(user_id)
+        partner = room.profiles.get(partner_id, {})
+        await self.send_to_client(user_id, {
+            "type": "session_resume",
+            "data": {
+                "room_id": room.room_id,
+                "session_id": room.session_id,
+                "partner_id": partner_id,
+                "partner_username": partner.get("username"),
+                "partner_level": partner.get("level"),
+                "is_initiator": user_id == room.initiator_id,
+                "partner_connected": partner_id in self.connected_clients,
+            }
+        })
+        # Signaling the partner sent while we were away, in order
+        for message in held.buffered if held else []:
+            await self.send_to_client(user_id, message)
+        await self.send_to_client(partner_id, {
+            "type": "partner_reconnected",
+            "data": {"session_id": room.session_id}
+        })
+        SESSION_RESUMES.labels("resumed").inc()
+        return True
+    
+    async def deliver_mailbox(self, user_id: str) -> bool:
+        """Send control events a reconnecting user missed. Returns True if one was a match.
+        
+        A delivered match already tells the client about its room, so the
+        caller need not send session_resume as well.
+        """
+        delivered_match = False
+        for message in self.mailbox.take(user_id):
+            if await self.send_to_client(user_id, message) and message.get("type") == "matched":
+                delivered_match = True
+                await self._ack_match(message["data"]["session_id"], user_id)
+        return delivered_match
+    
+    def note_queue_join(self):
+        """A user joined a queue: bring the next round forward, wherever rounds run."""
+        self.scheduler.note_join()
+        if self.events is not None:
+            self._spawn(self.events.publish, {"type": "queue_join"})
+    
+    async def _ack_match(self, session_id: str, user_id: str):
+        """Record that a participant received their match, here or at the standalone matchmaker."""
+        if session_id in self.match_deliveries:
+            self.match_deliveries[session_id].add(user_id)
+        if self.events is not None:
+            await self.events.publish({"type": "delivered", "session_id": session_id, "user_id": user_id})
+    
+    def _is_local(self, user_id: str) -> bool:
+        """Whether this node holds the user's socket, or did until moments ago."""
+        return (
+            user_id in self.connected_clients
+            or user_id in self.held_participants
+            or disconnect_buffer.is_pending(user_id)
+        )
+    
+    async def handle_event(self, event: dict):
+        """Apply an event from the standalone matchmaker on this API node."""
+        if event.get("type") == "match":
+            room = Room(**event["room"])
+            local = [user_id for user_id in (room.initiator_id, room.responder_id) if self._is_local(user_id)]
+            if local:
+                self.open_room(room)
+                await self._send_match(room, local)
+        elif event.get("type") == "match_cancelled":
+            session_id = event["session_id"]
+            room = self.active_rooms.get(event["room_id"])
+            if room is None:
+                return
+            self.close_room(room.room_id)
+            for user_id in (room.initiator_id, room.responder_id):
+                # Withdraw a match still waiting in a mailbox
+                self.mailbox.discard(
+                    user_id, lambda m: m.get("type") == "matched" and m["data"]["session_id"] == session_id
+                )
+                if user_id in event.get("requeued", []):
+                    await self._send_match_cancelled(user_id, session_id)
+    
+    async def _expire_hold(self, user_id: str, room_id: str):
+        """The resume window ran out: end the session and tell the partner."""
+        held = self.held_participants.get(user_id)
+        if held is None or held.room_id != room_id:
+            return
+        del self.held_participants[user_id]
+        room = self.active_rooms.get(room_id)
+        if room is None:
+            return
+        
+        SESSION_RESUMES.labels("expired").inc()
+        try:
+            with query_scope("session:expire"):
+                async with self.session_factory() as db:
+                    result = await db.execute(select(Session).where(Session.id == room.session_id))
+                    session = result.scalar_one_or_none()
+                    if session and session.status == SessionStatus.ACTIVE:
+                        session.status = SessionStatus.COMPLETED
+                        session.ended_at = datetime.utcnow()
+                        await db.commit()
+        except Exception as e:
+            logger.error("Could not end session %s after resume window: %s", room.session_id, e)
+        
+        self.close_room(room_id)
+        await self.send_to_client(room.partner_of(user_id), {
+            "type": "session_ended",
+            "data": {"session_id": room.session_id, "reason": "partner_disconnected"}
+        })
+    
+    async def send_to_client(self, user_id: str, message: dict) -> bool:
+        """Send a JSON message to a connected client. Returns True if sent.
+        
+        Signaling for a participant inside their resume window is buffered
+        for replay and also counts as sent. Control events that cannot be
+        sent are kept in the user's mailbox until they reconnect.
+        """
+        websocket = self.connected_clients.get(user_id)
+        if websocket is None:
+            held = self.held_participants.get(user_id)
+            if (
+                held is not None
+                and message.get("type") in RESUMABLE_MESSAGE_TYPES
+                and len(held.buffered) < settings.session_resume_buffer_size
+            ):
+                held.buffered.append(message)
+                return True
+            if message.get("type") in MAILBOX_MESSAGE_TYPES:
+                self.mailbox.put(user_id, message)
+            return False
+        
+        start = time.perf_counter()
+        try:
+            await websocket.send_json(message)
+        except Exception as e:
+            logger.warning("Error sending %s to %s: %s", message.get("type"), user_id, e)
+            if message.get("type") in MAILBOX_MESSAGE_TYPES:
+                self.mailbox.put(user_id, message)
+            return False
+        WS_SEND_SECONDS.labels(message.get("type")).observe(time.perf_counter() - start)
+        return True
+    
+    def in_call(self, user_id: str) -> bool:
+        """Whether the user has a call in progress here, including one held for resume."""
+        return user_id in self.held_participants or user_id in self.user_rooms
     
     def register_client(self, user_id: str, websocket):
         """Register a WebSocket client."""
         self.connected_clients[user_id] = websocket
-        logger.info(f"Client {user_id} connected. Total clients: {len(self.connected_clients)}")
+        logger.debug("Client %s connected. Total clients: %d", user_id, len(self.connected_clients))
     
-    def unregister_client(self, user_id: str):
-        """Unregister a WebSocket client."""
+    def unregister_client(self, user_id: str, websocket=None) -> bool:
+        """Unregister a WebSocket client. Returns False if it was already replaced."""
+        # A quick reconnect may have registered a new socket before the old
+        # one's cleanup runs; leave the new one alone
+        if websocket is not None and self.connected_clients.get(user_id) is not websocket:
+            return False
         if user_id in self.connected_clients:
             del self.connected_clients[user_id]
-            logger.info(f"Client {user_id} disconnected. Total clients: {len(self.connected_clients)}")
+            logger.debug("Client %s disconnected. Total clients: %d", user_id, len(self.connected_clients))
+        return True
     
     async def forward_signaling(self, from_user_id: str, to_user_id: str, message: dict):
         """Forward WebRTC signaling messages between peers."""
-        if to_user_id in self.connected_clients:
-            try:
-                await self.connected_clients[to_user_id].send_json({
-                    "type": message.get("type"),
-                    "from_user_id": from_user_id,
-                    "data": message.get("data")
-                })
-            except Exception as e:
-                logger.error(f"Error forwarding signaling from {from_user_id} to {to_user_id}: {e}")
+        await self.send_to_client(to_user_id, {
+            "type": message.get("type"),
+            "from_user_id": from_user_id,
+            "data": message.get("data")
+        })
 
 
 # Global matchmaking service instance
 matchmaking_service = MatchmakingService()
+
+registry.add_collector(lambda: CONNECTED_CLIENTS.set(len(matchmaking_service.connected_clients)))
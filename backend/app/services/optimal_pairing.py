@@ -0,0 +1,166 @@
+"""Batch level-filter pairing: a heuristic for more, cheaper pairs per round.
+
+Optional strategy behind LEVEL_FILTER_MATCHER=optimal; needs numpy. Users
+are sorted by level and cut into blocks of at most
+OPTIMAL_MATCHER_BLOCK_SIZE, so each cost matrix stays a few MB. Users left
+over in one block are carried into the next, so neighbouring levels still
+meet across block edges.
+
+Within a block, pairs are taken cheapest first from each user's few
+cheapest compatible partners. Then length-3 augmenting paths grow the
+matching: an unmatched u next to a matched v whose partner w has a free
+neighbour x becomes u-v plus w-x. This is exactly the "A-B paired when
+A-C and B-D would have matched everyone" case.
+
+This is a heuristic, not a maximum matching: longer augmenting paths and
+pairs across non-adjacent blocks are never tried, and cost is only
+minimised greedily.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.models.session import QueueEntry
+
+# Cost weights: level_filter gap dominates, profile similarity breaks ties,
+# and long waiters are preferred when partners are otherwise equal
+LEVEL_FILTER_WEIGHT = 1.0
+CURRENT_LEVEL_WEIGHT = 0.5
+TARGET_SCORE_WEIGHT = 0.25
+WAIT_WEIGHT = 0.1
+WAIT_CAP_SECONDS = 600.0
+# Candidate partners per user for the cheapest-first pass
+CANDIDATES_PER_USER = 8
+
+Profiles = Dict[object, Tuple[Optional[float], Optional[float]]]
+
+
+def _tolerances(waits: np.ndarray) -> np.ndarray:
+    from app.services.matchmaking import parse_tolerance_schedule
+    schedule = parse_tolerance_schedule(settings.level_tolerance_schedule)
+    steps = np.array([wait for wait, _ in schedule])
+    values = np.array([tolerance for _, tolerance in schedule])
+    return values[np.maximum(np.searchsorted(steps, waits, side="right") - 1, 0)]
+
+
+def _block_costs(features: np.ndarray, waits: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Pairwise cost and compatibility for one block.
+    
+    `features` columns are level_filter, current_level and target_score.
+    Two users are compatible if their level_filter gap is within the
+    tolerance of the longer waiter.
+    """
+    level = features[:, 0]
+    gap = np.abs(level[:, None] - level[None, :])
+    tolerance = _tolerances(waits)
+    compatible = gap <= np.maximum(tolerance[:, None], tolerance[None, :])
+    np.fill_diagonal(compatible, False)
+    
+    cost = LEVEL_FILTER_WEIGHT * gap
+    cost += CURRENT_LEVEL_WEIGHT * np.abs(features[:, 1][:, None] - features[:, 1][None, :])
+    cost += TARGET_SCORE_WEIGHT * np.abs(features[:, 2][:, None] - features[:, 2][None, :])
+    waited = np.minimum(waits, WAIT_CAP_SECONDS) / WAIT_CAP_SECONDS
+    cost -= WAIT_WEIGHT * (waited[:, None] + waited[None, :])
+    cost[~compatible] = np.inf
+    return cost, compatible
+
+
+def _match_block(cost: np.ndarray, compatible: np.ndarray) -> np.ndarray:
+    """Mate index per user (-1 if unmatched)."""
+    n = len(cost)
+    mate = np.full(n, -1)
+    if n < 2:
+        return mate
+    
+    # Cheapest-first over each user's best few partners
+    k = min(CANDIDATES_PER_USER, n - 1)
+    candidates = np.argpartition(cost, k - 1, axis=1)[:, :k]
+    rows = np.repeat(np.arange(n), k)
+    cols = candidates.ravel()
+    edge_costs = cost[rows, cols]
+    finite = np.isfinite(edge_costs)
+    rows, cols, edge_costs = rows[finite], cols[finite], edge_costs[finite]
+    order = np.argsort(edge_costs, kind="stable")
+    for i, j in zip(rows[order].tolist(), cols[order].tolist()):
+        if mate[i] < 0 and mate[j] < 0:
+            mate[i], mate[j] = j, i
+    
+    # Users whose candidates were all taken: cheapest free partner overall
+    for u in np.flatnonzero(mate < 0):
+        if mate[u] >= 0:
+            continue
+        free_costs = np.where(mate < 0, cost[u], np.inf)
+        v = int(np.argmin(free_costs))
+        if np.isfinite(free_costs[v]):
+            mate[u], mate[v] = v, u
+    
+    # Length-3 augmenting paths u - v = w - x, cheapest replacement first
+    improved = True
+    while improved:
+        improved = False
+        for u in np.flatnonzero(mate < 0):
+            if mate[u] >= 0:
+                continue
+            free = mate < 0
+            free[u] = False
+            if not free.any():
+                return mate
+            vs = np.flatnonzero(compatible[u] & (mate >= 0))
+            if not len(vs):
+                continue
+            ws = mate[vs]
+            xs = np.flatnonzero(free)
+            # added[a, b]: cost change of swapping v=vs[a] to u and its
+            # partner to x=xs[b]; infinite where w and x are incompatible
+            added = cost[u, vs][:, None] + cost[np.ix_(ws, xs)] - cost[vs, ws][:, None]
+            a, b = np.unravel_index(np.argmin(added), added.shape)
+            best = (vs[a], ws[a], xs[b]) if np.isfinite(added[a, b]) else None
+            if best is not None:
+                v, w, x = best
+                mate[u], mate[v] = v, u
+                mate[w], mate[x] = x, w
+                improved = True
+    return mate
+
+
+def optimal_level_pairs(
+    entries: List[QueueEntry], now: datetime, profiles: Optional[Profiles] = None
+) -> List[Tuple[QueueEntry, QueueEntry]]:
+    """Pair level-filter users block by block (heuristic); see the module docstring."""
+    if len(entries) < 2:
+        return []
+    profiles = profiles or {}
+    
+    rows = []
+    for entry in entries:
+        level = entry.level_filter or 6.0
+        current_level, target_score = profiles.get(entry.user_id, (None, None))
+        rows.append((
+            level,
+            current_level if current_level is not None else level,
+            target_score if target_score is not None else level + 1.0,
+        ))
+    features = np.array(rows, dtype=np.float32)
+    waits = np.array(
+        [(now - entry.joined_at).total_seconds() if entry.joined_at else 0.0 for entry in entries],
+        dtype=np.float32,
+    )
+    
+    block_size = max(2, settings.optimal_matcher_block_size)
+    order = np.lexsort((-waits, features[:, 0]))
+    pairs = []
+    carried = np.array([], dtype=int)
+    for start in range(0, len(order), block_size):
+        block = np.concatenate([carried, order[start:start + block_size]])
+        cost, compatible = _block_costs(features[block], waits[block])
+        mate = _match_block(cost, compatible)
+        for i in np.flatnonzero(mate > np.arange(len(block))):
+            pairs.append((entries[block[i]], entries[block[mate[i]]]))
+        # Keep the carry bounded: only the highest-level leftovers can still
+        # meet the next block
+        leftovers = block[mate < 0]
+        leftovers = leftovers[np.argsort(features[leftovers, 0], kind="stable")]
+        carried = leftovers[-max(1, block_size // 4):]
+    return pairs
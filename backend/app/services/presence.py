@@ -0,0 +1,322 @@
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import update, delete, select, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.presence import WorkerLease
+from app.models.session import QueueEntry
+from app.models.user import User
+from app.services.scheduler import Job, supervisor
+from app.utils.metrics import registry
+from app.utils.query_tracking import query_scope
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_FLUSH_USERS = registry.histogram(
+    "presence_flush_users", "Disconnects written per presence flush",
+    buckets=(1, 5, 10, 50, 100, 500, 1000, 5000, 10000),
+)
+PRESENCE_PENDING = registry.gauge(
+    "presence_pending_disconnects", "Disconnects waiting for the next presence flush"
+)
+PRESENCE_RECLAIMED = registry.counter(
+    "presence_stale_users_cleared_total", "Users marked offline because their worker's lease expired"
+)
+
+# Expired leases are deleted once they are this old
+LEASE_RETENTION = timedelta(days=1)
+
+
+def _chunks(items: List[str], size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def live_epochs(now: Optional[datetime] = None):
+    """Subquery of epochs whose worker lease is still being renewed."""
+    return select(WorkerLease.id).where(WorkerLease.expires_at > (now or datetime.utcnow()))
+
+
+def online_now(now: Optional[datetime] = None):
+    """Users connected to a worker that is still alive."""
+    return and_(User.is_online == True, User.presence_epoch.in_(live_epochs(now)))
+
+
+def stale_presence(dead_before: datetime):
+    """Users flagged online whose worker's lease expired before `dead_before` (or who predate leases)."""
+    return and_(
+        User.is_online == True,
+        or_(User.presence_epoch.is_(None), User.presence_epoch.not_in(live_epochs(dead_before))),
+    )
+
+
+async def presence_of(db: AsyncSession, user_ids: Iterable) -> Dict[str, Tuple[bool, datetime]]:
+    """Live (online, last_seen) per str(user_id), judged like online_now()."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return {}
+    result = await db.execute(
+        select(User.id, online_now().label("online"), User.last_seen).where(User.id.in_(user_ids))
+    )
+    return {str(user_id): (bool(online), last_seen) for user_id, online, last_seen in result.all()}
+
+
+class PresenceLease:
+    """This worker's presence epoch, kept alive by a heartbeat.
+    
+    Every heartbeat also clears users whose epoch belongs to a dead worker,
+    so a crashed worker's users go offline within one lease TTL plus the
+    grace period. Readers using online_now() stop counting them as soon as
+    the lease lapses; the grace only delays clearing rows and queue entries,
+    so a worker that renews late just carries on with the same epoch.
+    """
+    
+    def __init__(self, session_factory=None):
+        self.session_factory = session_factory or AsyncSessionLocal
+        self.epoch: Optional[int] = None
+        self._connected_users: Callable[[], Iterable[str]] = lambda: ()
+        self._job: Optional[Job] = None
+    
+    async def start(self, connected_users: Callable[[], Iterable[str]]):
+        """Claim an epoch, clear stale presence and start heartbeating."""
+        self._connected_users = connected_users
+        try:
+            await self.heartbeat()
+        except Exception as e:
+            logger.error("Could not claim a presence lease, retrying on next heartbeat: %s", e)
+        if self._job is None:
+            # Retry well within the lease TTL after a failed heartbeat
+            self._job = supervisor.register(
+                "presence_heartbeat", self.heartbeat,
+                interval=settings.presence_heartbeat_seconds, backoff_max=settings.presence_heartbeat_seconds,
+            )
+            await self._job.start()
+    
+    async def stop(self):
+        """Stop heartbeating and give up the lease."""
+        if self._job:
+            await self._job.stop()
+            self._job = None
+        if self.epoch is not None:
+            async with self.session_factory() as db:
+                await db.execute(
+                    update(WorkerLease)
+                    .where(WorkerLease.id == self.epoch)
+                    .values(expires_at=datetime.utcnow())
+                )
+                await db.commit()
+            self.epoch = None
+    
+    async def heartbeat(self):
+        """Renew (or claim) the lease, then clear users of dead workers."""
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=settings.presence_lease_ttl_seconds)
+        dead_before = now - timedelta(seconds=settings.presence_lease_grace_seconds)
+        
+        with query_scope("presence:heartbeat"):
+            async with self.session_factory() as db:
+                renewed = False
+                if self.epoch is not None:
+                    # Late but within the grace period: nothing was cleared yet
+                    result = await db.execute(
+                        update(WorkerLease)
+                        .where(WorkerLease.id == self.epoch, WorkerLease.expires_at > dead_before)
+                        .values(heartbeat_at=now, expires_at=expires_at)
+                    )
+                    renewed = result.rowcount == 1
+                
+                if not renewed:
+                    await self._claim(db, now, expires_at)
+                
+                # Queue entries first, while the stale users can still be found
+                await db.execute(
+                    update(QueueEntry)
+                    .where(
+                        QueueEntry.is_active == True,
+                        QueueEntry.user_id.in_(select(User.id).where(stale_presence(dead_before)))
+                    )
+                    .values(is_active=False)
+                    .execution_options(synchronize_session=False)
+                )
+                result = await db.execute(
+                    update(User)
+                    .where(stale_presence(dead_before))
+                    .values(is_online=False, presence_epoch=None)
+                    .execution_options(synchronize_session=False)
+                )
+                if result.rowcount:
+                    PRESENCE_RECLAIMED.inc(result.rowcount)
+                    logger.info("Cleared presence of %d users held by dead workers", result.rowcount)
+                
+                await db.execute(delete(WorkerLease).where(WorkerLease.expires_at < now - LEASE_RETENTION))
+                await db.commit()
+    
+    async def _claim(self, db, now: datetime, expires_at: datetime):
+        """Take a new epoch and move this worker's connected users onto it."""
+        lost = self.epoch
+        lease = WorkerLease(
+            hostname=socket.gethostname(), pid=os.getpid(),
+            started_at=now, heartbeat_at=now, expires_at=expires_at,
+        )
+        db.add(lease)
+        await db.flush()
+        self.epoch = lease.id
+        
+        if lost is not None:
+            logger.warning("Presence lease %d expired, claimed %d", lost, self.epoch)
+        else:
+            logger.info("Claimed presence epoch %d", self.epoch)
+        
+        user_ids = sorted(self._connected_users())
+        for chunk in _chunks(user_ids, DisconnectBuffer.CHUNK_SIZE):
+            await db.execute(
+                update(User)
+                .where(User.id.in_(chunk))
+                .values(is_online=True, presence_epoch=self.epoch)
+                .execution_options(synchronize_session=False)
+            )
+
+
+class DisconnectBuffer:
+    """Coalesces disconnect cleanup into a few set-based UPDATEs per interval.
+    
+    A disconnect only records the user here. The flusher then marks everyone
+    pending offline (and drops their queue entries) in bulk, so a storm of
+    thousands of disconnects costs a handful of statements instead of three
+    queries each. A user who reconnects before the flush is simply removed
+    from the buffer; one who reconnects during a flush is marked online again
+    right after it and keeps any queue entry made meanwhile.
+    """
+    
+    # Users per UPDATE ... WHERE id IN (...)
+    CHUNK_SIZE = 500
+    
+    def __init__(self, session_factory=None, lease: Optional[PresenceLease] = None):
+        self.session_factory = session_factory or AsyncSessionLocal
+        self.lease = lease or presence_lease
+        # {user_id: leave_queue}
+        self.pending: Dict[str, bool] = {}
+        self._flushing: Set[str] = set()
+        self._reconnected: Set[str] = set()
+        self._wakeup = asyncio.Event()
+        self._job: Optional[Job] = None
+    
+    def schedule(self, user_id: str, leave_queue: bool = True):
+        """Record a disconnect to be written on the next flush."""
+        # A queue leave already scheduled is never downgraded
+        self.pending[user_id] = leave_queue or self.pending.get(user_id, False)
+        if len(self.pending) >= settings.presence_flush_max_batch:
+            self._wakeup.set()
+    
+    def cancel(self, user_id: str) -> bool:
+        """Forget a pending disconnect for a user who reconnected.
+        
+        Returns True if the user was still pending, in which case the database
+        still shows them online and nothing needs to be written.
+        """
+        if user_id in self._flushing:
+            self._reconnected.add(user_id)
+        return self.pending.pop(user_id, None) is not None
+    
+    def is_pending(self, user_id: str) -> bool:
+        return user_id in self.pending or (user_id in self._flushing and user_id not in self._reconnected)
+    
+    async def start(self):
+        """Start the flusher job."""
+        if self._job is None:
+            self._job = supervisor.register(
+                "presence_flush", self.flush, wake=self._wait, interval=settings.presence_flush_interval_seconds
+            )
+            await self._job.start()
+    
+    async def stop(self):
+        """Stop the flusher job and write whatever is still pending."""
+        if self._job:
+            await self._job.stop()
+            self._job = None
+        await self.flush()
+    
+    async def _wait(self):
+        """Until the flush interval passes or a full batch is pending."""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), settings.presence_flush_interval_seconds)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+    
+    async def flush(self):
+        """Write all pending disconnects with set-based updates."""
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, {}
+        self._flushing = set(batch)
+        self._reconnected = set()
+        try:
+            await self._write(batch)
+        except Exception:
+            # Put the batch back unless those users came back meanwhile
+            for user_id, leave_queue in batch.items():
+                if user_id not in self._reconnected:
+                    self.schedule(user_id, leave_queue)
+            raise
+        finally:
+            reconnected, self._flushing, self._reconnected = self._reconnected, set(), set()
+        
+        if reconnected:
+            await self._mark_online(sorted(reconnected))
+        PRESENCE_FLUSH_USERS.observe(len(batch))
+    
+    async def _write(self, batch: Dict[str, bool]):
+        user_ids = sorted(batch)
+        leaving_queue = sorted(user_id for user_id, leave_queue in batch.items() if leave_queue)
+        now = datetime.utcnow()
+        
+        with query_scope("presence:flush"):
+            async with self.session_factory() as db:
+                for chunk in _chunks(user_ids, self.CHUNK_SIZE):
+                    # Only rows this worker owns; the user may be online elsewhere
+                    await db.execute(
+                        update(User)
+                        .where(User.id.in_(chunk), User.presence_epoch == self.lease.epoch)
+                        .values(is_online=False, presence_epoch=None, last_seen=now)
+                        .execution_options(synchronize_session=False)
+                    )
+                for chunk in _chunks(leaving_queue, self.CHUNK_SIZE):
+                    # Only entries from before the disconnect; a user who is back
+                    # and queued again while this flush runs keeps the new one
+                    await db.execute(
+                        update(QueueEntry)
+                        .where(
+                            QueueEntry.user_id.in_(chunk),
+                            QueueEntry.is_active == True,
+                            QueueEntry.joined_at <= now,
+                        )
+                        .values(is_active=False)
+                        .execution_options(synchronize_session=False)
+                    )
+                await db.commit()
+    
+    async def _mark_online(self, user_ids: List[str]):
+        """Undo the offline flag for users who reconnected mid-flush."""
+        with query_scope("presence:flush"):
+            async with self.session_factory() as db:
+                await db.execute(
+                    update(User)
+                    .where(User.id.in_(user_ids))
+                    .values(is_online=True, presence_epoch=self.lease.epoch, last_seen=datetime.utcnow())
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+
+
+# Global instances
+presence_lease = PresenceLease()
+disconnect_buffer = DisconnectBuffer(lease=presence_lease)
+
+registry.add_collector(lambda: PRESENCE_PENDING.set(len(disconnect_buffer.pending)))
@@ -0,0 +1,159 @@
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import app.database as database
+from app.config import settings
+from app.models.user import User
+from app.utils.metrics import registry
+
+PROFILE_CACHE_LOOKUPS = registry.counter(
+    "profile_cache_lookups_total", "User profile cache lookups by result (hit, miss)", ["result"]
+)
+PROFILE_CACHE_ENTRIES = registry.gauge(
+    "profile_cache_entries", "User profiles held in the cache"
+)
+
+
+@dataclass(frozen=True)
+class UserProfile:
+    """Read-only snapshot of the `users` profile columns shown to other users.
+    
+    Presence (is_online, last_seen) is left out: it changes far more often
+    than the TTL and is read live with presence_of().
+    """
+    id: uuid.UUID
+    email: str
+    username: str
+    current_level: float
+    target_score: float
+    created_at: datetime
+    
+    @classmethod
+    def from_user(cls, user: User) -> "UserProfile":
+        return cls(
+            id=user.id,
+            email=user.email,
+            username=user.username,
+            current_level=user.current_level,
+            target_score=user.target_score,
+            created_at=user.created_at,
+        )
+    
+    def payload(self) -> dict:
+        """Partner fields sent in WebSocket messages."""
+        return {"username": self.username, "level": self.current_level}
+
+
+class ProfileCache:
+    """Process-wide TTL + LRU cache of user profiles.
+    
+    `get_many` answers what it can from memory and loads every miss with a
+    single `IN` query. Entries are dropped when a profile changes in this
+    process; changes made by other processes show up within
+    PROFILE_CACHE_TTL_SECONDS. For REPLICA_READ_AFTER_WRITE_SECONDS after an
+    invalidation, rows read from the replica are returned but not cached, so
+    a lagging replica cannot put the old profile back for a whole TTL.
+    """
+    
+    def __init__(
+        self,
+        ttl_seconds: Optional[float] = None,
+        max_entries: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl_seconds = settings.profile_cache_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self.max_entries = max_entries or settings.profile_cache_max_entries
+        self.clock = clock
+        # {user_id: (expires_at, profile)}, least recently used first
+        self._entries: "OrderedDict[str, Tuple[float, UserProfile]]" = OrderedDict()
+        # {user_id: deadline} for users changed here whose replica rows may be stale
+        self._changed_until: Dict[str, float] = {}
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, user_id) -> Optional[UserProfile]:
+        """The cached profile, without touching the database."""
+        key = str(user_id)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= self.clock():
+            if entry is not None:
+                del self._entries[key]
+            PROFILE_CACHE_LOOKUPS.labels("miss").inc()
+            return None
+        self._entries.move_to_end(key)
+        PROFILE_CACHE_LOOKUPS.labels("hit").inc()
+        return entry[1]
+    
+    def put(self, user: User) -> UserProfile:
+        """Cache a freshly loaded or written user."""
+        profile = UserProfile.from_user(user)
+        if self.ttl_seconds <= 0:
+            return profile
+        key = str(user.id)
+        self._entries[key] = (self.clock() + self.ttl_seconds, profile)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        PROFILE_CACHE_ENTRIES.set(len(self._entries))
+        return profile
+    
+    def invalidate(self, *user_ids):
+        """Forget users whose profile changed."""
+        now = self.clock()
+        for user_id in user_ids:
+            self._entries.pop(str(user_id), None)
+            self._changed_until[str(user_id)] = now + settings.replica_read_after_write_seconds
+        PROFILE_CACHE_ENTRIES.set(len(self._entries))
+        
+        # Drop expired marks so the map stays proportional to recent writers
+        if len(self._changed_until) > 1024:
+            for stale_key in [k for k, until in self._changed_until.items() if until <= now]:
+                del self._changed_until[stale_key]
+    
+    def _may_be_stale(self, db: AsyncSession, user_id: str) -> bool:
+        """Whether `db` reads a replica that may not have this user's last change yet."""
+        if database.replica_engine is database.engine or db.bind is not database.replica_engine:
+            return False
+        until = self._changed_until.get(user_id)
+        if until is None:
+            return False
+        if until > self.clock():
+            return True
+        del self._changed_until[user_id]
+        return False
+    
+    async def get_many(self, db: AsyncSession, user_ids: Iterable) -> Dict[str, UserProfile]:
+        """Profiles by str(user_id); unknown users are left out."""
+        profiles: Dict[str, UserProfile] = {}
+        misses = []
+        for user_id in dict.fromkeys(str(user_id) for user_id in user_ids):
+            profile = self.get(user_id)
+            if profile is None:
+                misses.append(user_id)
+            else:
+                profiles[user_id] = profile
+        
+        if misses:
+            result = await db.execute(select(User).where(User.id.in_(misses)))
+            for user in result.scalars():
+                key = str(user.id)
+                if self._may_be_stale(db, key):
+                    profiles[key] = UserProfile.from_user(user)
+                else:
+                    profiles[key] = self.put(user)
+        return profiles
+    
+    async def get_one(self, db: AsyncSession, user_id) -> Optional[UserProfile]:
+        return (await self.get_many(db, [user_id])).get(str(user_id))
+
+
+# Global cache instance
+profile_cache = ProfileCache()
@@ -0,0 +1,119 @@
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import List
+
+from app.config import settings
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is requested while another one is running."""
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = os.sep.join(code.co_filename.split(os.sep)[-2:])
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def _thread_stack(frame) -> List[str]:
+    """Root-first labels for a thread's current frame chain."""
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _task_stack(task: asyncio.Task) -> List[str]:
+    """Root-first labels following a task's chain of awaited coroutines."""
+    stack = []
+    coro = task.get_coro()
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        stack.append(_frame_label(frame))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return stack
+
+
+class SamplingProfiler:
+    """Statistical profiler producing collapsed stacks for flamegraph tools.
+
+    A daemon thread samples the event loop thread through sys._current_frames,
+    and a coroutine on the loop samples asyncio tasks' await chains. Walking
+    tasks happens on the loop itself, so it runs at the coarser
+    PROFILER_TASK_INTERVAL_MS and looks at no more than PROFILER_MAX_TASKS
+    tasks per sample, picked at random so the proportions stay unbiased.
+    Nothing runs between profiles, so it is safe to leave enabled.
+    """
+
+    def __init__(self):
+        self._running = False
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    async def profile(self, seconds: float, interval: float, include_tasks: bool = True) -> str:
+        """Sample for `seconds` and return stacks as "frame;frame;frame count" lines."""
+        if self._running:
+            raise ProfilerBusy()
+
+        self._running = True
+        try:
+            thread_samples: Counter = Counter()
+            task_samples: Counter = Counter()
+            loop_thread_id = threading.get_ident()
+            stop = threading.Event()
+            sampler = threading.Thread(
+                target=self._sample_thread,
+                args=(loop_thread_id, interval, stop, thread_samples),
+                name="sampling-profiler",
+                daemon=True,
+            )
+            sampler.start()
+
+            try:
+                deadline = time.monotonic() + seconds
+                task_interval = max(interval, settings.profiler_task_interval_ms / 1000)
+                while time.monotonic() < deadline:
+                    if include_tasks:
+                        self._sample_tasks(task_samples, settings.profiler_max_tasks)
+                    await asyncio.sleep(min(task_interval, max(deadline - time.monotonic(), 0)))
+            finally:
+                stop.set()
+                await asyncio.to_thread(sampler.join)
+
+            samples = thread_samples + task_samples
+            return "".join(f"{stack} {count}\n" for stack, count in samples.most_common())
+        finally:
+            self._running = False
+
+    @staticmethod
+    def _sample_thread(thread_id: int, interval: float, stop: threading.Event, samples: Counter):
+        while not stop.wait(interval):
+            frame = sys._current_frames().get(thread_id)
+            if frame is not None:
+                samples["thread:event_loop;" + ";".join(_thread_stack(frame))] += 1
+
+    @staticmethod
+    def _sample_tasks(samples: Counter, max_tasks: int):
+        current = asyncio.current_task()
+        tasks = [task for task in asyncio.all_tasks() if task is not current and not task.done()]
+        if len(tasks) > max_tasks:
+            tasks = random.sample(tasks, max_tasks)
+        for task in tasks:
+            stack = _task_stack(task)
+            if stack:
+                samples["asyncio;" + ";".join(stack)] += 1
+
+
+# Global profiler instance
+profiler = SamplingProfiler()
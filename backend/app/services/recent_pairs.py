@@ -0,0 +1,105 @@
+import hashlib
+import math
+import time
+from typing import Callable, List, Optional
+
+from app.config import settings
+from app.utils.metrics import registry
+
+RECENT_PAIR_HITS = registry.counter(
+    "recent_pairs_hits_total", "Candidate pairs skipped because they were matched recently"
+)
+
+
+class _BloomFilter:
+    """Fixed-size Bloom filter over 128-bit keys using double hashing."""
+    
+    __slots__ = ("bits", "size", "hashes")
+    
+    def __init__(self, size: int, hashes: int):
+        self.bits = bytearray((size + 7) // 8)
+        self.size = size
+        self.hashes = hashes
+    
+    def _positions(self, h1: int, h2: int):
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+    
+    def add(self, h1: int, h2: int):
+        for position in self._positions(h1, h2):
+            self.bits[position >> 3] |= 1 << (position & 7)
+    
+    def __contains__(self, key) -> bool:
+        h1, h2 = key
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(h1, h2))
+
+
+class RecentPairs:
+    """Time-decayed set of user pairs matched lately, in constant memory.
+    
+    A rotating Bloom filter: `generations` filters each cover an equal slice
+    of `ttl_seconds`. New pairs go into the newest one and the oldest is
+    dropped on rotation, so a pair is remembered for between
+    ttl * (generations - 1) / generations and ttl seconds. False positives
+    (at most `error_rate` while a generation holds `capacity` pairs) only
+    make a pairing look repeated.
+    """
+    
+    def __init__(
+        self,
+        capacity: Optional[int] = None,
+        error_rate: Optional[float] = None,
+        ttl_seconds: Optional[float] = None,
+        generations: int = 2,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        capacity = capacity or settings.recent_pairs_capacity
+        error_rate = error_rate or settings.recent_pairs_error_rate
+        self.ttl_seconds = settings.recent_pairs_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self.clock = clock
+        # Optimal Bloom parameters for `capacity` keys at `error_rate`
+        self._size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self._hashes = max(1, round(self._size / capacity * math.log(2)))
+        self._generation_seconds = self.ttl_seconds / generations
+        self._filters: List[_BloomFilter] = [_BloomFilter(self._size, self._hashes) for _ in range(generations)]
+        self._rotated_at = clock()
+    
+    @property
+    def memory_bytes(self) -> int:
+        return sum(len(f.bits) for f in self._filters)
+    
+    @staticmethod
+    def _key(user1_id, user2_id):
+        """Order-independent 128-bit digest of a pair, split for double hashing."""
+        a, b = sorted((str(user1_id), str(user2_id)))
+        digest = hashlib.blake2b(f"{a}:{b}".encode(), digest_size=16).digest()
+        return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+    
+    def _rotate(self):
+        if self.ttl_seconds <= 0:
+            return
+        elapsed = self.clock() - self._rotated_at
+        if elapsed < self._generation_seconds:
+            return
+        steps = min(int(elapsed // self._generation_seconds), len(self._filters))
+        for _ in range(steps):
+            self._filters.pop(0)
+            self._filters.append(_BloomFilter(self._size, self._hashes))
+        self._rotated_at += int(elapsed // self._generation_seconds) * self._generation_seconds
+    
+    def add(self, user1_id, user2_id):
+        """Remember that two users were just matched."""
+        if self.ttl_seconds <= 0:
+            return
+        self._rotate()
+        self._filters[-1].add(*self._key(user1_id, user2_id))
+    
+    def seen(self, user1_id, user2_id) -> bool:
+        """Whether the two users were (probably) matched within the TTL."""
+        if self.ttl_seconds <= 0:
+            return False
+        self._rotate()
+        key = self._key(user1_id, user2_id)
+        if any(key in f for f in self._filters):
+            RECENT_PAIR_HITS.inc()
+            return True
+        return False
@@ -0,0 +1,195 @@
+"""Supervised periodic background jobs.
+
+Each job runs in its own task, one run at a time: it waits (a fixed
+interval or a job-supplied wake-up), runs under a timeout, and after a
+failure retries with jittered exponential backoff instead of its normal
+schedule. A hung run is cancelled at the timeout rather than stalling the
+job forever. Run durations and outcomes are exported as metrics and
+GET /admin/jobs shows each job's state.
+"""
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.config import settings
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+JOB_RUN_SECONDS = registry.histogram(
+    "background_job_run_seconds", "Duration of background job runs", ["job"],
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0),
+)
+JOB_RUNS = registry.counter(
+    "background_job_runs_total", "Background job runs by outcome (ok, error, timeout, skipped)", ["job", "outcome"]
+)
+JOB_CONSECUTIVE_FAILURES = registry.gauge(
+    "background_job_consecutive_failures", "Failed runs in a row per background job", ["job"]
+)
+
+JobFn = Callable[[], Awaitable[None]]
+
+
+class Job:
+    """A periodic coroutine with a timeout, failure backoff and run statistics."""
+    
+    def __init__(
+        self,
+        name: str,
+        fn: JobFn,
+        interval: Optional[float] = None,
+        wake: Optional[JobFn] = None,
+        timeout: Optional[float] = None,
+        backoff_base: Optional[float] = None,
+        backoff_max: Optional[float] = None,
+    ):
+        if interval is None and wake is None:
+            raise ValueError(f"Job {name} needs an interval or a wake function")
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        # Awaited between runs instead of sleeping `interval`
+        self.wake = wake
+        self.timeout = settings.job_timeout_seconds if timeout is None else timeout
+        self.backoff_base = settings.job_backoff_base_seconds if backoff_base is None else backoff_base
+        self.backoff_max = settings.job_backoff_max_seconds if backoff_max is None else backoff_max
+        
+        self.runs = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_started_at: Optional[datetime] = None
+        self.last_duration_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.next_run_at: Optional[datetime] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+    
+    @property
+    def running(self) -> bool:
+        """Whether a run is in progress."""
+        return self._lock.locked()
+    
+    @property
+    def started(self) -> bool:
+        return self._task is not None
+    
+    async def start(self):
+        """Start the job's loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+    
+    async def stop(self):
+        """Stop the loop, cancelling a run in progress."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.next_run_at = None
+    
+    def backoff_delay(self) -> float:
+        """Delay before retrying after the current run of failures."""
+        delay = min(self.backoff_base * 2 ** max(self.consecutive_failures - 1, 0), self.backoff_max)
+        # Jitter so jobs failing on a shared dependency don't retry in lockstep
+        return delay * random.uniform(0.5, 1.5)
+    
+    async def _loop(self):
+        while True:
+            if self.consecutive_failures:
+                delay = self.backoff_delay()
+                self.next_run_at = datetime.utcnow() + timedelta(seconds=delay)
+                await asyncio.sleep(delay)
+            elif self.wake is not None:
+                self.next_run_at = None
+                await self.wake()
+            else:
+                self.next_run_at = datetime.utcnow() + timedelta(seconds=self.interval)
+                await asyncio.sleep(self.interval)
+            await self.run_once()
+    
+    async def run_once(self) -> bool:
+        """Run the job now unless a run is already in progress. Returns whether it succeeded."""
+        if self._lock.locked():
+            JOB_RUNS.labels(self.name, "skipped").inc()
+            return False
+        async with self._lock:
+            self.last_started_at = datetime.utcnow()
+            start = time.perf_counter()
+            outcome = "ok"
+            try:
+                if self.timeout > 0:
+                    await asyncio.wait_for(self.fn(), self.timeout)
+                else:
+                    await self.fn()
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+                self.last_error = f"timed out after {self.timeout:.1f}s"
+            except Exception as e:
+                outcome = "error"
+                self.last_error = f"{type(e).__name__}: {e}"
+            finally:
+                self.last_duration_seconds = time.perf_counter() - start
+                JOB_RUN_SECONDS.labels(self.name).observe(self.last_duration_seconds)
+            
+            self.runs += 1
+            JOB_RUNS.labels(self.name, outcome).inc()
+            if outcome == "ok":
+                self.consecutive_failures = 0
+            else:
+                self.failures += 1
+                self.consecutive_failures += 1
+                logger.error("Job %s failed (%d in a row): %s", self.name, self.consecutive_failures, self.last_error)
+            JOB_CONSECUTIVE_FAILURES.labels(self.name).set(self.consecutive_failures)
+            return outcome == "ok"
+    
+    def snapshot(self) -> dict:
+        """State for the admin view."""
+        def iso(value: Optional[datetime]) -> Optional[str]:
+            return value.isoformat() if value else None
+        
+        return {
+            "name": self.name,
+            "state": "running" if self.running else "waiting" if self.started else "stopped",
+            "interval_seconds": self.interval,
+            "timeout_seconds": self.timeout,
+            "runs": self.runs,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "last_started_at": iso(self.last_started_at),
+            "last_duration_seconds": self.last_duration_seconds,
+            "last_error": self.last_error,
+            "next_run_at": iso(self.next_run_at),
+        }
+
+
+class JobSupervisor:
+    """Registry of this process's background jobs."""
+    
+    def __init__(self):
+        self.jobs: Dict[str, Job] = {}
+    
+    def register(self, name: str, fn: JobFn, **options) -> Job:
+        """Create a job, replacing a stopped one of the same name. Call `start()` on it to run it."""
+        existing = self.jobs.get(name)
+        if existing is not None and existing.started:
+            raise ValueError(f"Job {name} is already running")
+        job = Job(name, fn, **options)
+        self.jobs[name] = job
+        return job
+    
+    async def stop(self):
+        """Stop every job."""
+        for job in self.jobs.values():
+            await job.stop()
+    
+    def snapshot(self) -> List[dict]:
+        return [job.snapshot() for job in self.jobs.values()]
+
+
+# Global supervisor instance
+supervisor = JobSupervisor()
@@ -0,0 +1,64 @@
+"""Graceful shutdown: drain the worker before the server closes its sockets.
+
+Uvicorn closes every WebSocket as soon as it begins shutting down, before the
+lifespan shutdown hook runs. To get a reconnect hint to clients first, SIGTERM
+is intercepted: the worker drains, then the signal is passed on to uvicorn.
+
+This relies on uvicorn >= 0.29 installing its handler with `signal.signal`.
+Older versions register it on the event loop, where it runs alongside ours
+and closes the sockets while the drain is still in progress.
+"""
+import asyncio
+import logging
+import signal
+import threading
+from typing import Optional
+
+from app.config import settings
+from app.services.load_shedding import admission_controller
+from app.services.matchmaking import matchmaking_service
+
+logger = logging.getLogger(__name__)
+
+_drain_task: Optional[asyncio.Task] = None
+
+
+def begin_drain() -> asyncio.Task:
+    """Stop taking new work and drain matchmaking (safe to call repeatedly)."""
+    global _drain_task
+    if _drain_task is None:
+        logger.info("Draining worker")
+        admission_controller.start_draining()
+        _drain_task = asyncio.create_task(matchmaking_service.drain(settings.matchmaking_state_file))
+    return _drain_task
+
+
+def install_sigterm_drain():
+    """Drain on SIGTERM, then hand the signal to the previous handler."""
+    # Signal handlers can only be installed from the main thread
+    if threading.current_thread() is not threading.main_thread():
+        return
+    
+    loop = asyncio.get_running_loop()
+    previous = signal.getsignal(signal.SIGTERM)
+    received = []
+    
+    def pass_on(signum):
+        signal.signal(signum, previous)
+        if callable(previous):
+            previous(signum, None)
+        else:
+            signal.raise_signal(signum)
+    
+    def start():
+        begin_drain().add_done_callback(lambda _: pass_on(signal.SIGTERM))
+    
+    def handle(signum, frame):
+        if received:
+            # Second SIGTERM: stop waiting for the drain
+            pass_on(signum)
+            return
+        received.append(signum)
+        loop.call_soon_threadsafe(start)
+    
+    signal.signal(signal.SIGTERM, handle)
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import settings
+from app.database import engine, replica_engine, AsyncSessionLocal
+from app.models.user import User
+from app.models.session import QueueEntry, QueueMode, Session
+from app.utils.metrics import registry
+from app.utils.query_tracking import query_scope
+
+logger = logging.getLogger(__name__)
+
+WARMUP_SECONDS = registry.gauge(
+    "startup_warmup_seconds", "Time spent warming the connection pool and statement cache"
+)
+
+
+def hot_queries():
+    """Statements run on nearly every request or round, with placeholder parameters."""
+    placeholder_id = uuid.uuid4()
+    return [
+        select(User).where(User.id == placeholder_id),
+        select(User).where(User.email == ""),
+        select(QueueEntry).where(
+            QueueEntry.user_id == placeholder_id,
+            QueueEntry.is_active == True
+        ),
+        select(func.count(QueueEntry.id)).where(
+            QueueEntry.mode == QueueMode.ROULETTE,
+            QueueEntry.is_active == True,
+            QueueEntry.joined_at <= datetime.utcnow()
+        ),
+        select(QueueEntry)
+        .where(
+            QueueEntry.mode == QueueMode.ROULETTE,
+            QueueEntry.is_active == True
+        )
+        .order_by(QueueEntry.joined_at),
+        select(Session).where(Session.id == placeholder_id),
+    ]
+
+
+async def warm_pool(target: AsyncEngine, connections: int):
+    """Open connections concurrently so they are waiting idle in the pool."""
+    connections = min(connections, settings.db_pool_size)
+    if connections <= 0:
+        return
+    opened = await asyncio.gather(
+        *(target.connect() for _ in range(connections)), return_exceptions=True
+    )
+    failures = [conn for conn in opened if isinstance(conn, BaseException)]
+    for conn in opened:
+        if not isinstance(conn, BaseException):
+            await conn.close()
+    if failures:
+        raise failures[0]
+
+
+async def compile_hot_queries(target: AsyncEngine):
+    """Execute the hot queries once so the engine's compiled cache holds them."""
+    async with AsyncSessionLocal(bind=target) as db:
+        for statement in hot_queries():
+            await db.execute(statement)
+        await db.rollback()
+
+
+class StartupWarmup:
+    """Warms the database layer in the background after the app starts.
+    
+    /health reports "starting" while this runs, so a load balancer only sends
+    traffic once connections are open and hot statements are compiled.
+    """
+    
+    def __init__(self):
+        self.in_progress = False
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        """Start warming up if any warmup is configured."""
+        if settings.db_warmup_connections <= 0 and not settings.db_warmup_statements:
+            return
+        self.in_progress = True
+        self._task = asyncio.create_task(self.run())
+    
+    async def stop(self):
+        """Cancel a warmup that is still running."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def run(self):
+        start = time.perf_counter()
+        targets = [engine] if replica_engine is engine else [engine, replica_engine]
+        try:
+            with query_scope("warmup"):
+                for target in targets:
+                    await warm_pool(target, settings.db_warmup_connections)
+                    if settings.db_warmup_statements:
+                        await compile_hot_queries(target)
+        except Exception:
+            # A cold worker is still a working worker
+            logger.exception("Startup warmup failed, serving without it")
+        finally:
+            elapsed = time.perf_counter() - start
+            WARMUP_SECONDS.set(elapsed)
+            self.in_progress = False
+            logger.info("Startup warmup finished in %.3fs", elapsed)
+
+
+# Global instance
+startup_warmup = StartupWarmup()
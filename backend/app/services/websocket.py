@@ -4,14 +4,29 @@ from datetime import datetime
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
 from sqlalchemy import select
 
-from app.database import AsyncSessionLocal
+from app.database import AsyncSessionLocal, mark_read_your_writes
 from app.models.user import User
 from app.models.session import QueueEntry, QueueMode
-from app.services.matchmaking import matchmaking_service
+from app.services.chat_log import chat_log
+from app.services.invites import INVITES, invite_registry
+from app.services.matchmaking import Room, matchmaking_service
+from app.services.load_shedding import admission_controller
+from app.services.presence import disconnect_buffer, presence_lease
+from app.services.profile_cache import profile_cache
 from app.utils.security import decode_token
+from app.utils.metrics import registry
+from app.utils.query_tracking import query_scope
 
 logger = logging.getLogger(__name__)
 
+WS_MESSAGES = registry.counter(
+    "ws_messages_total", "WebSocket messages received by type", ["type"]
+)
+KNOWN_MESSAGE_TYPES = {
+    "join_queue", "leave_queue", "offer", "answer", "ice_candidate",
+    "end_session", "chat", "invite_partner", "invite_response", "invite_cancel", "ping",
+}
+
 router = APIRouter()
 
 
@@ -37,26 +52,47 @@ async def websocket_match_endpoint(
     token: str = Query(...)
 ):
     """WebSocket endpoint for matchmaking and WebRTC signaling."""
-    # Validate token
-    user = await get_user_from_token(token)
-    if not user or str(user.id) != user_id:
-        await websocket.close(code=4001, reason="Invalid authentication")
-        return
-    
-    await websocket.accept()
-    logger.info(f"WebSocket connected: {user.username} ({user_id})")
-    
-    # Register client
-    matchmaking_service.register_client(user_id, websocket)
-    
-    # Update online status
-    async with AsyncSessionLocal() as db:
-        result = await db.execute(select(User).where(User.id == user_id))
-        db_user = result.scalar_one_or_none()
-        if db_user:
-            db_user.is_online = True
-            db_user.last_seen = datetime.utcnow()
-            await db.commit()
+    with query_scope("ws:connect"):
+        # Validate token
+        user = await get_user_from_token(token)
+        if not user or str(user.id) != user_id:
+            await websocket.close(code=4001, reason="Invalid authentication")
+            return
+        
+        # Shed new sessions before doing any more work for them; a participant
+        # coming back to a call in progress is let in regardless
+        retry_after = admission_controller.check_connection(
+            len(matchmaking_service.connected_clients), resuming=matchmaking_service.in_call(user_id)
+        )
+        if retry_after is not None:
+            await websocket.accept()
+            await websocket.send_json({"type": "server_busy", "data": {"retry_after": retry_after}})
+            await websocket.close(code=1013, reason="Server busy")
+            return
+        
+        await websocket.accept()
+        logger.debug("WebSocket connected: %s (%s)", user.username, user_id)
+        
+        # Register client
+        matchmaking_service.register_client(user_id, websocket)
+        
+        # Update online status, unless a pending disconnect was cancelled and
+        # the database never saw the user go offline
+        if not disconnect_buffer.cancel(user_id):
+            async with AsyncSessionLocal() as db:
+                result = await db.execute(select(User).where(User.id == user_id))
+                db_user = result.scalar_one_or_none()
+                if db_user:
+                    db_user.is_online = True
+                    db_user.presence_epoch = presence_lease.epoch
+                    db_user.last_seen = datetime.utcnow()
+                    await db.commit()
+                    mark_read_your_writes(websocket)
+        
+        # Control events missed while away, then any call whose socket dropped:
+        # restore it instead of re-matching
+        if not await matchmaking_service.deliver_mailbox(user_id):
+            await matchmaking_service.resume_session(user_id)
     
     try:
         while True:
@@ -65,55 +101,53 @@ async def websocket_match_endpoint(
             
             message_type = message.get("type")
             message_data = message.get("data", {})
+            label = message_type if message_type in KNOWN_MESSAGE_TYPES else "unknown"
+            WS_MESSAGES.labels(label).inc()
             
-            if message_type == "join_queue":
-                await handle_join_queue(websocket, user_id, message_data)
-            
-            elif message_type == "leave_queue":
-                await handle_leave_queue(websocket, user_id)
-            
-            elif message_type in ["offer", "answer", "ice_candidate"]:
-                await handle_signaling(websocket, user_id, message_type, message_data)
-            
-            elif message_type == "end_session":
-                await handle_end_session(websocket, user_id, message_data)
-            
-            elif message_type == "chat":
-                await handle_chat(websocket, user_id, message_data)
-            
-            elif message_type == "invite_partner":
-                await handle_invite_partner(websocket, user_id, message_data)
-            
-            elif message_type == "invite_response":
-                await handle_invite_response(websocket, user_id, message_data)
-            
-            elif message_type == "ping":
-                await websocket.send_json({"type": "pong"})
+            with query_scope(f"ws:{label}"):
+                await dispatch_message(websocket, user_id, message_type, message_data)
     
     except WebSocketDisconnect:
-        logger.info(f"WebSocket disconnected: {user_id}")
+        logger.debug("WebSocket disconnected: %s", user_id)
     except Exception as e:
-        logger.error(f"WebSocket error for {user_id}: {e}")
+        logger.error("WebSocket error for %s: %s", user_id, e)
     finally:
-        matchmaking_service.unregister_client(user_id)
-        
-        async with AsyncSessionLocal() as db:
-            result = await db.execute(select(User).where(User.id == user_id))
-            db_user = result.scalar_one_or_none()
-            if db_user:
-                db_user.is_online = False
-                db_user.last_seen = datetime.utcnow()
-            
-            queue_result = await db.execute(
-                select(QueueEntry).where(
-                    QueueEntry.user_id == user_id,
-                    QueueEntry.is_active == True
-                )
-            )
-            for entry in queue_result.scalars().all():
-                entry.is_active = False
-            
-            await db.commit()
+        if matchmaking_service.unregister_client(user_id, websocket):
+            # Written in bulk by the presence flusher. While draining, queued
+            # users keep their place for the next process.
+            disconnect_buffer.schedule(user_id, leave_queue=not admission_controller.draining)
+            if not admission_controller.draining:
+                await matchmaking_service.hold_room(user_id)
+
+
+async def dispatch_message(websocket: WebSocket, user_id: str, message_type: str, message_data: dict):
+    """Route one client message to its handler."""
+    if message_type == "join_queue":
+        await handle_join_queue(websocket, user_id, message_data)
+    
+    elif message_type == "leave_queue":
+        await handle_leave_queue(websocket, user_id)
+    
+    elif message_type in ["offer", "answer", "ice_candidate"]:
+        await handle_signaling(websocket, user_id, message_type, message_data)
+    
+    elif message_type == "end_session":
+        await handle_end_session(websocket, user_id, message_data)
+    
+    elif message_type == "chat":
+        await handle_chat(websocket, user_id, message_data)
+    
+    elif message_type == "invite_partner":
+        await handle_invite_partner(websocket, user_id, message_data)
+    
+    elif message_type == "invite_response":
+        await handle_invite_response(websocket, user_id, message_data)
+    
+    elif message_type == "invite_cancel":
+        await handle_invite_cancel(user_id, message_data)
+    
+    elif message_type == "ping":
+        await websocket.send_json({"type": "pong"})
 
 
 async def handle_join_queue(websocket: WebSocket, user_id: str, data: dict):
@@ -121,6 +155,11 @@ async def handle_join_queue(websocket: WebSocket, user_id: str, data: dict):
     mode = data.get("mode", "roulette")
     level_filter = data.get("level_filter")
     
+    retry_after = admission_controller.check_queue_join()
+    if retry_after is not None:
+        await websocket.send_json({"type": "server_busy", "data": {"retry_after": retry_after}})
+        return
+    
     async with AsyncSessionLocal() as db:
         result = await db.execute(
             select(QueueEntry).where(
@@ -143,6 +182,9 @@ async def handle_join_queue(websocket: WebSocket, user_id: str, data: dict):
         
         db.add(entry)
         await db.commit()
+        # GET /queue/status may read from the replica
+        mark_read_your_writes(websocket)
+        matchmaking_service.note_queue_join()
         
         await websocket.send_json({
             "type": "queue_joined",
@@ -163,6 +205,7 @@ async def handle_leave_queue(websocket: WebSocket, user_id: str):
         if entry:
             entry.is_active = False
             await db.commit()
+            mark_read_your_writes(websocket)
         
         await websocket.send_json({"type": "queue_left"})
 
@@ -176,15 +219,11 @@ async def handle_signaling(websocket: WebSocket, user_id: str, signal_type: str,
         await websocket.send_json({"type": "error", "message": "target_user_id required"})
         return
     
-    if target_user_id in matchmaking_service.connected_clients:
-        try:
-            await matchmaking_service.connected_clients[target_user_id].send_json({
-                "type": signal_type,
-                "from_user_id": user_id,
-                "data": signal_data
-            })
-        except Exception as e:
-            logger.error(f"Signaling error: {e}")
+    await matchmaking_service.send_to_client(target_user_id, {
+        "type": signal_type,
+        "from_user_id": user_id,
+        "data": signal_data
+    })
 
 
 async def handle_end_session(websocket: WebSocket, user_id: str, data: dict):
@@ -204,15 +243,12 @@ async def handle_end_session(websocket: WebSocket, user_id: str, data: dict):
                 await db.commit()
                 
                 partner_id = str(session.user2_id) if str(session.user1_id) == user_id else str(session.user1_id)
+                matchmaking_service.close_session_room(user_id, session_id)
                 
-                if partner_id in matchmaking_service.connected_clients:
-                    try:
-                        await matchmaking_service.connected_clients[partner_id].send_json({
-                            "type": "session_ended",
-                            "data": {"session_id": str(session_id)}
-                        })
-                    except:
-                        pass
+                await matchmaking_service.send_to_client(partner_id, {
+                    "type": "session_ended",
+                    "data": {"session_id": str(session_id)}
+                })
         
         await websocket.send_json({"type": "session_ended", "data": {"session_id": session_id}})
 
@@ -225,16 +261,17 @@ async def handle_chat(websocket: WebSocket, user_id: str, data: dict):
     if not target_user_id or not chat_message:
         return
     
-    if target_user_id in matchmaking_service.connected_clients:
-        try:
-            await matchmaking_service.connected_clients[target_user_id].send_json({
-                "type": "chat",
-                "from_user_id": user_id,
-                "message": chat_message,
-                "timestamp": datetime.utcnow().isoformat()
-            })
-        except Exception as e:
-            logger.error(f"Chat error: {e}")
+    # Keep the transcript of messages between call partners
+    room = matchmaking_service.active_rooms.get(matchmaking_service.user_rooms.get(user_id, ""))
+    if room is not None and room.partner_of(user_id) == str(target_user_id):
+        chat_log.append(room.session_id, user_id, str(chat_message))
+    
+    await matchmaking_service.send_to_client(target_user_id, {
+        "type": "chat",
+        "from_user_id": user_id,
+        "message": chat_message,
+        "timestamp": datetime.utcnow().isoformat()
+    })
 
 
 async def handle_invite_partner(websocket: WebSocket, user_id: str, data: dict):
@@ -255,34 +292,67 @@ async def handle_invite_partner(websocket: WebSocket, user_id: str, data: dict):
         })
         return
     
-    # Get inviter info
+    inviter = await _user_profile(user_id)
+    if not inviter:
+        return
+    
+    # Clicking invite again while the partner has not answered sends nothing new
+    if invite_registry.create(user_id, partner_user_id, inviter) is None:
+        await websocket.send_json({
+            "type": "invite_sent",
+            "message": "Taklif yuborildi!"
+        })
+        return
+    
+    # Send invite to partner
+    sent = await matchmaking_service.send_to_client(partner_user_id, {
+        "type": "partner_invite",
+        "from_user_id": user_id,
+        "from_username": inviter["username"],
+        "from_level": inviter["level"],
+        "timestamp": datetime.utcnow().isoformat()
+    })
+    
+    # A partner who dropped just now gets it from their mailbox
+    if sent or partner_user_id in matchmaking_service.mailbox:
+        await websocket.send_json({
+            "type": "invite_sent",
+            "message": "Taklif yuborildi!"
+        })
+    else:
+        invite_registry.pop(user_id, partner_user_id)
+        await websocket.send_json({
+            "type": "invite_error",
+            "message": "Taklif yuborishda xatolik"
+        })
+
+
+async def handle_invite_cancel(user_id: str, data: dict):
+    """Withdraw a pending invite."""
+    partner_user_id = data.get("partner_user_id")
+    if not partner_user_id:
+        return
+    
+    partner_user_id = str(partner_user_id).strip()
+    if invite_registry.pop(user_id, partner_user_id) is None:
+        return
+    INVITES.labels("cancelled").inc()
+    
+    matchmaking_service.mailbox.discard(
+        partner_user_id,
+        lambda message: message.get("type") == "partner_invite" and message.get("from_user_id") == user_id,
+    )
+    await matchmaking_service.send_to_client(partner_user_id, {
+        "type": "invite_cancelled",
+        "from_user_id": user_id
+    })
+
+
+async def _user_profile(user_id: str) -> dict | None:
+    """Username and level for invite payloads (a cache hit opens no connection)."""
     async with AsyncSessionLocal() as db:
-        result = await db.execute(select(User).where(User.id == user_id))
-        inviter = result.scalar_one_or_none()
-        
-        if not inviter:
-            return
-        
-        # Send invite to partner
-        try:
-            await matchmaking_service.connected_clients[partner_user_id].send_json({
-                "type": "partner_invite",
-                "from_user_id": user_id,
-                "from_username": inviter.username,
-                "from_level": inviter.current_level,
-                "timestamp": datetime.utcnow().isoformat()
-            })
-            
-            await websocket.send_json({
-                "type": "invite_sent",
-                "message": "Taklif yuborildi!"
-            })
-        except Exception as e:
-            logger.error(f"Invite error: {e}")
-            await websocket.send_json({
-                "type": "invite_error",
-                "message": "Taklif yuborishda xatolik"
-            })
+        profile = await profile_cache.get_one(db, user_id)
+    return profile.payload() if profile else None
 
 
 async def handle_invite_response(websocket: WebSocket, user_id: str, data: dict):
@@ -298,32 +368,31 @@ async def handle_invite_response(websocket: WebSocket, user_id: str, data: dict)
     
     inviter_user_id = str(inviter_user_id).strip()
     
+    # Only an invite that is still pending can be answered
+    invite = invite_registry.pop(inviter_user_id, user_id)
+    if invite is None:
+        await websocket.send_json({"type": "invite_error", "message": "Taklif muddati tugagan"})
+        return
+    
     if not accepted:
+        INVITES.labels("rejected").inc()
         # Notify inviter that invite was rejected
-        if inviter_user_id in matchmaking_service.connected_clients:
-            try:
-                await matchmaking_service.connected_clients[inviter_user_id].send_json({
-                    "type": "invite_rejected",
-                    "message": "Taklif rad etildi"
-                })
-            except Exception:
-                pass
+        await matchmaking_service.send_to_client(inviter_user_id, {
+            "type": "invite_rejected",
+            "message": "Taklif rad etildi"
+        })
         return
     
     # Invite accepted - create session
+    INVITES.labels("accepted").inc()
+    inviter = invite.inviter
     try:
+        accepter = await _user_profile(user_id)
+        if not accepter:
+            logger.warning("Invite accept: user not found accepter=%s", user_id)
+            return
+        
         async with AsyncSessionLocal() as db:
-            # Get both users
-            inviter_result = await db.execute(select(User).where(User.id == inviter_user_id))
-            inviter = inviter_result.scalar_one_or_none()
-            
-            accepter_result = await db.execute(select(User).where(User.id == user_id))
-            accepter = accepter_result.scalar_one_or_none()
-            
-            if not inviter or not accepter:
-                logger.warning(f"Invite accept: user not found inviter={inviter_user_id} accepter={user_id}")
-                return
-            
             # Create session (mode required by model - use ROULETTE for partner invite)
             room_id = f"room_{uuid.uuid4().hex[:12]}"
             session = Session(
@@ -337,11 +406,22 @@ async def handle_invite_response(websocket: WebSocket, user_id: str, data: dict)
             await db.commit()
             await db.refresh(session)
             
+            matchmaking_service.open_room(Room(
+                room_id=room_id,
+                session_id=str(session.id),
+                initiator_id=inviter_user_id,
+                responder_id=user_id,
+                profiles={
+                    inviter_user_id: inviter,
+                    user_id: accepter,
+                },
+            ))
+            
             # Notify both users (must be inside block to use inviter, accepter, session)
             match_data_for_inviter = {
                 "partner_id": str(user_id),
-                "partner_username": accepter.username,
-                "partner_level": accepter.current_level,
+                "partner_username": accepter["username"],
+                "partner_level": accepter["level"],
                 "room_id": room_id,
                 "session_id": str(session.id),
                 "is_initiator": True
@@ -349,22 +429,18 @@ async def handle_invite_response(websocket: WebSocket, user_id: str, data: dict)
             
             match_data_for_accepter = {
                 "partner_id": str(inviter_user_id),
-                "partner_username": inviter.username,
-                "partner_level": inviter.current_level,
+                "partner_username": inviter["username"],
+                "partner_level": inviter["level"],
                 "room_id": room_id,
                 "session_id": str(session.id),
                 "is_initiator": False
             }
             
             # Send to inviter
-            if inviter_user_id in matchmaking_service.connected_clients:
-                try:
-                    await matchmaking_service.connected_clients[inviter_user_id].send_json({
-                        "type": "matched",
-                        "data": match_data_for_inviter
-                    })
-                except Exception as e:
-                    logger.error(f"Error notifying inviter: {e}")
+            await matchmaking_service.send_to_client(inviter_user_id, {
+                "type": "matched",
+                "data": match_data_for_inviter
+            })
             
             # Send to accepter
             try:
@@ -373,9 +449,9 @@ async def handle_invite_response(websocket: WebSocket, user_id: str, data: dict)
                     "data": match_data_for_accepter
                 })
             except Exception as e:
-                logger.error(f"Error notifying accepter: {e}")
+                logger.warning("Error notifying accepter: %s", e)
     except Exception as e:
-        logger.error(f"Invite accept error: {e}", exc_info=True)
+        logger.error("Invite accept error: %s", e, exc_info=True)
         try:
             await websocket.send_json({"type": "invite_error", "message": "Sessiya yaratishda xatolik"})
         except Exception:
@@ -0,0 +1,114 @@
+"""Logging pipeline: records are queued on the event loop and written by a
+background listener thread, so handler I/O never blocks request handling."""
+import json
+import logging
+import queue
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+
+from app.config import settings
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            payload["suppressed"] = suppressed
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """Let one record per (logger, message template) through per window.
+
+    Only applies to WARNING and above, where a flapping client can produce the
+    same error thousands of times a second. The next record that passes after
+    a window carries the number of suppressed duplicates.
+    """
+
+    def __init__(self, window_seconds: float):
+        super().__init__()
+        self.window_seconds = window_seconds
+        # {(logger, template): (window start, suppressed count)}
+        self._seen: Dict[Tuple[str, str], Tuple[float, int]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING or self.window_seconds <= 0:
+            return True
+
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        window = self._seen.get(key)
+        if window is not None and now - window[0] < self.window_seconds:
+            self._seen[key] = (window[0], window[1] + 1)
+            return False
+
+        if window is not None and window[1]:
+            record.suppressed = window[1]
+            record.msg = f"{record.msg} (suppressed {window[1]} similar)"
+        self._seen[key] = (now, 0)
+
+        if len(self._seen) > 10000:
+            self._seen.clear()
+        return True
+
+
+def _parse_levels(spec: str) -> Dict[str, str]:
+    """Parse "logger=LEVEL,other=LEVEL" into a dict."""
+    levels = {}
+    for item in spec.split(','):
+        if '=' not in item:
+            continue
+        name, level = item.split('=', 1)
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging() -> QueueListener:
+    """Configure root logging from settings and start the queue listener."""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(JsonFormatter() if settings.log_json else logging.Formatter(TEXT_FORMAT))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(settings.log_rate_limit_seconds))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(settings.log_level.upper())
+
+    for name, level in _parse_levels(settings.log_levels).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,128 @@
+"""Attribute SQL statements to the request or WebSocket message that ran them.
+
+Engine event hooks in app.database call record_query() for every statement.
+The current operation (route path, "ws:<message type>", "matchmaking", ...)
+is carried in a context variable, so counts and latency can be broken down
+per endpoint. A route can declare a query budget with @query_budget(n); with
+DB_QUERY_BUDGET_ENFORCE on (tests), going over it raises QueryBudgetExceeded.
+"""
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+from fastapi import Request
+
+from app.config import settings
+from app.utils.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+DB_QUERY_SECONDS = registry.histogram(
+    "db_query_duration_seconds", "Time spent executing SQL statements", ["operation"]
+)
+DB_QUERIES = registry.counter(
+    "db_queries_total", "SQL statements executed", ["operation"]
+)
+QUERIES_PER_OPERATION = registry.histogram(
+    "db_queries_per_operation", "SQL statements per request or WebSocket message", ["operation"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100),
+)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised in enforcement mode when an operation runs too many statements."""
+
+
+class QueryScope:
+    """Statements executed while handling one operation."""
+
+    __slots__ = ("operation", "budget", "count", "statements")
+
+    def __init__(self, operation: str, budget: Optional[int] = None):
+        self.operation = operation
+        self.budget = budget
+        self.count = 0
+        self.statements: List[str] = []
+
+
+_current_scope: ContextVar[Optional[QueryScope]] = ContextVar("query_scope", default=None)
+
+
+def parameter_shape(parameters, executemany: bool = False):
+    """Describe bound parameters by type only, so logs never carry values."""
+    if executemany and parameters:
+        return {"rows": len(parameters), "row": parameter_shape(parameters[0])}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def record_query(statement: str, parameters, executemany: bool, elapsed: float):
+    """Account one executed statement to the current operation."""
+    scope = _current_scope.get()
+    operation = scope.operation if scope else "background"
+
+    DB_QUERIES.labels(operation).inc()
+    DB_QUERY_SECONDS.labels(operation).observe(elapsed)
+
+    if scope is not None:
+        scope.count += 1
+        if settings.db_query_budget_enforce:
+            scope.statements.append(statement)
+
+    if elapsed * 1000 >= settings.db_slow_query_ms > 0:
+        logger.warning(
+            "Slow query %.1fms in %s: %s params=%s",
+            elapsed * 1000, operation, " ".join(statement.split()),
+            parameter_shape(parameters, executemany),
+        )
+
+
+def _check_budget(scope: QueryScope):
+    if scope.budget is None or scope.count <= scope.budget:
+        return
+    message = f"{scope.operation} ran {scope.count} queries (budget {scope.budget})"
+    if settings.db_query_budget_enforce:
+        raise QueryBudgetExceeded(message + ":\n" + "\n".join(scope.statements))
+    logger.warning(message)
+
+
+@contextmanager
+def query_scope(operation: str, budget: Optional[int] = None):
+    """Attribute statements run inside the block to an operation."""
+    scope = QueryScope(operation, budget)
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+        QUERIES_PER_OPERATION.labels(operation).observe(scope.count)
+    _check_budget(scope)
+
+
+def query_budget(max_queries: int):
+    """Declare the maximum number of statements a route may execute."""
+    def decorator(endpoint):
+        endpoint.query_budget = max_queries
+        return endpoint
+    return decorator
+
+
+def _route_label(request: Request, route) -> str:
+    """Method plus full path template, e.g. "GET /users/{user_id}"."""
+    # route.path already includes the include_router prefix
+    return f"{request.method} {route.path}"
+
+
+async def track_queries(request: Request):
+    """Router dependency that scopes statements to the matched route."""
+    route = request.scope.get("route")
+    operation = _route_label(request, route) if route else request.url.path
+    budget = getattr(getattr(route, "endpoint", None), "query_budget", None)
+    if budget is None and settings.db_query_budget_default > 0:
+        budget = settings.db_query_budget_default
+
+    with query_scope(operation, budget):
+        yield
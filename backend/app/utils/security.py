@@ -8,7 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from app.config import settings
-from app.database import get_db
+from app.database import get_db, get_read_db
 
 # Password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -51,11 +51,8 @@ def decode_token(token: str) -> Optional[dict]:
         return None
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_db)
-):
-    """Get current authenticated user from JWT token."""
+async def _load_user_from_token(token: str, db: AsyncSession):
+    """Resolve the user referenced by a JWT token."""
     from app.models.user import User  # Import here to avoid circular imports
     
     credentials_exception = HTTPException(
@@ -82,6 +79,32 @@ async def get_current_user(
     return user
 
 
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get current authenticated user from JWT token."""
+    return await _load_user_from_token(token, db)
+
+
+async def get_current_user_read(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Get current user through the read session (for read-only handlers)."""
+    return await _load_user_from_token(token, db)
+
+
+async def get_admin_user(current_user = Depends(get_current_user)):
+    """Ensure the current user is listed in ADMIN_EMAILS."""
+    if current_user.email.lower() not in settings.admin_emails_list:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return current_user
+
+
 async def get_current_active_user(current_user = Depends(get_current_user)):
     """Ensure the current user is active."""
     # You could add additional checks here (e.g., is_active flag)
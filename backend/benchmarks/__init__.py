@@ -0,0 +1 @@
+# Benchmarks and load tools (run from backend/, e.g. python -m benchmarks.matchmaking_sim)
@@ -0,0 +1,115 @@
+"""In-memory stand-in for the database, used to drive MatchmakingService
+without Postgres."""
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from app.models.session import QueueEntry, QueueMode, Session
+from app.models.user import User
+from app.services.matchmaking import MatchmakingService
+from app.services.profile_cache import UserProfile
+from app.services.recent_pairs import RecentPairs
+
+
+class FakeStore:
+    """Users, queue entries and sessions kept in plain Python containers."""
+
+    def __init__(self):
+        self.users: Dict[uuid.UUID, User] = {}
+        self.queue: List[QueueEntry] = []
+        self.sessions: List[Session] = []
+
+    def add_user(self, level: float) -> User:
+        user = User(
+            id=uuid.uuid4(),
+            email="",
+            password_hash="",
+            username=f"user{len(self.users)}",
+            current_level=level,
+            target_score=min(level + 1.0, 9.0),
+        )
+        self.users[user.id] = user
+        return user
+
+    def enqueue(self, user: User, mode: QueueMode, level_filter: Optional[float], joined_at: datetime) -> QueueEntry:
+        entry = QueueEntry(
+            id=uuid.uuid4(),
+            user_id=user.id,
+            mode=mode,
+            level_filter=level_filter if mode == QueueMode.LEVEL_FILTER else None,
+            joined_at=joined_at,
+            is_active=True,
+        )
+        self.queue.append(entry)
+        return entry
+
+    def active_entries(self, mode: QueueMode) -> List[QueueEntry]:
+        # Compact away matched/abandoned entries as we go
+        self.queue = [entry for entry in self.queue if entry.is_active]
+        return sorted(
+            (entry for entry in self.queue if entry.mode == mode),
+            key=lambda entry: entry.joined_at,
+        )
+
+
+class FakeSession:
+    """Implements the AsyncSession calls MatchmakingService makes outside its
+    _fetch_* hooks."""
+
+    def __init__(self, store: FakeStore):
+        self.store = store
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    def add(self, obj):
+        if isinstance(obj, Session):
+            if obj.id is None:
+                obj.id = uuid.uuid4()
+            self.store.sessions.append(obj)
+
+    async def flush(self):
+        pass
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def execute(self, *args, **kwargs):
+        raise NotImplementedError("FakeSession only serves the MatchmakingService _fetch_* hooks")
+
+
+class SimulatedMatchmakingService(MatchmakingService):
+    """MatchmakingService wired to a FakeStore and a simulated clock."""
+
+    def __init__(self, store: FakeStore, clock: Callable[[], datetime], **kwargs):
+        super().__init__(session_factory=lambda: FakeSession(store), **kwargs)
+        self.store = store
+        self.clock = clock
+        self.recent_pairs = RecentPairs(clock=lambda: clock().timestamp())
+        # (user1 id, user2 id, matched_at) for every pair created
+        self.matches: List[tuple] = []
+
+    async def _fetch_queue(self, db, mode: QueueMode, limit: Optional[int] = None) -> List[QueueEntry]:
+        return self.store.active_entries(mode)[:limit]
+
+    async def _fetch_profiles(self, db, user_ids) -> Dict:
+        users = self.store.users
+        return {user_id: (users[user_id].current_level, users[user_id].target_score) for user_id in user_ids}
+
+    async def _fetch_users(self, db, user_ids) -> Dict:
+        return {str(user_id): UserProfile.from_user(self.store.users[user_id]) for user_id in user_ids}
+
+    def _now(self) -> datetime:
+        return self.clock()
+
+    async def _notify_match(self, user1_id, user2_id, user1, user2, room_id, session_id):
+        self.matches.append((user1.id, user2.id, self.clock()))
@@ -0,0 +1,90 @@
+"""Pairs per round and CPU time of the level-filter strategies on one queue.
+
+Builds a synthetic level-filter queue (levels from the simulator's default
+distribution, waits spread over the last few minutes) and runs each
+strategy on the same snapshot.
+
+    cd backend
+    python -m benchmarks.level_filter_bench --sizes 1000 5000 20000
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+from datetime import timedelta
+from typing import Dict, List
+
+from app.models.session import QueueEntry, QueueMode
+from app.services.matchmaking import LEVEL_FILTER_MATCHERS
+from benchmarks.matchmaking_sim import DEFAULT_LEVELS, SIM_EPOCH
+
+
+def synthetic_queue(size: int, rng: random.Random, max_wait: float):
+    levels = [float(level) for level in DEFAULT_LEVELS]
+    weights = list(DEFAULT_LEVELS.values())
+    entries: List[QueueEntry] = []
+    profiles: Dict = {}
+    for _ in range(size):
+        level = rng.choices(levels, weights)[0]
+        entry = QueueEntry(
+            id=uuid.uuid4(),
+            user_id=uuid.uuid4(),
+            mode=QueueMode.LEVEL_FILTER,
+            level_filter=level,
+            joined_at=SIM_EPOCH - timedelta(seconds=rng.uniform(0, max_wait)),
+            is_active=True,
+        )
+        entries.append(entry)
+        profiles[entry.user_id] = (level + rng.choice([-0.5, 0.0, 0.0, 0.5]), min(level + rng.choice([0.5, 1.0, 1.5]), 9.0))
+    entries.sort(key=lambda entry: entry.joined_at)
+    return entries, profiles
+
+
+def run(sizes: List[int], algorithms: List[str], max_wait: float, seed: int) -> List[dict]:
+    results = []
+    for size in sizes:
+        entries, profiles = synthetic_queue(size, random.Random(seed), max_wait)
+        for name in algorithms:
+            matcher = LEVEL_FILTER_MATCHERS[name]
+            start = time.process_time()
+            if getattr(matcher, "needs_profiles", False):
+                pairs = matcher(entries, SIM_EPOCH, profiles)
+            else:
+                pairs = matcher(entries, SIM_EPOCH)
+            cpu = time.process_time() - start
+            gaps = [abs(a.level_filter - b.level_filter) for a, b in pairs]
+            results.append({
+                "users": size,
+                "algorithm": name,
+                "pairs": len(pairs),
+                "unmatched": size - 2 * len(pairs),
+                "mean_level_gap": sum(gaps) / len(gaps) if gaps else None,
+                "cpu_seconds": cpu,
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark level-filter pairing strategies on one queue")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 2000, 5000, 10000, 20000])
+    parser.add_argument("--algorithms", nargs="+", default=sorted(LEVEL_FILTER_MATCHERS),
+                        choices=sorted(LEVEL_FILTER_MATCHERS))
+    parser.add_argument("--max-wait", type=float, default=120.0, help="Oldest queue entry, seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.algorithms, args.max_wait, args.seed)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'users':>7}  {'algorithm':<9}  {'pairs':>6}  {'unmatched':>9}  {'mean gap':>8}  {'cpu (s)':>8}")
+    for row in results:
+        gap = f"{row['mean_level_gap']:.3f}" if row["mean_level_gap"] is not None else "-"
+        print(f"{row['users']:>7}  {row['algorithm']:<9}  {row['pairs']:>6}  {row['unmatched']:>9}  "
+              f"{gap:>8}  {row['cpu_seconds']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""Matchmaking simulation and benchmark harness.
+
+Drives MatchmakingService round by round against an in-memory store with
+synthetic arrivals, so matching algorithms can be compared without Postgres.
+
+    cd backend
+    python -m benchmarks.matchmaking_sim --trace benchmarks/traces/evening_peak.json
+    python -m benchmarks.matchmaking_sim --process poisson --rate 2 --duration 1800 --json
+
+A trace file is JSON. It either lists explicit arrivals
+({"arrivals": [{"t": 3.2, "level": 6.5, "mode": "level_filter"}, ...]}) or
+describes how to generate them:
+
+    {
+      "duration_seconds": 3600,
+      "round_interval_seconds": 20,
+      "arrival": {"process": "evening_peak", "rate_per_second": 0.3,
+                  "peak_multiplier": 4, "peak_at_seconds": 1800, "peak_width_seconds": 600},
+      "level_filter_share": 0.4,
+      "levels": {"5.5": 0.2, "6.0": 0.3, "6.5": 0.3, "7.0": 0.2},
+      "patience_seconds": 600,
+      "rejoin_share": 0.5,
+      "session_seconds": 300,
+      "seed": 42
+    }
+
+With rejoin_share set, that fraction of matched users queue again (same
+level and mode) once their call of session_seconds ends, so repeat pairings
+show up in the report.
+"""
+import argparse
+import asyncio
+import heapq
+import json
+import math
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from app.models.session import QueueMode
+from app.services.matchmaking import LEVEL_FILTER_MATCHERS, ROULETTE_MATCHERS, level_band
+from benchmarks.fake_session import FakeStore, SimulatedMatchmakingService
+
+DEFAULT_LEVELS = {
+    "4.5": 0.04, "5.0": 0.08, "5.5": 0.16, "6.0": 0.22, "6.5": 0.22,
+    "7.0": 0.15, "7.5": 0.08, "8.0": 0.04, "8.5": 0.01,
+}
+
+SIM_EPOCH = datetime(2026, 1, 1, 18, 0, 0)
+
+
+@dataclass
+class Arrival:
+    t: float
+    level: float
+    mode: QueueMode
+
+
+def _rate_at(t: float, arrival: dict) -> float:
+    """Instantaneous arrival rate (users/second) for the configured process."""
+    rate = arrival.get("rate_per_second", 0.5)
+    if arrival.get("process", "poisson") == "evening_peak":
+        center = arrival.get("peak_at_seconds", 1800)
+        width = arrival.get("peak_width_seconds", 600)
+        rate *= 1 + arrival.get("peak_multiplier", 4) * math.exp(-0.5 * ((t - center) / width) ** 2)
+    return rate
+
+
+def generate_arrivals(trace: dict, rng: random.Random) -> List[Arrival]:
+    """Sample arrivals from a (possibly non-homogeneous) Poisson process."""
+    if "arrivals" in trace:
+        return [
+            Arrival(item["t"], float(item["level"]), QueueMode(item.get("mode", "roulette")))
+            for item in sorted(trace["arrivals"], key=lambda item: item["t"])
+        ]
+
+    duration = trace.get("duration_seconds", 3600)
+    arrival = trace.get("arrival", {})
+    levels = trace.get("levels", DEFAULT_LEVELS)
+    level_values = [float(level) for level in levels]
+    level_weights = list(levels.values())
+    level_filter_share = trace.get("level_filter_share", 0.4)
+
+    # Thinning: draw at the peak rate, keep each candidate with rate(t)/peak
+    peak_rate = max(_rate_at(t, arrival) for t in range(0, int(duration) + 1, 10))
+    arrivals = []
+    t = 0.0
+    while True:
+        t += rng.expovariate(peak_rate)
+        if t >= duration:
+            break
+        if rng.random() * peak_rate > _rate_at(t, arrival):
+            continue
+        mode = QueueMode.LEVEL_FILTER if rng.random() < level_filter_share else QueueMode.ROULETTE
+        arrivals.append(Arrival(t, rng.choices(level_values, level_weights)[0], mode))
+    return arrivals
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _summary(values: List[float]) -> Dict[str, Optional[float]]:
+    return {
+        "p50": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else None,
+    }
+
+
+async def simulate(
+    trace: dict,
+    roulette_matcher: str = "fifo",
+    level_filter_matcher: str = "greedy",
+) -> dict:
+    """Run a trace through MatchmakingService and return the report."""
+    rng = random.Random(trace.get("seed", 42))
+    # Strategies that randomize draw from the global RNG; seed it as well
+    random.seed(trace.get("seed", 42))
+    arrivals = generate_arrivals(trace, rng)
+    duration = trace.get("duration_seconds", max((a.t for a in arrivals), default=0))
+    interval = trace.get("round_interval_seconds", 20)
+    patience = trace.get("patience_seconds")
+    rejoin_share = trace.get("rejoin_share", 0.0)
+    session_seconds = trace.get("session_seconds", 300)
+
+    store = FakeStore()
+    now = {"t": 0.0}
+    service = SimulatedMatchmakingService(
+        store,
+        clock=lambda: SIM_EPOCH + timedelta(seconds=now["t"]),
+        roulette_matcher=ROULETTE_MATCHERS[roulette_matcher],
+        level_filter_matcher=LEVEL_FILTER_MATCHERS[level_filter_matcher],
+    )
+
+    joined_at: Dict = {}
+    modes: Dict = {}
+    waits: Dict[str, List[float]] = {mode.value: [] for mode in QueueMode}
+    band_waits: Dict[str, List[float]] = {}
+    seen_pairs: set = set()
+    repeat_pairs = 0
+    # (t, tiebreak, user) for matched users who queue again after their call
+    rejoins: List[tuple] = []
+    abandoned = 0
+    round_cpu: List[float] = []
+    next_arrival = 0
+    next_match = 0
+
+    round_time = interval
+    while round_time <= duration + interval:
+        # Enqueue everyone who arrived before this round
+        while next_arrival < len(arrivals) and arrivals[next_arrival].t <= round_time:
+            arrival = arrivals[next_arrival]
+            user = store.add_user(arrival.level)
+            store.enqueue(user, arrival.mode, arrival.level, SIM_EPOCH + timedelta(seconds=arrival.t))
+            joined_at[user.id] = arrival.t
+            modes[user.id] = arrival.mode
+            next_arrival += 1
+        while rejoins and rejoins[0][0] <= round_time:
+            t, _, user = heapq.heappop(rejoins)
+            store.enqueue(user, modes[user.id], user.current_level, SIM_EPOCH + timedelta(seconds=t))
+            joined_at[user.id] = t
+
+        now["t"] = round_time
+
+        # Users who ran out of patience leave the queue
+        if patience:
+            cutoff = SIM_EPOCH + timedelta(seconds=round_time - patience)
+            for entry in store.queue:
+                if entry.is_active and entry.joined_at < cutoff:
+                    entry.is_active = False
+                    abandoned += 1
+
+        start = time.process_time()
+        await service._run_matchmaking()
+        round_cpu.append(time.process_time() - start)
+        for room_id in list(service.active_rooms):
+            service.close_room(room_id)
+
+        for user1_id, user2_id, matched_at in service.matches[next_match:]:
+            pair = frozenset((user1_id, user2_id))
+            repeat_pairs += pair in seen_pairs
+            seen_pairs.add(pair)
+            for user_id in (user1_id, user2_id):
+                wait = (matched_at - SIM_EPOCH).total_seconds() - joined_at[user_id]
+                waits[modes[user_id].value].append(wait)
+                if modes[user_id] == QueueMode.LEVEL_FILTER:
+                    band = level_band(store.users[user_id].current_level)
+                    band_waits.setdefault(band, []).append(wait)
+                if rng.random() < rejoin_share:
+                    rejoin_at = round_time + session_seconds
+                    heapq.heappush(rejoins, (rejoin_at, len(joined_at) + len(rejoins), store.users[user_id]))
+        next_match = len(service.matches)
+
+        round_time += interval
+
+    leftovers = {mode.value: len(store.active_entries(mode)) for mode in QueueMode}
+    # A user who rejoins is counted once per match
+    matched_users = sum(len(values) for values in waits.values())
+    all_waits = [wait for values in waits.values() for wait in values]
+
+    return {
+        "algorithms": {"roulette": roulette_matcher, "level_filter": level_filter_matcher},
+        "arrivals": len(arrivals),
+        "rounds": len(round_cpu),
+        "pairs": len(service.matches),
+        "matched_users": matched_users,
+        "match_rate": matched_users / len(arrivals) if arrivals else None,
+        "repeat_pairs": repeat_pairs,
+        "repeat_pair_rate": repeat_pairs / len(service.matches) if service.matches else None,
+        "abandoned": abandoned,
+        "unmatched_leftovers": leftovers,
+        "time_to_match_seconds": {
+            "all": _summary(all_waits),
+            **{mode: _summary(values) for mode, values in waits.items()},
+        },
+        "level_filter_by_band": {
+            band: {"matched": len(band_waits[band]), "p95_wait": percentile(band_waits[band], 95)}
+            for band in sorted(band_waits, key=float)
+        },
+        "cpu_per_round_seconds": {
+            "mean": sum(round_cpu) / len(round_cpu) if round_cpu else None,
+            "p95": percentile(round_cpu, 95),
+            "max": max(round_cpu) if round_cpu else None,
+        },
+    }
+
+
+def _format_report(report: dict) -> str:
+    def fmt(value):
+        if value is None:
+            return "-"
+        return f"{value:.4f}" if isinstance(value, float) else str(value)
+
+    lines = [
+        f"algorithms        roulette={report['algorithms']['roulette']} "
+        f"level_filter={report['algorithms']['level_filter']}",
+        f"arrivals          {report['arrivals']}",
+        f"rounds            {report['rounds']}",
+        f"pairs             {report['pairs']}",
+        f"match rate        {fmt(report['match_rate'])}",
+        f"repeat pair rate  {fmt(report['repeat_pair_rate'])}",
+        f"abandoned         {report['abandoned']}",
+        f"leftovers         {report['unmatched_leftovers']}",
+        "time to match (s)",
+    ]
+    for mode, summary in report["time_to_match_seconds"].items():
+        lines.append(f"  {mode:<14}  " + "  ".join(f"{key}={fmt(value)}" for key, value in summary.items()))
+    lines.append("level filter by band")
+    for band, summary in report["level_filter_by_band"].items():
+        lines.append(f"  band {band:<9}  matched={summary['matched']}  p95={fmt(summary['p95_wait'])}")
+    cpu = report["cpu_per_round_seconds"]
+    lines.append("cpu per round (s) " + "  ".join(f"{key}={fmt(value)}" for key, value in cpu.items()))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate matchmaking with synthetic arrivals")
+    parser.add_argument("--trace", help="JSON trace file (explicit arrivals or generator settings)")
+    parser.add_argument("--process", choices=["poisson", "evening_peak"], help="Arrival process")
+    parser.add_argument("--rate", type=float, help="Base arrival rate (users/second)")
+    parser.add_argument("--duration", type=float, help="Simulated seconds")
+    parser.add_argument("--interval", type=float, help="Seconds between matchmaking rounds")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--rejoin-share", type=float, help="Fraction of matched users who queue again")
+    parser.add_argument("--roulette-algorithm", default="fifo", choices=sorted(ROULETTE_MATCHERS))
+    parser.add_argument("--algorithm", default="greedy", choices=sorted(LEVEL_FILTER_MATCHERS),
+                        help="Level-filter pairing strategy")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    trace: dict = {}
+    if args.trace:
+        with open(args.trace) as f:
+            trace = json.load(f)
+    arrival = trace.setdefault("arrival", {})
+    if args.process:
+        arrival["process"] = args.process
+    if args.rate is not None:
+        arrival["rate_per_second"] = args.rate
+    if args.duration is not None:
+        trace["duration_seconds"] = args.duration
+    if args.interval is not None:
+        trace["round_interval_seconds"] = args.interval
+    if args.seed is not None:
+        trace["seed"] = args.seed
+    if args.rejoin_share is not None:
+        trace["rejoin_share"] = args.rejoin_share
+
+    report = asyncio.run(simulate(trace, args.roulette_algorithm, args.algorithm))
+    print(json.dumps(report, indent=2) if args.json else _format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Worker startup benchmark.
+
+Boots uvicorn in a subprocess several times and reports, per boot:
+
+- import: seconds to import app.main in a fresh interpreter
+- listening: process start -> first HTTP response
+- ready: process start -> /health returns 200
+- first_request / warm_request: latency of the first and the tenth call
+  to a database-backed endpoint after the worker is ready
+
+Compare settings by passing them as environment overrides:
+
+    cd backend
+    python -m benchmarks.startup_time --runs 5
+    python -m benchmarks.startup_time --runs 5 --env DB_CREATE_ALL=false \\
+        --env DB_WARMUP_CONNECTIONS=10 --env DB_WARMUP_STATEMENTS=true
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.matchmaking_sim import percentile
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+
+
+def _measure_import(env: Dict[str, str]) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], env=env, capture_output=True, text=True, check=True
+    )
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def _wait_for(url: str, deadline: float, ok_only: bool) -> float:
+    """Poll until the URL answers (with 200 if ok_only); return the time it did."""
+    while time.perf_counter() < deadline:
+        try:
+            response = httpx.get(url, timeout=1.0)
+            if not ok_only or response.status_code == 200:
+                return time.perf_counter()
+        except httpx.TransportError:
+            pass
+        time.sleep(0.01)
+    raise TimeoutError(f"{url} did not become available")
+
+
+def _request_seconds(client: httpx.Client) -> float:
+    # Unknown user: one user lookup, no bcrypt, so this times the database path
+    start = time.perf_counter()
+    client.post("/auth/login", data={"username": "nobody@startup.example.com", "password": "x"})
+    return time.perf_counter() - start
+
+
+def boot_once(args, env: Dict[str, str]) -> Dict[str, float]:
+    base_url = f"http://127.0.0.1:{args.port}"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        deadline = start + args.timeout
+        listening = _wait_for(base_url + "/", deadline, ok_only=False)
+        ready = _wait_for(base_url + "/health", deadline, ok_only=True)
+        with httpx.Client(base_url=base_url, timeout=args.timeout) as client:
+            latencies = [_request_seconds(client) for _ in range(10)]
+        return {
+            "listening": listening - start,
+            "ready": ready - start,
+            "first_request": latencies[0],
+            "warm_request": latencies[-1],
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure worker startup and first-request latency")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Setting override for the booted worker (repeatable)")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+
+    samples: Dict[str, List[float]] = {"import": []}
+    for _ in range(args.runs):
+        samples["import"].append(_measure_import(env))
+        for key, value in boot_once(args, env).items():
+            samples.setdefault(key, []).append(value)
+
+    report = {
+        "runs": args.runs,
+        "overrides": args.env,
+        "seconds": {
+            key: {"p50": percentile(values, 50), "max": max(values)}
+            for key, values in samples.items()
+        },
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""End-to-end WebSocket load test for /ws/match/{user_id}.
+
+Each synthetic user logs in (registering on first use), opens its matchmaking
+socket, joins a queue and waits for `matched`. It then does the full
+offer/answer/ICE exchange with its partner, swaps a few chat messages and
+ends the session. Latency is reported per message type:
+
+- connect / ping / join_queue / end_session: request -> response round trip
+- offer, answer, ice_candidate, chat: sender -> partner relay latency
+- offer_answer: initiator's offer -> partner's answer round trip
+- time_to_match: queue_joined -> matched
+
+A user shed by admission control (`server_busy`) waits the advertised
+retry_after, reconnects and starts over, up to --busy-retries times. All clients run in this process, so relay latency uses one shared clock.
+
+    cd backend
+    uvicorn app.main:app --port 8000 &
+    python -m benchmarks.ws_loadtest --users 1000 --ramp 200
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+import websockets
+
+from benchmarks.matchmaking_sim import percentile
+
+RELAYED_TYPES = {"offer", "answer", "ice_candidate"}
+
+
+class ServerBusy(Exception):
+    """The server shed this request; retry after the given number of seconds."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+class LoadStats:
+    """Latency samples and counters shared by all synthetic users."""
+
+    def __init__(self):
+        self.latency: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.sent = 0
+        self.received = 0
+        self.matched = 0
+        self.completed = 0
+        self.shed = 0
+
+    def record(self, kind: str, seconds: float):
+        self.latency[kind].append(seconds)
+
+    def report(self, elapsed: float, users: int) -> dict:
+        return {
+            "users": users,
+            "matched": self.matched,
+            "completed_sessions": self.completed,
+            "shed_retries": self.shed,
+            "elapsed_seconds": elapsed,
+            "messages_sent": self.sent,
+            "messages_received": self.received,
+            "throughput_msgs_per_second": (self.sent + self.received) / elapsed if elapsed else None,
+            "errors": dict(self.errors),
+            "latency_ms": {
+                kind: {
+                    "count": len(values),
+                    "p50": percentile(values, 50) * 1000,
+                    "p95": percentile(values, 95) * 1000,
+                    "p99": percentile(values, 99) * 1000,
+                    "max": max(values) * 1000,
+                }
+                for kind, values in sorted(self.latency.items())
+            },
+        }
+
+
+class SyntheticUser:
+    """One simulated client: auth, socket, queue, call, hang up."""
+
+    def __init__(self, index: int, args, http: httpx.AsyncClient, stats: LoadStats):
+        self.index = index
+        self.args = args
+        self.http = http
+        self.stats = stats
+        self.user_id: Optional[str] = None
+        self.token: Optional[str] = None
+        self.ws = None
+        self.inbox: Dict[str, asyncio.Queue] = defaultdict(asyncio.Queue)
+
+    async def authenticate(self):
+        email = f"{self.args.prefix}{self.index}@loadtest.example.com"
+        response = await self.http.post("/auth/login", data={"username": email, "password": self.args.password})
+        if response.status_code == 401:
+            response = await self.http.post("/auth/register", json={
+                "email": email,
+                "password": self.args.password,
+                "username": f"{self.args.prefix}{self.index}",
+                "current_level": random.choice([5.0, 5.5, 6.0, 6.5, 7.0, 7.5]),
+            })
+        response.raise_for_status()
+        body = response.json()
+        self.token = body["access_token"]
+        self.user_id = body["user"]["id"]
+
+    async def send(self, message: dict):
+        await self.ws.send(json.dumps(message))
+        self.stats.sent += 1
+
+    async def expect(self, message_type: str, timeout: Optional[float] = None) -> dict:
+        return await asyncio.wait_for(self.inbox[message_type].get(), timeout or self.args.timeout)
+
+    async def expect_reply(self, message_type: str, timeout: Optional[float] = None) -> dict:
+        """Wait for `message_type`, raising ServerBusy if the server sheds us first."""
+        getters = {
+            kind: asyncio.ensure_future(self.inbox[kind].get())
+            for kind in (message_type, "server_busy")
+        }
+        try:
+            done, _ = await asyncio.wait(
+                getters.values(), timeout=timeout or self.args.timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            for getter in getters.values():
+                if not getter.done():
+                    getter.cancel()
+        if not done:
+            raise asyncio.TimeoutError()
+        if getters["server_busy"] in done:
+            if getters[message_type] in done:
+                # Keep the reply for whoever asks next
+                self.inbox[message_type].put_nowait(getters[message_type].result())
+            busy = getters["server_busy"].result()
+            raise ServerBusy((busy.get("data") or {}).get("retry_after", 1))
+        return getters[message_type].result()
+
+    async def _receive_loop(self):
+        async for raw in self.ws:
+            received_at = time.perf_counter()
+            self.stats.received += 1
+            message = json.loads(raw)
+            message_type = message.get("type")
+
+            # Relayed messages carry the sender's clock reading
+            if message_type in RELAYED_TYPES:
+                sent_at = (message.get("data") or {}).get("sent_at")
+                if sent_at:
+                    self.stats.record(message_type, received_at - sent_at)
+            elif message_type == "chat" and str(message.get("message", "")).startswith("lt:"):
+                self.stats.record("chat", received_at - float(message["message"][3:]))
+
+            message["_received_at"] = received_at
+            await self.inbox[message_type].put(message)
+
+    async def _round_trip(self, kind: str, message: dict, reply_type: str) -> dict:
+        start = time.perf_counter()
+        await self.send(message)
+        reply = await self.expect_reply(reply_type)
+        self.stats.record(kind, reply["_received_at"] - start)
+        return reply
+
+    async def run(self):
+        await self.authenticate()
+        for _ in range(self.args.busy_retries):
+            try:
+                await self._connect()
+                return
+            except ServerBusy as busy:
+                self.stats.shed += 1
+                self.inbox.clear()
+                await asyncio.sleep(busy.retry_after)
+        await self._connect()
+
+    async def _connect(self):
+        url = f"{self.args.ws_url}/ws/match/{self.user_id}?token={self.token}"
+        start = time.perf_counter()
+        async with websockets.connect(url, open_timeout=self.args.timeout) as ws:
+            self.stats.record("connect", time.perf_counter() - start)
+            self.ws = ws
+            receiver = asyncio.create_task(self._receive_loop())
+            try:
+                await self._session()
+            except websockets.ConnectionClosed:
+                # A rejected connection gets server_busy and then close code 1013
+                if not self.inbox["server_busy"].empty():
+                    busy = self.inbox["server_busy"].get_nowait()
+                    raise ServerBusy((busy.get("data") or {}).get("retry_after", 1))
+                raise
+            finally:
+                receiver.cancel()
+
+    async def _session(self):
+        await self._round_trip("ping", {"type": "ping"}, "pong")
+
+        level_filter = random.random() < self.args.level_filter_share
+        join = {"mode": "level_filter", "level_filter": 6.0} if level_filter else {"mode": "roulette"}
+        joined = await self._round_trip("join_queue", {"type": "join_queue", "data": join}, "queue_joined")
+
+        matched = await self.expect("matched", timeout=self.args.match_timeout)
+        self.stats.matched += 1
+        self.stats.record("time_to_match", matched["_received_at"] - joined["_received_at"])
+
+        data = matched["data"]
+        partner_id = data["partner_id"]
+        session_id = data["session_id"]
+
+        def signal(signal_type: str, payload: dict) -> dict:
+            return {
+                "type": signal_type,
+                "data": {
+                    "target_user_id": partner_id,
+                    "data": {**payload, "sent_at": time.perf_counter()},
+                },
+            }
+
+        if data["is_initiator"]:
+            await self._round_trip("offer_answer", signal("offer", {"sdp": "v=0 offer"}), "answer")
+        else:
+            await self.expect("offer")
+            await self.send(signal("answer", {"sdp": "v=0 answer"}))
+
+        for i in range(self.args.ice_candidates):
+            await self.send(signal("ice_candidate", {"candidate": f"candidate:{i}"}))
+        for _ in range(self.args.chat_messages):
+            await self.send({
+                "type": "chat",
+                "data": {"target_user_id": partner_id, "message": f"lt:{time.perf_counter()}"},
+            })
+
+        # Wait until everything the partner sent has arrived
+        for _ in range(self.args.ice_candidates):
+            await self.expect("ice_candidate")
+        for _ in range(self.args.chat_messages):
+            await self.expect("chat")
+
+        if data["is_initiator"]:
+            await asyncio.sleep(self.args.hold_seconds)
+            await self._round_trip(
+                "end_session",
+                {"type": "end_session", "data": {"session_id": session_id}},
+                "session_ended",
+            )
+        else:
+            await self.expect("session_ended", timeout=self.args.hold_seconds + self.args.timeout)
+        self.stats.completed += 1
+
+
+async def run_load(args) -> dict:
+    stats = LoadStats()
+    limits = httpx.Limits(max_connections=args.http_connections)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as http:
+
+        async def run_one(index: int):
+            # Spread connects over the ramp instead of opening all at once
+            await asyncio.sleep(index / args.ramp)
+            user = SyntheticUser(index, args, http, stats)
+            try:
+                await user.run()
+            except asyncio.TimeoutError:
+                stats.errors["timeout"] += 1
+            except ServerBusy:
+                stats.errors["server_busy"] += 1
+            except Exception as e:
+                stats.errors[type(e).__name__] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(run_one(i) for i in range(args.users)))
+        elapsed = time.perf_counter() - start
+
+    return stats.report(elapsed, args.users)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket load test for the matchmaking endpoint")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--ws-url", help="Defaults to base URL with ws:// scheme")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--ramp", type=float, default=50.0, help="New users per second")
+    parser.add_argument("--level-filter-share", type=float, default=0.0,
+                        help="Fraction of users joining the level-filter queue")
+    parser.add_argument("--ice-candidates", type=int, default=5)
+    parser.add_argument("--chat-messages", type=int, default=3)
+    parser.add_argument("--hold-seconds", type=float, default=1.0, help="Call length before hanging up")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--match-timeout", type=float, default=120.0)
+    parser.add_argument("--busy-retries", type=int, default=5,
+                        help="Reconnect attempts after a server_busy rejection")
+    parser.add_argument("--http-connections", type=int, default=100)
+    parser.add_argument("--password", default="loadtest-password")
+    parser.add_argument("--prefix", default="lt", help="Username/email prefix for synthetic users")
+    args = parser.parse_args()
+
+    if not args.ws_url:
+        args.ws_url = args.base_url.replace("https://", "wss://").replace("http://", "ws://")
+
+    print(json.dumps(asyncio.run(run_load(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
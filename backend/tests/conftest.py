@@ -1,8 +1,55 @@
 """Pytest configuration and fixtures."""
+import os
+import tempfile
+
+# Run the app against a throwaway SQLite file unless a database is given, and
+# fail any route that goes over its declared query budget.
+_test_db_path = os.path.join(tempfile.mkdtemp(prefix="ielts-tests-"), "test.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_test_db_path}")
+os.environ.setdefault("DB_QUERY_BUDGET_ENFORCE", "true")
+
 import pytest
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import create_engine
+
+from app.database import AsyncSessionLocal, Base, engine
+import app.models  # noqa: F401  (registers all tables on Base.metadata)
 
 
 @pytest.fixture(scope="session")
 def anyio_backend():
     """Use asyncio for async tests."""
     return "asyncio"
+
+
+@pytest.fixture(scope="session")
+def sync_engine():
+    """Synchronous engine on the test database, used for schema setup."""
+    sync_url = engine.url.set(drivername=engine.url.get_backend_name())
+    sync_engine = create_engine(sync_url)
+    yield sync_engine
+    sync_engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def db_schema(sync_engine):
+    """Give every test a fresh, empty schema."""
+    Base.metadata.drop_all(sync_engine)
+    Base.metadata.create_all(sync_engine)
+    yield
+
+
+@pytest.fixture
+async def db_session():
+    """An AsyncSession on the test database."""
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+@pytest.fixture
+async def client():
+    """HTTP client wired straight to the ASGI app."""
+    from app.main import app
+    
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        yield client
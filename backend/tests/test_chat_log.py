@@ -0,0 +1,89 @@
+"""Tests for chat transcript storage and the transcript endpoint."""
+import uuid
+
+import pytest
+from sqlalchemy import select
+
+from app.config import settings
+from app.models.chat import ChatMessage
+from app.models.session import QueueMode, Session
+from app.services.chat_log import ChatLogWriter
+from tests.test_users import _register
+
+
+async def _session(db_session, user1_id, user2_id):
+    session = Session(
+        user1_id=user1_id, user2_id=user2_id, mode=QueueMode.ROULETTE, room_id=f"room_{uuid.uuid4().hex[:12]}"
+    )
+    db_session.add(session)
+    await db_session.commit()
+    return str(session.id)
+
+
+@pytest.mark.anyio
+async def test_writer_batches_and_bounds_the_buffer(client, db_session, monkeypatch):
+    """A full buffer drops the oldest messages; stopping writes the rest in order."""
+    monkeypatch.setattr(settings, "chat_log_flush_batch", 2)
+    monkeypatch.setattr(settings, "chat_log_max_buffered", 4)
+    alice, _ = await _register(client, "alice@example.com", "alice")
+    bob, _ = await _register(client, "bob@example.com", "bob")
+    session_id = await _session(db_session, alice["id"], bob["id"])
+    writer = ChatLogWriter()
+    
+    for i in range(5):
+        writer.append(session_id, alice["id"], f"message {i}")
+    assert len(writer.buffer) == 4
+    
+    await writer.stop()
+    assert not writer.buffer
+    rows = (await db_session.execute(select(ChatMessage).order_by(ChatMessage.id))).scalars().all()
+    assert [row.body for row in rows] == ["message 1", "message 2", "message 3", "message 4"]
+
+
+@pytest.mark.anyio
+async def test_transcript_pages_for_participants_only(client, db_session):
+    """Participants page through the transcript by id; others are refused."""
+    alice, alice_headers = await _register(client, "alice@example.com", "alice")
+    bob, _ = await _register(client, "bob@example.com", "bob")
+    _, carol_headers = await _register(client, "carol@example.com", "carol")
+    session_id = await _session(db_session, alice["id"], bob["id"])
+    writer = ChatLogWriter()
+    for i in range(3):
+        writer.append(session_id, bob["id"] if i % 2 else alice["id"], f"hi {i}")
+    await writer.flush()
+    
+    response = await client.get(f"/sessions/{session_id}/messages?limit=2", headers=alice_headers)
+    assert response.status_code == 200
+    page = response.json()
+    assert [m["message"] for m in page["messages"]] == ["hi 0", "hi 1"]
+    assert page["messages"][1]["sender_id"] == bob["id"]
+    
+    response = await client.get(
+        f"/sessions/{session_id}/messages?limit=2&after_id={page['next_after_id']}", headers=alice_headers
+    )
+    assert [m["message"] for m in response.json()["messages"]] == ["hi 2"]
+    assert response.json()["next_after_id"] is None
+    
+    response = await client.get(f"/sessions/{session_id}/messages", headers=carol_headers)
+    assert response.status_code == 403
+    response = await client.get(f"/sessions/{uuid.uuid4()}/messages", headers=carol_headers)
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_rejected_row_does_not_block_the_batch(client, db_session):
+    """A row the database refuses is dropped on its own; the rest of the batch is stored."""
+    alice, _ = await _register(client, "alice@example.com", "alice")
+    bob, _ = await _register(client, "bob@example.com", "bob")
+    session_id = await _session(db_session, alice["id"], bob["id"])
+    writer = ChatLogWriter()
+    writer.append(session_id, alice["id"], "before")
+    # Session that does not exist: violates the foreign key
+    writer.append(str(uuid.uuid4()), alice["id"], "orphan")
+    writer.append(session_id, bob["id"], "after")
+    
+    await writer.flush()
+    
+    assert not writer.buffer
+    rows = (await db_session.execute(select(ChatMessage).order_by(ChatMessage.id))).scalars().all()
+    assert [row.body for row in rows] == ["before", "after"]
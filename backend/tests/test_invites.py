@@ -0,0 +1,76 @@
+"""Tests for pending partner invites."""
+import pytest
+from sqlalchemy import func, select
+
+from app.models.session import Session
+from app.models.user import User
+from app.services.invites import InviteRegistry, invite_registry
+from app.services.matchmaking import matchmaking_service
+from app.services.profile_cache import profile_cache
+from app.services.websocket import handle_invite_partner, handle_invite_response
+from tests.test_mailbox import FakeWebSocket
+
+
+def test_invites_dedup_and_expire():
+    """A repeated invite is not recorded twice and an expired one can't be answered."""
+    now = {"t": 0.0}
+    invites = InviteRegistry(ttl_seconds=60, max_invites=2, clock=lambda: now["t"])
+    
+    assert invites.create("alice", "bob", {"username": "alice", "level": 6.0})
+    assert invites.create("alice", "bob", {"username": "alice", "level": 6.0}) is None
+    assert invites.create("carol", "bob", {"username": "carol", "level": 7.0})
+    assert len(invites) == 2
+    
+    now["t"] = 61
+    assert invites.pop("alice", "bob") is None
+    assert len(invites) == 0
+    assert invites.create("alice", "bob", {"username": "alice", "level": 6.0})
+
+
+@pytest.fixture
+async def pair(db_session):
+    alice = User(email="alice@example.com", password_hash="x", username="alice", current_level=6.5)
+    bob = User(email="bob@example.com", password_hash="x", username="bob", current_level=7.0)
+    db_session.add_all([alice, bob])
+    await db_session.commit()
+    sockets = {}
+    for user in (alice, bob):
+        user_id = str(user.id)
+        sockets[user_id] = FakeWebSocket()
+        matchmaking_service.register_client(user_id, sockets[user_id])
+    yield str(alice.id), str(bob.id), sockets
+    for user_id, websocket in sockets.items():
+        matchmaking_service.unregister_client(user_id, websocket)
+        profile_cache.invalidate(user_id)
+        invite_registry.pop(user_id, next(other for other in sockets if other != user_id))
+    matchmaking_service.active_rooms.clear()
+    matchmaking_service.user_rooms.clear()
+
+
+@pytest.mark.anyio
+async def test_repeated_invite_notifies_once_and_accept_creates_session(pair, db_session):
+    """Clicking invite again doesn't spam the partner; accepting uses the snapshots for `matched`."""
+    alice_id, bob_id, sockets = pair
+    
+    for _ in range(3):
+        await handle_invite_partner(sockets[alice_id], alice_id, {"partner_user_id": bob_id})
+    assert sockets[alice_id].types() == ["invite_sent"] * 3
+    assert sockets[bob_id].types() == ["partner_invite"]
+    assert sockets[bob_id].sent[0]["from_level"] == 6.5
+    
+    await handle_invite_response(sockets[bob_id], bob_id, {"inviter_user_id": alice_id, "accepted": True})
+    assert sockets[alice_id].types()[-1] == "matched"
+    assert sockets[bob_id].sent[-1]["data"]["partner_username"] == "alice"
+    assert (await db_session.execute(select(func.count(Session.id)))).scalar_one() == 1
+
+
+@pytest.mark.anyio
+async def test_response_without_invite_is_rejected(pair, db_session):
+    """Accepting an invite nobody sent creates no session."""
+    alice_id, bob_id, sockets = pair
+    
+    await handle_invite_response(sockets[bob_id], bob_id, {"inviter_user_id": alice_id, "accepted": True})
+    
+    assert sockets[bob_id].types() == ["invite_error"]
+    assert sockets[alice_id].types() == []
+    assert (await db_session.execute(select(func.count(Session.id)))).scalar_one() == 0
@@ -0,0 +1,45 @@
+"""Tests for loop lag tracking and admission control."""
+from app.config import settings
+from app.services.load_shedding import AdmissionController, LoopLagMonitor
+
+
+def test_lag_is_smoothed():
+    """A single slow wakeup only moves the smoothed lag part of the way."""
+    monitor = LoopLagMonitor()
+    monitor.record(1.0)
+    
+    assert 0 < monitor.lag_seconds < 1.0
+
+
+def test_admits_when_healthy():
+    """Nothing is rejected while lag and connections are low."""
+    admission = AdmissionController(LoopLagMonitor())
+    
+    assert admission.check_connection(0) is None
+    assert admission.check_queue_join() is None
+
+
+def test_rejects_on_loop_lag():
+    """High loop lag sheds new connections and queue joins with a hint."""
+    monitor = LoopLagMonitor()
+    monitor.lag_seconds = settings.admission_max_loop_lag_ms / 1000 * 4
+    admission = AdmissionController(monitor)
+    
+    assert admission.check_connection(0) >= settings.admission_retry_after_seconds
+    assert admission.check_queue_join() >= settings.admission_retry_after_seconds
+
+
+def test_rejects_over_connection_limit():
+    """New sockets are rejected once the connection limit is reached."""
+    admission = AdmissionController(LoopLagMonitor())
+    
+    assert admission.check_connection(settings.admission_max_connections) == settings.admission_retry_after_seconds
+
+
+def test_rejects_everything_while_draining():
+    """A draining worker takes no new sockets or queue joins."""
+    admission = AdmissionController(LoopLagMonitor())
+    admission.start_draining()
+    
+    assert admission.check_connection(0) == settings.admission_retry_after_seconds
+    assert admission.check_queue_join() == settings.admission_retry_after_seconds
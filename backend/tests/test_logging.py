@@ -0,0 +1,51 @@
+"""Tests for the logging pipeline helpers."""
+import json
+import time
+import logging
+from app.utils.logging_setup import JsonFormatter, RateLimitFilter
+
+
+def _record(msg, *args, level=logging.ERROR, name="app.test"):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_rate_limit_filter_suppresses_repeats():
+    """Repeated errors with the same template are dropped within the window."""
+    rate_limit = RateLimitFilter(window_seconds=60)
+    
+    assert rate_limit.filter(_record("Error sending %s to %s", "chat", "a"))
+    assert not rate_limit.filter(_record("Error sending %s to %s", "chat", "b"))
+    assert not rate_limit.filter(_record("Error sending %s to %s", "offer", "c"))
+    # A different template is not affected
+    assert rate_limit.filter(_record("WebSocket error for %s", "a"))
+
+
+def test_rate_limit_filter_ignores_info():
+    """Records below WARNING are never rate limited."""
+    rate_limit = RateLimitFilter(window_seconds=60)
+    
+    for _ in range(3):
+        assert rate_limit.filter(_record("Matched %s", "a", level=logging.INFO))
+
+
+def test_rate_limit_filter_reports_suppressed_count():
+    """The first record after a window carries the suppressed count."""
+    rate_limit = RateLimitFilter(window_seconds=0.01)
+    rate_limit.filter(_record("boom"))
+    rate_limit.filter(_record("boom"))
+    rate_limit.filter(_record("boom"))
+    
+    time.sleep(0.02)
+    
+    record = _record("boom")
+    assert rate_limit.filter(record)
+    assert record.suppressed == 2
+
+
+def test_json_formatter():
+    """JSON output contains the rendered message and logger name."""
+    payload = json.loads(JsonFormatter().format(_record("Matched %s with %s", "a", "b")))
+    
+    assert payload["message"] == "Matched a with b"
+    assert payload["logger"] == "app.test"
+    assert payload["level"] == "ERROR"
@@ -0,0 +1,146 @@
+"""Tests for holding control events while a user's socket is gone."""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.config import settings
+from app.models.session import QueueEntry, QueueMode, Session, SessionStatus
+from app.models.user import User
+from app.services.mailbox import Mailbox
+from app.services.matchmaking import MatchmakingService
+from app.services.scheduler import Job
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+    
+    async def send_json(self, message):
+        self.sent.append(message)
+    
+    def types(self):
+        return [message["type"] for message in self.sent]
+
+
+def test_mailbox_bounds_and_expiry():
+    """Each mailbox keeps its newest messages, the oldest mailbox is evicted, and messages expire."""
+    now = {"t": 0.0}
+    mailbox = Mailbox(max_messages=2, max_users=2, ttl_seconds=10, clock=lambda: now["t"])
+    
+    mailbox.put("bob", {"type": "matched"})
+    for i in range(3):
+        mailbox.put("alice", {"type": "partner_invite", "n": i})
+    mailbox.put("carol", {"type": "matched"})
+    
+    assert "bob" not in mailbox
+    assert [message["n"] for message in mailbox.take("alice")] == [1, 2]
+    now["t"] = 11
+    assert mailbox.take("carol") == []
+    assert len(mailbox) == 0
+
+
+async def _queued_pair(db_session):
+    alice = User(email="alice@example.com", password_hash="x", username="alice")
+    bob = User(email="bob@example.com", password_hash="x", username="bob")
+    db_session.add_all([alice, bob])
+    await db_session.flush()
+    joined_at = datetime.utcnow() - timedelta(minutes=3)
+    db_session.add_all([
+        QueueEntry(user_id=user.id, mode=QueueMode.ROULETTE, is_active=True, joined_at=joined_at)
+        for user in (alice, bob)
+    ])
+    await db_session.commit()
+    return str(alice.id), str(bob.id), joined_at
+
+
+@pytest.mark.anyio
+async def test_match_delivered_on_reconnect(db_session):
+    """A user matched while disconnected receives the match when they come back."""
+    alice_id, bob_id, _ = await _queued_pair(db_session)
+    service = MatchmakingService()
+    alice = FakeWebSocket()
+    service.register_client(alice_id, alice)
+    
+    await service._run_matchmaking()
+    assert alice.types() == ["matched"]
+    
+    bob = FakeWebSocket()
+    service.register_client(bob_id, bob)
+    assert await service.deliver_mailbox(bob_id)
+    assert bob.types() == ["matched"]
+    assert bob.sent[0]["data"]["partner_id"] == alice_id
+
+
+@pytest.mark.anyio
+async def test_undelivered_match_is_cancelled_and_requeued(db_session, monkeypatch):
+    """Past the deadline the session is cancelled and the reachable user keeps their place."""
+    alice_id, bob_id, joined_at = await _queued_pair(db_session)
+    monkeypatch.setattr(settings, "match_delivery_deadline_seconds", 0.01)
+    service = MatchmakingService()
+    alice = FakeWebSocket()
+    service.register_client(alice_id, alice)
+    
+    await service._run_matchmaking()
+    await asyncio.sleep(0.1)
+    
+    assert alice.types() == ["matched", "match_cancelled"]
+    assert alice.sent[1]["data"]["requeued"] is True
+    assert service.active_rooms == {} and service.user_rooms == {}
+    assert bob_id not in service.mailbox
+    
+    db_session.expire_all()
+    session = (await db_session.execute(select(Session))).scalar_one()
+    assert session.status == SessionStatus.CANCELLED
+    active = (await db_session.execute(select(QueueEntry).where(QueueEntry.is_active == True))).scalars().all()
+    assert [str(entry.user_id) for entry in active] == [alice_id]
+    assert active[0].joined_at == joined_at
+
+
+@pytest.mark.anyio
+async def test_match_evicted_from_the_mailbox_still_counts_as_undelivered(db_session, monkeypatch):
+    """A match pushed out of a full mailbox is cancelled, not taken as delivered."""
+    alice_id, bob_id, _ = await _queued_pair(db_session)
+    monkeypatch.setattr(settings, "match_delivery_deadline_seconds", 0.05)
+    service = MatchmakingService()
+    service.mailbox = Mailbox(max_users=1)
+    alice = FakeWebSocket()
+    service.register_client(alice_id, alice)
+    
+    await service._run_matchmaking()
+    assert bob_id in service.mailbox
+    service.mailbox.put("carol", {"type": "partner_invite", "data": {}})
+    assert bob_id not in service.mailbox
+    await asyncio.sleep(0.2)
+    
+    assert alice.types() == ["matched", "match_cancelled"]
+    assert service.active_rooms == {} and service.match_deliveries == {}
+    db_session.expire_all()
+    session = (await db_session.execute(select(Session))).scalar_one()
+    assert session.status == SessionStatus.CANCELLED
+
+
+class SlowWebSocket(FakeWebSocket):
+    async def send_json(self, message):
+        await asyncio.sleep(0.1)
+        await super().send_json(message)
+
+
+@pytest.mark.anyio
+async def test_round_timeout_does_not_interrupt_committed_matches(db_session):
+    """A round timing out while notifying still delivers every committed match."""
+    alice_id, bob_id, _ = await _queued_pair(db_session)
+    service = MatchmakingService()
+    alice, bob = SlowWebSocket(), SlowWebSocket()
+    service.register_client(alice_id, alice)
+    service.register_client(bob_id, bob)
+    
+    job = Job("matchmaking", service._run_matchmaking, interval=60, timeout=0.05)
+    assert not await job.run_once()
+    assert job.last_error.startswith("timed out")
+    
+    assert alice.types() == ["matched"] and bob.types() == ["matched"]
+    session = (await db_session.execute(select(Session))).scalar_one()
+    room = next(iter(service.active_rooms.values()))
+    assert room.session_id == str(session.id)
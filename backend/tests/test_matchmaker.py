@@ -0,0 +1,153 @@
+"""Tests for the standalone matchmaker and the API nodes it talks to."""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.main import app, lifespan
+from app.matchmaker import MatchmakerService, run
+from app.models.presence import WorkerLease
+from app.models.session import QueueEntry, QueueMode, Session, SessionStatus
+from app.models.user import User
+from app.services.match_events import MatchEventChannel, PostgresMatchEventChannel, create_external_channel
+from app.services.matchmaking import MatchmakingService
+from tests.test_mailbox import FakeWebSocket
+
+
+async def _queued_online_pair(db_session):
+    lease = WorkerLease(hostname="api", pid=1, expires_at=datetime.utcnow() + timedelta(minutes=1))
+    db_session.add(lease)
+    await db_session.flush()
+    users = [
+        User(email=f"{name}@example.com", password_hash="x", username=name, is_online=True, presence_epoch=lease.id)
+        for name in ("alice", "bob")
+    ]
+    # Queued but offline: never picked by the matchmaker
+    users.append(User(email="carol@example.com", password_hash="x", username="carol"))
+    db_session.add_all(users)
+    await db_session.flush()
+    joined_at = datetime.utcnow() - timedelta(minutes=3)
+    db_session.add_all([
+        QueueEntry(user_id=user.id, mode=QueueMode.ROULETTE, is_active=True, joined_at=joined_at)
+        for user in users
+    ])
+    await db_session.commit()
+    return [str(user.id) for user in users]
+
+
+def _nodes(channel):
+    """Two API nodes sharing the channel with the matchmaker."""
+    nodes = [MatchmakingService(), MatchmakingService()]
+    for node in nodes:
+        node.events = channel
+        channel.subscribe(node.handle_event)
+    return nodes
+
+
+@pytest.mark.anyio
+async def test_match_is_delivered_by_the_nodes_holding_each_user(db_session):
+    """Each participant gets `matched` from their own node and the matchmaker sees both deliveries."""
+    alice_id, bob_id, carol_id = await _queued_online_pair(db_session)
+    channel = MatchEventChannel()
+    matchmaker = MatchmakerService(channel)
+    node_a, node_b = _nodes(channel)
+    alice, bob = FakeWebSocket(), FakeWebSocket()
+    node_a.register_client(alice_id, alice)
+    node_b.register_client(bob_id, bob)
+    
+    await matchmaker._run_matchmaking()
+    await asyncio.sleep(0.05)
+    
+    assert alice.types() == ["matched"] and bob.types() == ["matched"]
+    assert alice.sent[0]["data"]["partner_username"] == "bob"
+    assert alice.sent[0]["data"]["is_initiator"] != bob.sent[0]["data"]["is_initiator"]
+    assert list(node_a.active_rooms) == list(node_b.active_rooms)
+    assert matchmaker.pending == {} and matchmaker.active_rooms == {}
+    
+    active = (await db_session.execute(select(QueueEntry).where(QueueEntry.is_active == True))).scalars().all()
+    assert [str(entry.user_id) for entry in active] == [carol_id]
+
+
+@pytest.mark.anyio
+async def test_undelivered_match_is_cancelled_by_the_matchmaker(db_session, monkeypatch):
+    """If one side never receives the match, the other is told and requeued."""
+    alice_id, bob_id, _ = await _queued_online_pair(db_session)
+    monkeypatch.setattr(settings, "match_delivery_deadline_seconds", 0.05)
+    channel = MatchEventChannel()
+    matchmaker = MatchmakerService(channel)
+    node_a, _ = _nodes(channel)
+    alice = FakeWebSocket()
+    node_a.register_client(alice_id, alice)
+    
+    await matchmaker._run_matchmaking()
+    await asyncio.sleep(0.2)
+    
+    assert alice.types() == ["matched", "match_cancelled"]
+    assert node_a.active_rooms == {}
+    db_session.expire_all()
+    session = (await db_session.execute(select(Session))).scalar_one()
+    assert session.status == SessionStatus.CANCELLED
+    requeued = (await db_session.execute(
+        select(QueueEntry).where(QueueEntry.is_active == True, QueueEntry.user_id != bob_id)
+    )).scalars().all()
+    assert alice_id in [str(entry.user_id) for entry in requeued]
+
+
+class RecordingChannel(MatchEventChannel):
+    """Records each published match and whether its session was committed at the time."""
+    
+    def __init__(self):
+        super().__init__()
+        self.matches = []
+    
+    async def publish(self, event: dict):
+        if event["type"] == "match":
+            session_id = event["room"]["session_id"]
+            async with AsyncSessionLocal() as db:
+                committed = await db.get(Session, session_id) is not None
+            self.matches.append((session_id, committed))
+        await super().publish(event)
+
+
+@pytest.mark.anyio
+async def test_matches_are_published_only_after_the_round_commits(db_session, monkeypatch):
+    """A failed round publishes nothing; a successful one publishes sessions that already exist."""
+    await _queued_online_pair(db_session)
+    channel = RecordingChannel()
+    matchmaker = MatchmakerService(channel)
+    
+    async def fail(db):
+        raise RuntimeError("level filter failed")
+    
+    monkeypatch.setattr(matchmaker, "_match_level_filter", fail)
+    with pytest.raises(RuntimeError):
+        await matchmaker._run_matchmaking()
+    assert channel.matches == [] and matchmaker.pending == {}
+    assert (await db_session.execute(select(Session))).scalars().all() == []
+    
+    monkeypatch.undo()
+    await matchmaker._run_matchmaking()
+    assert [committed for _, committed in channel.matches] == [True]
+    assert list(matchmaker.pending) == [channel.matches[0][0]]
+    for pending in matchmaker.pending.values():
+        pending.timer.cancel()
+
+
+@pytest.mark.anyio
+async def test_external_mode_without_postgres_refuses_to_start(monkeypatch):
+    """The API node and the matchmaker both stop instead of falling back to in-process events."""
+    monkeypatch.setattr(settings, "matchmaking_mode", "external")
+    monkeypatch.setattr(settings, "matchmaking_events_database_url", "")
+    monkeypatch.setattr(settings, "database_url", "sqlite+aiosqlite:///unused.db")
+    
+    with pytest.raises(RuntimeError, match="MATCHMAKING_MODE=external needs PostgreSQL"):
+        async with lifespan(app):
+            pass
+    with pytest.raises(SystemExit):
+        await run()
+    
+    monkeypatch.setattr(settings, "matchmaking_events_database_url", "postgresql+asyncpg://db/events")
+    assert isinstance(create_external_channel(), PostgresMatchEventChannel)
@@ -0,0 +1,197 @@
+"""Tests for matchmaking pairing strategies and the simulation harness."""
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config import settings
+from app.models.session import QueueEntry, QueueMode
+from app.services.matchmaking import (
+    pair_level_filter_aging, pair_level_filter_greedy, pair_roulette_fifo, pair_roulette_random,
+)
+from app.services.recent_pairs import RecentPairs
+from benchmarks.matchmaking_sim import simulate
+
+NOW = datetime(2026, 1, 1, 20, 0, 0)
+
+
+def _entry(level=None, mode=QueueMode.LEVEL_FILTER, waited=0):
+    return QueueEntry(
+        id=uuid.uuid4(),
+        user_id=uuid.uuid4(),
+        mode=mode,
+        level_filter=level,
+        joined_at=NOW - timedelta(seconds=waited),
+        is_active=True,
+    )
+
+
+def test_roulette_fifo_pairs_in_order():
+    """FIFO roulette pairs neighbours and leaves an odd user out."""
+    entries = [_entry(mode=QueueMode.ROULETTE) for _ in range(5)]
+    
+    pairs = pair_roulette_fifo(entries, NOW)
+    
+    assert pairs == [(entries[0], entries[1]), (entries[2], entries[3])]
+
+
+def test_level_filter_greedy_respects_window():
+    """Greedy level filter only pairs users within 0.5 of each other."""
+    low, mid, high = _entry(5.0), _entry(6.0), _entry(6.5)
+    
+    pairs = pair_level_filter_greedy([low, mid, high], NOW)
+    
+    assert pairs == [(mid, high)]
+
+
+def test_level_filter_aging_widens_tolerance(monkeypatch):
+    """An edge-of-range user is matched once they have waited long enough."""
+    monkeypatch.setattr(settings, "level_tolerance_schedule", "0:0.5,60:1.5")
+    edge, other = _entry(8.5, waited=30), _entry(7.0, waited=0)
+    
+    assert pair_level_filter_aging([edge, other], NOW) == []
+    
+    edge.joined_at = NOW - timedelta(seconds=90)
+    assert pair_level_filter_aging([edge, other], NOW) == [(edge, other)]
+
+
+def test_level_filter_aging_serves_longest_waiter_first():
+    """The longest waiter picks the closest level before newer users pair up."""
+    newer, oldest, newest = _entry(6.0, waited=10), _entry(6.5, waited=100), _entry(6.5, waited=1)
+    
+    pairs = pair_level_filter_aging([newer, oldest, newest], NOW)
+    
+    assert pairs == [(oldest, newest)]
+
+
+def test_recent_pairs_forget_after_ttl():
+    """Pairs are remembered in either order and dropped once the TTL has passed."""
+    now = {"t": 0.0}
+    recent = RecentPairs(capacity=1000, error_rate=0.001, ttl_seconds=60, clock=lambda: now["t"])
+    
+    recent.add("alice", "bob")
+    assert recent.seen("bob", "alice")
+    assert not recent.seen("alice", "carol")
+    now["t"] = 61
+    assert not recent.seen("alice", "bob")
+
+
+def test_roulette_random_avoids_recent_partners(monkeypatch):
+    """Random roulette skips recent partners until the user has waited too long."""
+    monkeypatch.setattr(settings, "roulette_fairness_window", 1)
+    monkeypatch.setattr(settings, "roulette_repeat_after_seconds", 60)
+    first, second, third = (_entry(mode=QueueMode.ROULETTE, waited=30) for _ in range(3))
+    recent = RecentPairs(capacity=1000, ttl_seconds=3600)
+    recent.add(first.user_id, second.user_id)
+    
+    assert pair_roulette_random([first, second, third], NOW, recent) == [(first, third)]
+    assert pair_roulette_random([first, second], NOW, recent) == []
+    
+    first.joined_at = NOW - timedelta(seconds=90)
+    assert pair_roulette_random([first, second], NOW, recent) == [(first, second)]
+
+
+@pytest.mark.anyio
+async def test_simulation_report():
+    """A short Poisson trace runs end to end without a database."""
+    report = await simulate({
+        "duration_seconds": 600,
+        "round_interval_seconds": 20,
+        "arrival": {"process": "poisson", "rate_per_second": 0.5},
+        "seed": 1,
+    })
+    
+    assert report["arrivals"] > 0
+    assert report["rounds"] == 31
+    assert 0 < report["match_rate"] <= 1
+    assert report["time_to_match_seconds"]["all"]["p50"] >= 0
+
+
+@pytest.mark.anyio
+async def test_matchmaking_round_creates_sessions(db_session):
+    """A round against the real schema pairs queued users into sessions."""
+    from sqlalchemy import select
+    from app.models.session import Session
+    from app.models.user import User
+    from app.services.matchmaking import MatchmakingService
+    
+    users = [
+        User(email=f"u{i}@example.com", password_hash="x", username=f"u{i}", current_level=6.0)
+        for i in range(3)
+    ]
+    db_session.add_all(users)
+    await db_session.flush()
+    db_session.add_all([
+        QueueEntry(user_id=user.id, mode=QueueMode.ROULETTE, is_active=True) for user in users
+    ])
+    await db_session.commit()
+    
+    await MatchmakingService()._run_matchmaking()
+    
+    sessions = (await db_session.execute(select(Session))).scalars().all()
+    assert len(sessions) == 1
+    active = (await db_session.execute(
+        select(QueueEntry).where(QueueEntry.is_active == True)
+    )).scalars().all()
+    assert len(active) == 1
+
+
+def test_level_filter_optimal_matches_everyone_greedy_strands(monkeypatch):
+    """Where first-fit pairs A-B and strands C and D, optimal pairs A-C and B-D."""
+    pytest.importorskip("numpy")
+    from app.services.matchmaking import LEVEL_FILTER_MATCHERS
+    monkeypatch.setattr(settings, "level_tolerance_schedule", "0:0.5")
+    a, b, c, d = _entry(6.0, waited=40), _entry(6.5, waited=30), _entry(5.5, waited=20), _entry(7.0, waited=10)
+    
+    assert len(pair_level_filter_greedy([a, b, c, d], NOW)) == 1
+    
+    pairs = LEVEL_FILTER_MATCHERS["optimal"]([a, b, c, d], NOW, {})
+    assert {frozenset((x.id, y.id)) for x, y in pairs} == {frozenset((a.id, c.id)), frozenset((b.id, d.id))}
+
+
+def test_level_filter_optimal_carry_stays_bounded_for_tiny_blocks(monkeypatch):
+    """With blocks of 2, at most one leftover is carried, so blocks never grow."""
+    pytest.importorskip("numpy")
+    from app.services import optimal_pairing
+    monkeypatch.setattr(settings, "level_tolerance_schedule", "0:0.1")
+    monkeypatch.setattr(settings, "optimal_matcher_block_size", 2)
+    block_sizes = []
+    block_costs = optimal_pairing._block_costs
+    
+    def recording_block_costs(features, waits):
+        block_sizes.append(len(features))
+        return block_costs(features, waits)
+    
+    monkeypatch.setattr(optimal_pairing, "_block_costs", recording_block_costs)
+    # Nobody is within tolerance of anyone else, so every user is left over
+    entries = [_entry(1.0 + i) for i in range(8)]
+    
+    assert optimal_pairing.optimal_level_pairs(entries, NOW) == []
+    assert max(block_sizes) == 3
+
+
+@pytest.mark.anyio
+async def test_optimal_round_loads_profiles(db_session):
+    """The optimal strategy runs against the real schema with user profiles."""
+    pytest.importorskip("numpy")
+    from sqlalchemy import select
+    from app.models.session import Session
+    from app.models.user import User
+    from app.services.matchmaking import LEVEL_FILTER_MATCHERS, MatchmakingService
+    
+    users = [
+        User(email=f"o{i}@example.com", password_hash="x", username=f"o{i}", current_level=level)
+        for i, level in enumerate([6.0, 6.5, 5.5, 7.0])
+    ]
+    db_session.add_all(users)
+    await db_session.flush()
+    db_session.add_all([
+        QueueEntry(user_id=user.id, mode=QueueMode.LEVEL_FILTER, level_filter=user.current_level, is_active=True)
+        for user in users
+    ])
+    await db_session.commit()
+    
+    await MatchmakingService(level_filter_matcher=LEVEL_FILTER_MATCHERS["optimal"])._run_matchmaking()
+    
+    sessions = (await db_session.execute(select(Session))).scalars().all()
+    assert len(sessions) == 2
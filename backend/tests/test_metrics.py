@@ -0,0 +1,59 @@
+"""Tests for the metrics registry and /metrics endpoint."""
+import pytest
+from httpx import AsyncClient, ASGITransport
+from app.main import app
+from app.utils.metrics import MetricsRegistry
+
+
+def test_counter_and_gauge_exposition():
+    """Labelled counters and gauges render one sample per child."""
+    registry = MetricsRegistry()
+    messages = registry.counter("messages_total", "Messages", ["type"])
+    depth = registry.gauge("depth", "Depth")
+    
+    messages.labels("chat").inc()
+    messages.labels("chat").inc(2)
+    messages.labels("offer").inc()
+    depth.set(7)
+    
+    text = registry.expose()
+    assert "# TYPE messages_total counter" in text
+    assert 'messages_total{type="chat"} 3' in text
+    assert 'messages_total{type="offer"} 1' in text
+    assert "depth 7" in text
+
+
+def test_histogram_buckets_are_cumulative():
+    """Histogram buckets accumulate and end with +Inf, sum and count."""
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    
+    for value in (0.05, 0.5, 0.5, 5.0):
+        latency.observe(value)
+    
+    text = registry.expose()
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1"} 3' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in text
+    assert "latency_seconds_sum 6.05" in text
+    assert "latency_seconds_count 4" in text
+
+
+def test_label_count_is_checked():
+    """Passing the wrong number of label values raises."""
+    registry = MetricsRegistry()
+    messages = registry.counter("messages_total", "Messages", ["type"])
+    
+    with pytest.raises(ValueError):
+        messages.labels("chat", "extra")
+
+
+@pytest.mark.anyio
+async def test_metrics_endpoint():
+    """The /metrics endpoint exposes app metrics as plain text."""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "ws_connected_clients" in response.text
+        assert "db_pool_connections" in response.text
@@ -0,0 +1,59 @@
+"""Tests for connection pool instrumentation and its health endpoint."""
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.config import settings
+from app.database import InstrumentedQueuePool, engine, pool_status
+
+
+@pytest.fixture
+async def admin_headers(client, monkeypatch):
+    monkeypatch.setattr(settings, "admin_emails", "admin@example.com")
+    response = await client.post(
+        "/auth/register",
+        json={"email": "admin@example.com", "password": "testpassword123", "username": "admin"},
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.mark.anyio
+async def test_wait_counts_queueing_not_connecting():
+    """Opening a slow connection is not pool wait; waiting for a busy one is."""
+    pooled = create_async_engine(engine.url, poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=0)
+    
+    @event.listens_for(pooled.sync_engine, "connect")
+    def _slow_connect(dbapi_connection, connection_record):
+        time.sleep(0.2)
+    
+    try:
+        async with pooled.connect():
+            pass
+        stats = pooled.sync_engine.pool.stats
+        assert stats.checkouts == 1
+        assert stats.wait_seconds_total < 0.1
+        
+        held = await pooled.connect()
+        waiter = asyncio.create_task(pooled.connect().start())
+        await asyncio.sleep(0.2)
+        await held.close()
+        await (await waiter).close()
+        
+        assert stats.checkouts == 3
+        assert 0.15 <= stats.wait_seconds_max < 0.4
+        assert pool_status(pooled)["checkouts"] == 3
+    finally:
+        await pooled.dispose()
+
+
+@pytest.mark.anyio
+async def test_pool_health_is_admin_only(client, admin_headers):
+    """The pool endpoint needs an admin token like the rest of /admin."""
+    assert (await client.get("/health/pool")).status_code == 401
+    
+    response = await client.get("/health/pool", headers=admin_headers)
+    assert response.status_code == 200
+    assert "pool" in response.json()
@@ -0,0 +1,218 @@
+"""Tests for batched disconnect processing and presence leases."""
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.presence import WorkerLease
+from app.models.session import QueueEntry, QueueMode
+from app.models.user import User
+from app.services.presence import DisconnectBuffer, PresenceLease, presence_of
+from app.utils.query_tracking import DB_QUERIES
+
+
+async def _online_queued_users(db_session, count, epoch=None, prefix="p"):
+    users = [
+        User(email=f"{prefix}{i}@example.com", password_hash="x", username=f"{prefix}{i}",
+             is_online=True, presence_epoch=epoch)
+        for i in range(count)
+    ]
+    db_session.add_all(users)
+    await db_session.flush()
+    db_session.add_all([
+        QueueEntry(user_id=user.id, mode=QueueMode.ROULETTE, is_active=True) for user in users
+    ])
+    await db_session.commit()
+    return [str(user.id) for user in users]
+
+
+async def _online_ids(db_session):
+    db_session.expire_all()
+    result = await db_session.execute(select(User.id).where(User.is_online == True))
+    return {str(user_id) for user_id in result.scalars().all()}
+
+
+async def _queued_ids(db_session):
+    result = await db_session.execute(select(QueueEntry.user_id).where(QueueEntry.is_active == True))
+    return {str(user_id) for user_id in result.scalars().all()}
+
+
+def _past_grace():
+    return datetime.utcnow() - timedelta(seconds=settings.presence_lease_grace_seconds + 1)
+
+
+@pytest.mark.anyio
+async def test_disconnect_storm_is_written_in_bulk(db_session):
+    """Hundreds of disconnects become a few set-based statements."""
+    user_ids = await _online_queued_users(db_session, 300)
+    buffer = DisconnectBuffer()
+    for user_id in user_ids:
+        buffer.schedule(user_id)
+    
+    before = DB_QUERIES.labels("presence:flush").value
+    await buffer.flush()
+    
+    assert DB_QUERIES.labels("presence:flush").value - before <= 4
+    assert await _online_ids(db_session) == set()
+    assert await _queued_ids(db_session) == set()
+
+
+@pytest.mark.anyio
+async def test_reconnect_before_flush_cancels_disconnect(db_session):
+    """A user back before the flush is never marked offline or dequeued."""
+    stays, leaves = await _online_queued_users(db_session, 2)
+    buffer = DisconnectBuffer()
+    buffer.schedule(stays)
+    buffer.schedule(leaves)
+    
+    assert buffer.cancel(stays)
+    await buffer.flush()
+    
+    assert await _online_ids(db_session) == {stays}
+    assert await _queued_ids(db_session) == {stays}
+
+
+@pytest.mark.anyio
+async def test_reconnect_during_flush_stays_online(db_session):
+    """A reconnect racing a flush is marked online again afterwards."""
+    (user_id,) = await _online_queued_users(db_session, 1)
+    buffer = DisconnectBuffer()
+    write = buffer._write
+    
+    async def racing_write(batch):
+        await write(batch)
+        assert buffer.is_pending(user_id)
+        buffer.cancel(user_id)
+    
+    buffer._write = racing_write
+    buffer.schedule(user_id)
+    await buffer.flush()
+    
+    assert await _online_ids(db_session) == {user_id}
+    assert not buffer.is_pending(user_id)
+
+
+@pytest.mark.anyio
+async def test_requeue_during_flush_is_kept(db_session):
+    """A user who reconnects and joins the queue while their disconnect is flushed keeps the new entry."""
+    (user_id,) = await _online_queued_users(db_session, 1)
+    rejoined = []
+    
+    @asynccontextmanager
+    async def session_factory():
+        if not rejoined:
+            # Back and queued again after the flush took its batch
+            buffer.cancel(user_id)
+            entry = QueueEntry(user_id=user_id, mode=QueueMode.ROULETTE, is_active=True)
+            db_session.add(entry)
+            await db_session.commit()
+            rejoined.append(str(entry.id))
+        async with AsyncSessionLocal() as db:
+            yield db
+    
+    buffer = DisconnectBuffer(session_factory=session_factory)
+    buffer.schedule(user_id)
+    await buffer.flush()
+    
+    db_session.expire_all()
+    active = (await db_session.execute(select(QueueEntry.id).where(QueueEntry.is_active == True))).scalars().all()
+    assert [str(entry_id) for entry_id in active] == rejoined
+    assert await _online_ids(db_session) == {user_id}
+
+
+@pytest.mark.anyio
+async def test_draining_disconnect_keeps_queue_place(db_session):
+    """Disconnects scheduled without leave_queue only update presence."""
+    (user_id,) = await _online_queued_users(db_session, 1)
+    buffer = DisconnectBuffer()
+    buffer.schedule(user_id, leave_queue=False)
+    
+    await buffer.flush()
+    
+    assert await _online_ids(db_session) == set()
+    assert await _queued_ids(db_session) == {user_id}
+
+
+@pytest.mark.anyio
+async def test_dead_worker_presence_is_cleared(db_session):
+    """Users of a worker whose lease lapsed go offline and leave the queue."""
+    crashed, survivor = PresenceLease(), PresenceLease()
+    await crashed.heartbeat()
+    await survivor.heartbeat()
+    orphaned = await _online_queued_users(db_session, 3, epoch=crashed.epoch, prefix="dead")
+    alive = await _online_queued_users(db_session, 2, epoch=survivor.epoch, prefix="live")
+    
+    # The crashed worker stops renewing and its lease runs out, grace included
+    await db_session.execute(
+        update(WorkerLease)
+        .where(WorkerLease.id == crashed.epoch)
+        .values(expires_at=_past_grace())
+    )
+    await db_session.commit()
+    await survivor.heartbeat()
+    
+    assert await _online_ids(db_session) == set(alive)
+    assert await _queued_ids(db_session) == set(alive)
+    assert not set(orphaned) & await _online_ids(db_session)
+
+
+@pytest.mark.anyio
+async def test_lost_lease_is_reclaimed_with_connected_users(db_session):
+    """A worker that missed its renewal takes a new epoch and re-marks its users."""
+    (user_id,) = await _online_queued_users(db_session, 1)
+    lease = PresenceLease()
+    lease._connected_users = lambda: [user_id]
+    await lease.heartbeat()
+    first_epoch = lease.epoch
+    
+    await db_session.execute(update(WorkerLease).values(expires_at=_past_grace()))
+    await db_session.commit()
+    await lease.heartbeat()
+    
+    assert lease.epoch != first_epoch
+    db_session.expire_all()
+    user = (await db_session.execute(select(User).where(User.id == user_id))).scalar_one()
+    assert user.is_online and user.presence_epoch == lease.epoch
+
+
+@pytest.mark.anyio
+async def test_flush_leaves_users_owned_by_other_workers(db_session):
+    """A late disconnect does not knock a user offline on the worker they moved to."""
+    elsewhere = PresenceLease()
+    await elsewhere.heartbeat()
+    (user_id,) = await _online_queued_users(db_session, 1, epoch=elsewhere.epoch)
+    buffer = DisconnectBuffer(lease=PresenceLease())
+    buffer.schedule(user_id)
+    
+    await buffer.flush()
+    
+    assert await _online_ids(db_session) == {user_id}
+
+
+@pytest.mark.anyio
+async def test_late_renewal_keeps_users_and_queue(db_session):
+    """A lease renewed late, within the grace period, loses nothing, though readers see it offline meanwhile."""
+    late, peer = PresenceLease(), PresenceLease()
+    await late.heartbeat()
+    await peer.heartbeat()
+    user_ids = await _online_queued_users(db_session, 2, epoch=late.epoch)
+    epoch = late.epoch
+    
+    await db_session.execute(
+        update(WorkerLease)
+        .where(WorkerLease.id == epoch)
+        .values(expires_at=datetime.utcnow() - timedelta(seconds=1))
+    )
+    await db_session.commit()
+    assert {online for online, _ in (await presence_of(db_session, user_ids)).values()} == {False}
+    
+    await peer.heartbeat()
+    await late.heartbeat()
+    
+    assert late.epoch == epoch
+    assert await _online_ids(db_session) == set(user_ids)
+    assert await _queued_ids(db_session) == set(user_ids)
+    assert {online for online, _ in (await presence_of(db_session, user_ids)).values()} == {True}
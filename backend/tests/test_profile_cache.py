@@ -0,0 +1,84 @@
+"""Tests for the shared user profile cache."""
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+import app.database as database
+from app.config import settings
+from app.models.user import User
+from app.services.profile_cache import ProfileCache
+from app.utils.query_tracking import query_scope
+
+
+@pytest.fixture
+async def users(db_session):
+    users = [User(email=f"user{i}@example.com", password_hash="x", username=f"user{i}") for i in range(5)]
+    db_session.add_all(users)
+    await db_session.commit()
+    return [user.id for user in users]
+
+
+@pytest.mark.anyio
+async def test_misses_load_in_one_query(users, db_session):
+    """A batch of misses is one IN query; the same users again cost none."""
+    cache = ProfileCache(ttl_seconds=60, max_entries=100)
+    
+    with query_scope("test") as scope:
+        profiles = await cache.get_many(db_session, users[:3])
+    assert scope.count == 1
+    assert sorted(profile.username for profile in profiles.values()) == ["user0", "user1", "user2"]
+    
+    with query_scope("test") as scope:
+        profiles = await cache.get_many(db_session, users)
+    assert scope.count == 1
+    assert len(profiles) == 5
+    
+    with query_scope("test") as scope:
+        assert (await cache.get_one(db_session, str(users[4]))).username == "user4"
+    assert scope.count == 0
+
+
+@pytest.mark.anyio
+async def test_entries_expire_evict_and_invalidate(users, db_session):
+    """Entries leave on LRU overflow, explicit invalidation and TTL expiry."""
+    now = {"t": 0.0}
+    cache = ProfileCache(ttl_seconds=10, max_entries=2, clock=lambda: now["t"])
+    
+    for user_id in users[:3]:
+        await cache.get_one(db_session, user_id)
+    # Least recently used went first
+    assert cache.get(users[0]) is None
+    assert cache.get(users[2]) is not None
+    
+    cache.invalidate(users[2])
+    assert cache.get(users[2]) is None
+    now["t"] = 11
+    assert cache.get(users[1]) is None
+    assert len(cache) == 0
+
+
+@pytest.mark.anyio
+async def test_replica_rows_are_not_cached_right_after_a_change(users, db_session, monkeypatch):
+    """After an invalidation, a replica read is served uncached until the lag window passes."""
+    now = {"t": 0.0}
+    cache = ProfileCache(ttl_seconds=60, max_entries=100, clock=lambda: now["t"])
+    monkeypatch.setattr(settings, "replica_read_after_write_seconds", 5.0)
+    replica_engine = create_async_engine(database.engine.url)
+    monkeypatch.setattr(database, "replica_engine", replica_engine)
+    try:
+        async with AsyncSession(replica_engine) as replica_session:
+            cache.invalidate(users[0])
+            assert (await cache.get_one(replica_session, users[0])).username == "user0"
+            assert cache.get(users[0]) is None
+            
+            # The primary is always current, and other users are unaffected
+            await cache.get_many(db_session, [users[0]])
+            await cache.get_many(replica_session, [users[1]])
+            assert cache.get(users[0]) is not None
+            assert cache.get(users[1]) is not None
+            
+            cache.invalidate(users[0])
+            now["t"] = 6
+            await cache.get_one(replica_session, users[0])
+            assert cache.get(users[0]) is not None
+    finally:
+        await replica_engine.dispose()
@@ -0,0 +1,78 @@
+"""Tests for the sampling profiler and its admin endpoint."""
+import asyncio
+from collections import Counter
+
+import pytest
+
+from app.config import settings
+from app.services.profiler import SamplingProfiler, profiler
+
+
+@pytest.fixture
+async def admin_headers(client, monkeypatch):
+    monkeypatch.setattr(settings, "admin_emails", "admin@example.com")
+    response = await client.post(
+        "/auth/register",
+        json={"email": "admin@example.com", "password": "testpassword123", "username": "admin"},
+    )
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def _spin(stop: asyncio.Event):
+    while not stop.is_set():
+        await asyncio.sleep(0.001)
+
+
+@pytest.mark.anyio
+async def test_profile_returns_collapsed_stacks(client, admin_headers):
+    """The endpoint returns "stack count" lines for the loop thread and for tasks."""
+    stop = asyncio.Event()
+    spinner = asyncio.create_task(_spin(stop))
+    try:
+        response = await client.get(
+            "/admin/profile", params={"seconds": 0.3, "interval_ms": 5}, headers=admin_headers
+        )
+    finally:
+        stop.set()
+        await spinner
+    
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        assert stack and int(count) > 0
+    assert any(line.startswith("thread:event_loop;") for line in lines)
+    assert any(line.startswith("asyncio;") and "_spin" in line for line in lines)
+
+
+@pytest.mark.anyio
+async def test_profile_is_capped_and_exclusive(client, admin_headers, monkeypatch):
+    """Over PROFILER_MAX_SECONDS is refused, and so is a second profile while one runs."""
+    monkeypatch.setattr(settings, "profiler_max_seconds", 1.0)
+    response = await client.get("/admin/profile", params={"seconds": 5}, headers=admin_headers)
+    assert response.status_code == 400
+    
+    running = asyncio.create_task(profiler.profile(0.3, 0.01))
+    await asyncio.sleep(0.05)
+    try:
+        response = await client.get("/admin/profile", params={"seconds": 0.1}, headers=admin_headers)
+        assert response.status_code == 409
+    finally:
+        await running
+
+
+@pytest.mark.anyio
+async def test_task_sampling_walks_at_most_max_tasks():
+    """With many tasks alive, one sample walks no more than the cap."""
+    stop = asyncio.Event()
+    tasks = [asyncio.create_task(stop.wait()) for _ in range(50)]
+    await asyncio.sleep(0)
+    samples: Counter = Counter()
+    try:
+        SamplingProfiler._sample_tasks(samples, max_tasks=10)
+    finally:
+        stop.set()
+        await asyncio.gather(*tasks)
+    
+    assert sum(samples.values()) == 10
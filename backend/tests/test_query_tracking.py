@@ -0,0 +1,60 @@
+"""Tests for per-operation query attribution and budgets."""
+import pytest
+from app.config import settings
+from app.utils.query_tracking import (
+    DB_QUERIES,
+    QueryBudgetExceeded,
+    parameter_shape,
+    query_scope,
+    record_query,
+)
+
+
+def test_statements_are_counted_per_scope():
+    """Statements recorded inside a scope are attributed to it."""
+    with query_scope("GET /users") as scope:
+        record_query("SELECT 1", {}, False, 0.001)
+        record_query("SELECT 2", {}, False, 0.001)
+    
+    assert scope.count == 2
+
+
+def test_budget_enforced(monkeypatch):
+    """Exceeding a budget raises in enforcement mode."""
+    monkeypatch.setattr(settings, "db_query_budget_enforce", True)
+    
+    with pytest.raises(QueryBudgetExceeded):
+        with query_scope("GET /partners/", budget=1):
+            record_query("SELECT partnerships", {}, False, 0.001)
+            record_query("SELECT user", {}, False, 0.001)
+
+
+def test_budget_only_logged_when_not_enforced(monkeypatch):
+    """Without enforcement an exceeded budget does not raise."""
+    monkeypatch.setattr(settings, "db_query_budget_enforce", False)
+    
+    with query_scope("GET /partners/", budget=0) as scope:
+        record_query("SELECT 1", {}, False, 0.001)
+    
+    assert scope.count == 1
+
+
+@pytest.mark.anyio
+async def test_route_queries_are_labelled_with_the_full_template(client):
+    """Statements are attributed to the prefixed route template, not the concrete path."""
+    response = await client.post(
+        "/auth/register",
+        json={"email": "alice@example.com", "password": "testpassword123", "username": "alice"},
+    )
+    body = response.json()
+    before = DB_QUERIES.labels("GET /users/{user_id}").value
+    
+    await client.get(f"/users/{body['user']['id']}", headers={"Authorization": f"Bearer {body['access_token']}"})
+    
+    assert DB_QUERIES.labels("GET /users/{user_id}").value > before
+
+
+def test_parameter_shape_hides_values():
+    """Parameter shapes keep types and drop values."""
+    assert parameter_shape({"id_1": "abc", "param_1": 5}) == {"id_1": "str", "param_1": "int"}
+    assert parameter_shape([("a", 1), ("b", 2)], executemany=True) == {"rows": 2, "row": ["str", "int"]}
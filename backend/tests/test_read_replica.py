@@ -0,0 +1,28 @@
+"""Tests for routing reads to the replica."""
+from starlette.requests import HTTPConnection, Request
+
+import app.database as database
+
+
+def _websocket(token):
+    return HTTPConnection({
+        "type": "websocket", "path": "/ws/match/u1", "headers": [], "query_string": f"token={token}".encode(),
+    })
+
+
+def _request(path, token):
+    return Request({
+        "type": "http", "method": "GET", "path": path, "query_string": b"",
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+    })
+
+
+def test_websocket_write_pins_reads_to_primary(monkeypatch):
+    """After a write over the WebSocket, the same client's HTTP reads go to the primary."""
+    monkeypatch.setattr(database, "replica_engine", object())
+    monkeypatch.setattr(database, "_recent_writers", {})
+    
+    database.mark_read_your_writes(_websocket("alice-token"))
+    
+    assert not database._use_replica(_request("/queue/status", "alice-token"))
+    assert database._use_replica(_request("/queue/status", "bob-token"))
@@ -0,0 +1,80 @@
+"""Tests for the adaptive matchmaking round scheduler."""
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.services.matchmaking import MatchmakingService, RoundScheduler
+
+
+@pytest.fixture
+def schedule(monkeypatch):
+    monkeypatch.setattr(settings, "roulette_interval_seconds", 20)
+    monkeypatch.setattr(settings, "matchmaking_min_interval_seconds", 1.0)
+    monkeypatch.setattr(settings, "matchmaking_target_arrivals_per_round", 10)
+    monkeypatch.setattr(settings, "matchmaking_idle_probe_seconds", 60.0)
+
+
+def test_delay_follows_arrival_rate(schedule):
+    """Busy queues get frequent rounds, quiet ones the maximum interval, empty ones none."""
+    now = {"t": 0.0}
+    scheduler = RoundScheduler(clock=lambda: now["t"])
+    
+    scheduler.round_finished(waiting=3, seconds=0.01)
+    now["t"] = 10
+    scheduler.round_finished(waiting=3, seconds=0.01)
+    assert scheduler.next_delay() == 20
+    
+    for _ in range(10):
+        scheduler.note_join(1000)
+        now["t"] += 10
+        scheduler.round_finished(waiting=3, seconds=0.01)
+    assert scheduler.next_delay() == 1.0
+    
+    scheduler.round_finished(waiting=3, seconds=4.0)
+    assert scheduler.next_delay() == 8.0
+    
+    scheduler.round_finished(waiting=0, seconds=0.01)
+    assert scheduler.next_delay() == 60.0
+
+
+def test_batch_size_adapts_to_round_time(schedule, monkeypatch):
+    """Slow rounds halve the batch, quick rounds grow it back within bounds."""
+    monkeypatch.setattr(settings, "matchmaking_round_budget_seconds", 0.5)
+    monkeypatch.setattr(settings, "matchmaking_batch_min", 100)
+    monkeypatch.setattr(settings, "matchmaking_batch_max", 1000)
+    scheduler = RoundScheduler()
+    
+    scheduler.round_finished(waiting=5, seconds=2.0)
+    assert scheduler.batch_size == 500
+    for _ in range(5):
+        scheduler.round_finished(waiting=5, seconds=2.0)
+    assert scheduler.batch_size == 100
+    scheduler.round_finished(waiting=5, seconds=0.01)
+    assert scheduler.batch_size == 150
+
+
+@pytest.mark.anyio
+async def test_empty_queue_skips_rounds_until_a_join(schedule, monkeypatch):
+    """With no probe and nobody waiting, the loop sleeps until a join arrives."""
+    monkeypatch.setattr(settings, "matchmaking_idle_probe_seconds", 0.0)
+    monkeypatch.setattr(settings, "matchmaking_min_interval_seconds", 0.01)
+    monkeypatch.setattr(settings, "matchmaking_target_arrivals_per_round", 1)
+    service = MatchmakingService()
+    rounds = []
+    
+    async def fake_round():
+        rounds.append(service.scheduler.depth)
+        service.scheduler.round_finished(waiting=0, seconds=0.0)
+    
+    monkeypatch.setattr(service, "_run_matchmaking", fake_round)
+    await service.start()
+    try:
+        await asyncio.sleep(0.1)
+        assert len(rounds) == 1
+        
+        service.scheduler.note_join(2)
+        await asyncio.sleep(0.1)
+        assert rounds == [1, 2]
+    finally:
+        await service.stop()
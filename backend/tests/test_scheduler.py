@@ -0,0 +1,74 @@
+"""Tests for the background job supervisor."""
+import asyncio
+
+import pytest
+
+from app.services.scheduler import Job, JobSupervisor
+
+
+@pytest.mark.anyio
+async def test_failures_back_off_and_recover():
+    """Failed runs retry with growing delays and a success resets the count."""
+    outcomes = [ValueError("db down"), ValueError("db down"), None]
+    calls = []
+    
+    async def flaky():
+        calls.append(asyncio.get_running_loop().time())
+        outcome = outcomes.pop(0) if outcomes else None
+        if outcome:
+            raise outcome
+    
+    job = Job("flaky", flaky, interval=0.01, backoff_base=0.02, backoff_max=1.0)
+    await job.start()
+    try:
+        await asyncio.sleep(0.3)
+    finally:
+        await job.stop()
+    
+    assert job.failures == 2 and job.consecutive_failures == 0
+    assert job.last_error == "ValueError: db down"
+    # Second retry waits about twice as long as the first (jitter is +-50%)
+    assert calls[2] - calls[1] >= 0.02
+    assert calls[1] - calls[0] >= 0.01
+
+
+@pytest.mark.anyio
+async def test_hung_run_times_out_and_runs_do_not_overlap():
+    """A run past its timeout is cancelled, and a run already in progress is not started twice."""
+    release = asyncio.Event()
+    
+    async def hang():
+        await release.wait()
+    
+    job = Job("hang", hang, interval=60, timeout=0.05)
+    assert not await job.run_once()
+    assert job.snapshot()["last_error"] == "timed out after 0.1s"
+    
+    job.timeout = 0
+    first = asyncio.create_task(job.run_once())
+    await asyncio.sleep(0)
+    assert job.snapshot()["state"] == "running"
+    assert not await job.run_once()
+    release.set()
+    assert await first
+    assert job.runs == 2
+
+
+@pytest.mark.anyio
+async def test_supervisor_snapshot_and_name_clash():
+    """Running jobs can't be registered twice; stopped ones are replaced."""
+    supervisor = JobSupervisor()
+    
+    async def noop():
+        pass
+    
+    job = supervisor.register("noop", noop, interval=60)
+    await job.start()
+    await asyncio.sleep(0)
+    with pytest.raises(ValueError):
+        supervisor.register("noop", noop, interval=60)
+    assert supervisor.snapshot()[0]["state"] == "waiting"
+    assert supervisor.snapshot()[0]["next_run_at"] is not None
+    
+    await supervisor.stop()
+    assert supervisor.register("noop", noop, interval=1) is not job
@@ -0,0 +1,150 @@
+"""Tests for resuming a call after a short WebSocket drop."""
+import asyncio
+
+import pytest
+from fastapi import WebSocketDisconnect
+from sqlalchemy import select
+
+import app.services.websocket as websocket_module
+from app.config import settings
+from app.models.session import QueueMode, Session, SessionStatus
+from app.models.user import User
+from app.services.matchmaking import MatchmakingService, Room
+from app.services.presence import DisconnectBuffer
+from app.utils.security import create_access_token
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+    
+    async def send_json(self, message):
+        self.sent.append(message)
+    
+    def types(self):
+        return [message["type"] for message in self.sent]
+
+
+def _room(session_id="session-1"):
+    return Room(
+        room_id="room_1",
+        session_id=session_id,
+        initiator_id="alice",
+        responder_id="bob",
+        profiles={"alice": {"username": "alice", "level": 6.5}, "bob": {"username": "bob", "level": 6.0}},
+    )
+
+
+@pytest.mark.anyio
+async def test_resume_replays_buffered_signaling():
+    """A participant back within the window gets session_resume and missed signaling."""
+    service = MatchmakingService()
+    alice, bob = FakeWebSocket(), FakeWebSocket()
+    service.register_client("alice", alice)
+    service.register_client("bob", bob)
+    service.open_room(_room())
+    
+    assert service.unregister_client("alice", alice)
+    await service.hold_room("alice")
+    assert bob.types() == ["partner_disconnected"]
+    
+    # Bob restarts ICE while Alice is away
+    assert await service.send_to_client("alice", {"type": "offer", "data": {"sdp": "v=0"}})
+    
+    alice_again = FakeWebSocket()
+    service.register_client("alice", alice_again)
+    assert await service.resume_session("alice")
+    
+    assert alice_again.types() == ["session_resume", "offer"]
+    resume = alice_again.sent[0]["data"]
+    assert resume["is_initiator"] is True
+    assert resume["partner_id"] == "bob" and resume["partner_username"] == "bob"
+    assert bob.types() == ["partner_disconnected", "partner_reconnected"]
+    assert service.held_participants == {}
+
+
+@pytest.mark.anyio
+async def test_stale_socket_cleanup_keeps_new_connection():
+    """Cleanup for an old socket does not unregister the one that replaced it."""
+    service = MatchmakingService()
+    old, new = FakeWebSocket(), FakeWebSocket()
+    service.register_client("alice", old)
+    service.register_client("alice", new)
+    
+    assert not service.unregister_client("alice", old)
+    assert service.connected_clients["alice"] is new
+
+
+@pytest.mark.anyio
+async def test_expired_window_ends_session(db_session, monkeypatch):
+    """If the participant does not return, the session ends and the partner is told."""
+    alice = User(email="alice@example.com", password_hash="x", username="alice")
+    bob = User(email="bob@example.com", password_hash="x", username="bob")
+    db_session.add_all([alice, bob])
+    await db_session.flush()
+    session = Session(user1_id=alice.id, user2_id=bob.id, mode=QueueMode.ROULETTE, room_id="room_1")
+    db_session.add(session)
+    await db_session.commit()
+    
+    monkeypatch.setattr(settings, "session_resume_grace_seconds", 0.01)
+    service = MatchmakingService()
+    bob_socket = FakeWebSocket()
+    service.register_client(str(bob.id), bob_socket)
+    service.open_room(Room(
+        room_id="room_1", session_id=str(session.id),
+        initiator_id=str(alice.id), responder_id=str(bob.id),
+    ))
+    
+    await service.hold_room(str(alice.id))
+    await asyncio.sleep(0.1)
+    
+    assert bob_socket.types() == ["partner_disconnected", "session_ended"]
+    assert service.active_rooms == {} and service.user_rooms == {}
+    db_session.expire_all()
+    ended = (await db_session.execute(select(Session))).scalar_one()
+    assert ended.status == SessionStatus.COMPLETED
+
+
+class EndpointWebSocket(FakeWebSocket):
+    """Enough of a WebSocket to run the endpoint until the client goes away."""
+    
+    def __init__(self, token):
+        super().__init__()
+        self.headers = {}
+        self.query_params = {"token": token}
+        self.close_code = None
+    
+    async def accept(self):
+        pass
+    
+    async def close(self, code=1000, reason=""):
+        self.close_code = code
+    
+    async def receive_text(self):
+        raise WebSocketDisconnect()
+
+
+@pytest.mark.anyio
+async def test_full_node_still_takes_back_a_held_participant(db_session, monkeypatch):
+    """The connection cap turns away new sessions but not a participant resuming a call."""
+    users = [User(email=f"{name}@example.com", password_hash="x", username=name) for name in ("alice", "bob", "carol")]
+    db_session.add_all(users)
+    await db_session.commit()
+    alice_id, bob_id, carol_id = (str(user.id) for user in users)
+    
+    service = MatchmakingService()
+    monkeypatch.setattr(websocket_module, "matchmaking_service", service)
+    monkeypatch.setattr(websocket_module, "disconnect_buffer", DisconnectBuffer())
+    monkeypatch.setattr(settings, "admission_max_connections", 1)
+    bob = FakeWebSocket()
+    service.register_client(bob_id, bob)
+    service.open_room(Room(room_id="room_1", session_id="s1", initiator_id=alice_id, responder_id=bob_id))
+    await service.hold_room(alice_id)
+    
+    carol = EndpointWebSocket(create_access_token({"sub": carol_id}))
+    await websocket_module.websocket_match_endpoint(carol, carol_id, carol.query_params["token"])
+    assert carol.types() == ["server_busy"] and carol.close_code == 1013
+    
+    alice = EndpointWebSocket(create_access_token({"sub": alice_id}))
+    await websocket_module.websocket_match_endpoint(alice, alice_id, alice.query_params["token"])
+    assert alice.types() == ["session_resume"] and alice.close_code is None
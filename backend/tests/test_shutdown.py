@@ -0,0 +1,196 @@
+"""Tests for draining a worker and handing matchmaking state to the next one."""
+import os
+import signal
+import socket
+import subprocess
+import sys
+import textwrap
+import time
+
+import httpx
+import pytest
+from sqlalchemy import select
+
+from app.config import settings
+from app.models.session import QueueEntry, QueueMode, Session
+from app.models.user import User
+from app.services.matchmaking import MatchmakingService, Room
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+        self.close_code = None
+    
+    async def send_json(self, message):
+        self.sent.append(message)
+    
+    async def close(self, code=1000, reason=""):
+        self.close_code = code
+
+
+async def _queue_users(db_session, count):
+    users = [
+        User(email=f"q{i}@example.com", password_hash="x", username=f"q{i}", current_level=6.0)
+        for i in range(count)
+    ]
+    db_session.add_all(users)
+    await db_session.flush()
+    db_session.add_all([
+        QueueEntry(user_id=user.id, mode=QueueMode.ROULETTE, is_active=True) for user in users
+    ])
+    await db_session.commit()
+    return [str(user.id) for user in users]
+
+
+@pytest.mark.anyio
+async def test_drain_sends_jittered_reconnect_hints():
+    """Every client gets a reconnect delay within the configured range and is closed."""
+    service = MatchmakingService()
+    sockets = {f"user-{i}": FakeWebSocket() for i in range(5)}
+    for user_id, websocket in sockets.items():
+        service.register_client(user_id, websocket)
+    
+    await service.drain()
+    
+    for websocket in sockets.values():
+        hint = websocket.sent[-1]
+        assert hint["type"] == "reconnect"
+        assert settings.shutdown_reconnect_min_seconds <= hint["data"]["retry_after"] <= settings.shutdown_reconnect_max_seconds
+        assert websocket.close_code == 1012
+
+
+@pytest.mark.anyio
+async def test_queue_survives_handoff(db_session, tmp_path):
+    """Queued users keep their place and are matched once they reconnect."""
+    user_ids = await _queue_users(db_session, 2)
+    state_file = str(tmp_path / "matchmaking.json")
+    
+    await MatchmakingService().drain(state_file)
+    
+    successor = MatchmakingService()
+    successor.restore_state(state_file)
+    assert set(successor.awaiting_reconnect) == set(user_ids)
+    
+    # Not reconnected yet: held, not paired
+    await successor._run_matchmaking()
+    assert (await db_session.execute(select(Session))).scalars().all() == []
+    
+    for user_id in user_ids:
+        successor.register_client(user_id, FakeWebSocket())
+    await successor._run_matchmaking()
+    
+    assert len((await db_session.execute(select(Session))).scalars().all()) == 1
+    assert successor.awaiting_reconnect == {}
+
+
+@pytest.mark.anyio
+async def test_users_who_never_return_lose_their_place(db_session, tmp_path):
+    """After the grace window, handed-over entries that were not reclaimed are dropped."""
+    await _queue_users(db_session, 2)
+    state_file = str(tmp_path / "matchmaking.json")
+    await MatchmakingService().drain(state_file)
+    
+    successor = MatchmakingService()
+    successor.restore_state(state_file)
+    # Grace window over
+    for user_id in successor.awaiting_reconnect:
+        successor.awaiting_reconnect[user_id] = successor._now()
+    
+    await successor._run_matchmaking()
+    
+    active = (await db_session.execute(
+        select(QueueEntry).where(QueueEntry.is_active == True)
+    )).scalars().all()
+    assert active == []
+
+
+@pytest.mark.anyio
+async def test_calls_resume_after_handoff(tmp_path):
+    """Rooms handed over by a draining worker resume when participants reconnect."""
+    state_file = str(tmp_path / "matchmaking.json")
+    service = MatchmakingService()
+    service.open_room(Room(room_id="room_1", session_id="s1", initiator_id="alice", responder_id="bob"))
+    await service.save_state(state_file)
+    
+    successor = MatchmakingService()
+    successor.restore_state(state_file)
+    assert set(successor.held_participants) == {"alice", "bob"}
+    
+    websocket = FakeWebSocket()
+    successor.register_client("bob", websocket)
+    assert await successor.resume_session("bob")
+    assert websocket.sent[0]["type"] == "session_resume"
+    assert websocket.sent[0]["data"]["is_initiator"] is False
+
+
+SIGTERM_SERVER = textwrap.dedent("""
+    import asyncio
+    import sys
+    from contextlib import asynccontextmanager
+    
+    import uvicorn
+    from fastapi import FastAPI
+    
+    from app.services import shutdown
+    from app.services.matchmaking import matchmaking_service
+    
+    async def slow_drain(state_file=None):
+        print("drain started", flush=True)
+        await asyncio.sleep(1.0)
+        print("drain finished", flush=True)
+    
+    matchmaking_service.drain = slow_drain
+    
+    @asynccontextmanager
+    async def lifespan(app):
+        shutdown.install_sigterm_drain()
+        yield
+        print("lifespan shutdown", flush=True)
+    
+    app = FastAPI(lifespan=lifespan)
+    
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+    
+    uvicorn.run(app, host="127.0.0.1", port=int(sys.argv[1]), log_level="warning")
+""")
+
+
+def test_sigterm_drains_before_uvicorn_shuts_down(tmp_path):
+    """Under the real uvicorn server, SIGTERM drains first and the server keeps serving meanwhile."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    script = tmp_path / "server.py"
+    script.write_text(SIGTERM_SERVER)
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "PYTHONPATH": backend}
+    server = subprocess.Popen(
+        [sys.executable, str(script), str(port)], cwd=backend, env=env, stdout=subprocess.PIPE, text=True
+    )
+    url = f"http://127.0.0.1:{port}/ping"
+    try:
+        deadline = time.monotonic() + 15
+        while True:
+            try:
+                httpx.get(url)
+                break
+            except httpx.TransportError:
+                assert server.poll() is None and time.monotonic() < deadline, "server did not start"
+                time.sleep(0.1)
+        
+        server.send_signal(signal.SIGTERM)
+        time.sleep(0.3)
+        # Still draining: uvicorn has not closed its sockets
+        assert httpx.get(url).status_code == 200
+        
+        output, _ = server.communicate(timeout=15)
+    finally:
+        if server.poll() is None:
+            server.kill()
+            server.wait()
+    
+    lines = output.splitlines()
+    assert lines == ["drain started", "drain finished", "lifespan shutdown"]
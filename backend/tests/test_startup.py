@@ -0,0 +1,37 @@
+"""Tests for startup warmup and readiness reporting."""
+import pytest
+
+from app.config import settings
+from app.services.warmup import StartupWarmup, hot_queries, startup_warmup
+from app.utils.query_tracking import DB_QUERIES
+
+
+@pytest.mark.anyio
+async def test_health_reports_starting_during_warmup(client):
+    """Readiness is withheld while warmup runs."""
+    startup_warmup.in_progress = True
+    try:
+        response = await client.get("/health")
+        assert response.status_code == 503
+        assert response.json() == {"status": "starting"}
+    finally:
+        startup_warmup.in_progress = False
+    
+    response = await client.get("/health")
+    assert response.status_code == 200
+
+
+@pytest.mark.anyio
+async def test_warmup_runs_hot_queries(monkeypatch):
+    """Warmup opens connections, runs every hot query and then reports ready."""
+    monkeypatch.setattr(settings, "db_warmup_connections", 2)
+    monkeypatch.setattr(settings, "db_warmup_statements", True)
+    before = DB_QUERIES.labels("warmup").value
+    warmup = StartupWarmup()
+    
+    warmup.start()
+    assert warmup.in_progress
+    await warmup._task
+    
+    assert not warmup.in_progress
+    assert DB_QUERIES.labels("warmup").value - before >= len(hot_queries())
@@ -0,0 +1,104 @@
+"""Tests for user and partner endpoints on the SQLite test database."""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app.models.presence import WorkerLease
+from app.models.user import User
+
+
+async def _register(client, email, username, level=6.0):
+    response = await client.post(
+        "/auth/register",
+        json={
+            "email": email,
+            "password": "testpassword123",
+            "username": username,
+            "current_level": level,
+            "target_score": 7.5,
+        }
+    )
+    assert response.status_code == 201
+    body = response.json()
+    return body["user"], {"Authorization": f"Bearer {body['access_token']}"}
+
+
+@pytest.mark.anyio
+async def test_get_and_update_user(client):
+    """A user can read and update their own profile."""
+    user, headers = await _register(client, "alice@example.com", "alice")
+    
+    response = await client.get(f"/users/{user['id']}", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["username"] == "alice"
+    
+    response = await client.patch(f"/users/{user['id']}", json={"current_level": 7.0}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["current_level"] == 7.0
+    
+    response = await client.get(f"/users/{user['id']}", headers=headers)
+    assert response.json()["current_level"] == 7.0
+
+
+@pytest.mark.anyio
+async def test_partner_request_flow(client):
+    """Sending and accepting a request makes both users partners."""
+    alice, alice_headers = await _register(client, "alice@example.com", "alice")
+    bob, bob_headers = await _register(client, "bob@example.com", "bob", level=6.5)
+    
+    response = await client.post("/partners/request", json={"to_user_id": bob["id"]}, headers=alice_headers)
+    assert response.status_code == 200
+    
+    incoming = await client.get("/partners/requests/incoming", headers=bob_headers)
+    assert [r["from_username"] for r in incoming.json()] == ["alice"]
+    
+    request_id = incoming.json()[0]["id"]
+    response = await client.post(f"/partners/requests/{request_id}/accept", headers=bob_headers)
+    assert response.status_code == 200
+    
+    partners = await client.get("/partners/", headers=alice_headers)
+    assert [p["username"] for p in partners.json()] == ["bob"]
+
+
+@pytest.mark.anyio
+async def test_partner_of_dead_worker_is_offline(client, db_session):
+    """Partner lists follow worker leases, not the raw is_online flag."""
+    alice, alice_headers = await _register(client, "alice@example.com", "alice")
+    bob, bob_headers = await _register(client, "bob@example.com", "bob")
+    response = await client.post("/partners/request", json={"to_user_id": bob["id"]}, headers=alice_headers)
+    await client.post(f"/partners/requests/{response.json()['id']}/accept", headers=bob_headers)
+    
+    # Bob's worker stopped renewing its lease; nobody has cleared his flag yet
+    lease = WorkerLease(hostname="gone", pid=1, expires_at=datetime.utcnow() - timedelta(seconds=1))
+    db_session.add(lease)
+    await db_session.flush()
+    await db_session.execute(
+        update(User).where(User.username == "bob").values(is_online=True, presence_epoch=lease.id)
+    )
+    await db_session.commit()
+    
+    partners = await client.get("/partners/", headers=alice_headers)
+    assert [(p["username"], p["is_online"]) for p in partners.json()] == [("bob", False)]
+    search = await client.get("/partners/search", params={"q": "bo"}, headers=alice_headers)
+    assert [(u["username"], u["is_online"]) for u in search.json()] == [("bob", False)]
+
+
+@pytest.mark.anyio
+async def test_cached_profile_shows_live_presence(client, db_session):
+    """Presence is read live even while the profile itself is served from the cache."""
+    _, alice_headers = await _register(client, "alice@example.com", "alice")
+    bob, _ = await _register(client, "bob@example.com", "bob")
+    response = await client.get(f"/users/{bob['id']}", headers=alice_headers)
+    assert response.json()["is_online"] is False
+    
+    lease = WorkerLease(hostname="api", pid=1, expires_at=datetime.utcnow() + timedelta(minutes=1))
+    db_session.add(lease)
+    await db_session.flush()
+    await db_session.execute(
+        update(User).where(User.username == "bob").values(is_online=True, presence_epoch=lease.id)
+    )
+    await db_session.commit()
+    
+    response = await client.get(f"/users/{bob['id']}", headers=alice_headers)
+    assert response.json()["is_online"] is True